@@ -0,0 +1,64 @@
+############################################################################
+#
+#   Filename:           common.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 21:47:26 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import services.mock_server as mock_server
+
+from multiprocessing import Process, Queue
+import resource
+import time
+
+
+def usage():
+    '''
+        Returns (cpu seconds, peak rss in kB) of current process.
+    '''
+    resources = resource.getrusage(resource.RUSAGE_SELF)
+    return resources.ru_utime + resources.ru_stime, resources.ru_maxrss
+
+
+def serve(factory=None, options=None, ports=None):
+    server, port = mock_server.serve(servicer=factory(options))
+    ports.put(port)
+    while True:
+        time.sleep(3600)
+
+
+def start_server(factory=None, options=None):
+    '''
+        Starts mock server in separate process and returns (process, port).
+
+        Args:
+            factory: module level function returning servicer for options.
+            options (dict): benchmark options.
+    '''
+    ports = Queue()
+    server = Process(target=serve, args=(factory, options, ports))
+    server.daemon = True
+    server.start()
+    return server, ports.get(timeout=30)
+
+
+def run_client(target=None, *args):
+    '''
+        Runs target(*args, results) in separate process, so CPU time and
+        memory belong only to one run, and returns what it put to results.
+    '''
+    results = Queue()
+    client = Process(target=target, args=args + (results,))
+    client.start()
+    result = results.get()
+    client.join()
+    return result
@@ -0,0 +1,248 @@
+############################################################################
+#
+#   Filename:           gnmi.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 22:08:51 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import services.gnmi_service as gnmi
+import services.mock_server as mock_server
+from services.stats import Histogram
+from benchmarks.common import usage, start_server, run_client
+
+from protos_gen import gnmi_pb2
+
+from threading import Thread
+import click
+import grpc
+import json
+import os
+import socket
+import tempfile
+import time
+
+import logging
+
+logger = logging.getLogger()
+
+benchmarks = ['get', 'set', 'subscribe', 'streamer']
+
+encodings = {
+    'json': gnmi_pb2.JSON,
+    'json_ietf': gnmi_pb2.JSON_IETF,
+    'proto': gnmi_pb2.PROTO,
+}
+
+get_path = '/state/port[port-id=*]/statistics'
+subscribe_path = '/state/port[port-id=*]/statistics'
+set_path = '/configure/port[port-id=1/1/{0}]'
+
+
+def servicer(options=None):
+    return mock_server.MockGnmi(rate=options['rate'],
+                                cardinality=options['cardinality'],
+                                updates=options['updates'],
+                                distribution=options['distribution'],
+                                count=options['notifications'],
+                                latency=options['latency'] / 1000.0,
+                                seed=0)
+
+
+def connect(port=None):
+    channel = grpc.insecure_channel('127.0.0.1:{0}'.format(port))
+    grpc.channel_ready_future(channel).result(timeout=10)
+    return gnmi.create_stub(channel=channel)
+
+
+def unary(stub=None, benchmark=None, options=None):
+    '''
+        Sends count Get or Set rpcs one after another.
+        Returns (latency histogram, number of errors).
+    '''
+    latency = Histogram(unit='us')
+    errors = 0
+    for index in range(options['count']):
+        if benchmark == 'get':
+            rpc = gnmi.Get(stub=stub, name='benchmark', rpc_type='get')
+            rpc.path(path=get_path)
+            rpc.encoding(encodings[options['encoding']])
+        else:
+            rpc = gnmi.Set(stub=stub, name='benchmark', rpc_type='set')
+            for update in range(options['updates']):
+                rpc.update(operation='update',
+                           path=set_path.format(update + 1),
+                           values=[('description', 'benchmark {0}'.format(index)),
+                                   ('admin-state', 'enable')])
+        start = time.time()
+        rpc.execute()
+        rpc.wait()
+        latency.record((time.time() - start) * 1000000)
+        if rpc.error:
+            errors += 1
+    return latency, errors
+
+
+def subscribe(stub=None, benchmark=None, options=None):
+    '''
+        Runs STREAM subscription until mock server sends all notifications.
+        NotificationStreamer sends them as json over udp to local socket.
+        Returns (TelemetryStats, number of datagrams received).
+    '''
+    # streamer and json processor understand only json_val
+    if benchmark == 'streamer' or options['processor'] == 'json':
+        encoding = 'json'
+    else:
+        encoding = options['encoding']
+    rpc = gnmi.Subscribe(stub=stub, name='benchmark', rpc_type='subscribe',
+                         mode=gnmi_pb2.SubscriptionList.STREAM,
+                         encoding=encodings[encoding])
+    rpc.subscription(path=subscribe_path, trigger=gnmi_pb2.SAMPLE, interval=10 ** 9)
+    received = [0]
+    target = None
+    if benchmark == 'streamer':
+        sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sink.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 24)
+        sink.bind(('127.0.0.1', 0))
+        sink.settimeout(1.0)
+
+        def receive():
+            while True:
+                try:
+                    sink.recv(65536)
+                except socket.timeout:
+                    if rpc.status == 'finished':
+                        return
+                    continue
+                received[0] += 1
+
+        thread = Thread(target=receive)
+        thread.daemon = True
+        thread.start()
+        rpc.stream(ip='127.0.0.1', port=sink.getsockname()[1], protocol='udp', formatting='json')
+        rpc.response_processor = rpc.stream_response_processor
+    elif options['processor'] == 'json':
+        fd, target = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        rpc.target = target
+        rpc.response_processor = rpc.json_response_processor
+    rpc.execute()
+    rpc.worker.join()
+    if benchmark == 'streamer':
+        thread.join()
+    if target:
+        os.remove(target)
+    return rpc.stats, received[0]
+
+
+def run(port=None, benchmark=None, options=None, results=None):
+    stub = connect(port)
+    cpu, rss = usage()
+    start = time.time()
+    if benchmark in ['get', 'set']:
+        latency, errors = unary(stub, benchmark, options)
+        count = options['count']
+    else:
+        stats, received = subscribe(stub, benchmark, options)
+        count = stats.notifications
+    elapsed = time.time() - start
+    cpu_end, rss_end = usage()
+    result = {
+        'benchmark': benchmark,
+        'count': count,
+        'seconds': elapsed,
+        'per_second': count / elapsed if elapsed else None,
+        'cpu_seconds': cpu_end - cpu,
+        'cpu_us_per_message': (cpu_end - cpu) * 1000000 / (count or 1),
+        # ru_maxrss is in kilobytes on linux
+        'rss_start_mb': rss / 1024.0,
+        'rss_peak_mb': rss_end / 1024.0,
+    }
+    if benchmark in ['get', 'set']:
+        result['errors'] = errors
+        result['latency'] = latency.to_dict()
+    else:
+        result['telemetry'] = stats.to_dict()
+        if benchmark == 'streamer':
+            result['datagrams'] = received
+    results.put(result)
+
+
+def report(result=None):
+    click.echo(('{benchmark:>9}: {count} in {seconds:.2f} s, {per_second:.0f}/s, '
+                'cpu {cpu_seconds:.2f} s ({cpu_us_per_message:.1f} us/msg), '
+                'rss {rss_start_mb:.1f} -> {rss_peak_mb:.1f} MB').format(**result))
+    if 'latency' in result:
+        latency = result['latency']
+        click.echo('{0:>9}  errors {1}, latency us: p50 {2}, p90 {3}, p99 {4}, max {5}'.format(
+                        '', result['errors'], latency['p50'], latency['p90'], latency['p99'],
+                        latency['max']))
+    else:
+        telemetry = result['telemetry']
+        click.echo(('{0:>9}  updates {1}, bytes {2}, decode us p50 {3}, '
+                    'sink us p50 {4}, p99 {5}').format(
+                        '', telemetry['updates'], telemetry['bytes'],
+                        telemetry['decode_time']['p50'], telemetry['sink_time']['p50'],
+                        telemetry['sink_time']['p99']))
+        if 'datagrams' in result:
+            click.echo('{0:>9}  datagrams received {1}'.format('', result['datagrams']))
+
+
+@click.command()
+@click.option('--benchmark', 'selected', multiple=True, type=click.Choice(benchmarks),
+              help='Benchmark to run, can be repeated. All are run if not specified.')
+@click.option('--repeat', default=1, type=int, help='Number of runs of every benchmark.')
+@click.option('--count', default=1000, type=int, help='Number of Get and Set rpcs.')
+@click.option('--notifications', default=100000, type=int,
+              help='Number of notifications streamed on Subscribe.')
+@click.option('--rate', default=0.0, type=float,
+              help='Notifications per second streamed by server, 0 means unlimited.')
+@click.option('--cardinality', default=1000, type=int, help='Number of leaves under subscribed path.')
+@click.option('--updates', default=10, type=int, help='Number of updates in notification and Set.')
+@click.option('--distribution', default='counter', type=click.Choice(mock_server.distributions))
+@click.option('--encoding', default='json', type=click.Choice(list(encodings)))
+@click.option('--processor', default='default', type=click.Choice(['default', 'json']),
+              help='Response processor of subscribe benchmark.')
+@click.option('--latency', default=0.0, type=float, help='Server latency of Get and Set in ms.')
+@click.option('--output', default=None, type=click.File('w'), help='Write results to file as json')
+def main(selected, repeat, count, notifications, rate, cardinality, updates, distribution,
+         encoding, processor, latency, output):
+    '''
+        Benchmark of gNMI rpcs against mock server with synthetic telemetry.
+    '''
+    logging.basicConfig(level=logging.WARNING)
+    options = {
+        'count': count,
+        'notifications': notifications,
+        'rate': rate,
+        'cardinality': cardinality,
+        'updates': updates,
+        'distribution': distribution,
+        'encoding': encoding,
+        'processor': processor,
+        'latency': latency,
+    }
+    server, port = start_server(servicer, options)
+    results = []
+    try:
+        for benchmark in [item for item in benchmarks if not selected or item in selected]:
+            for _ in range(repeat):
+                result = run_client(run, port, benchmark, options)
+                report(result)
+                results.append(result)
+    finally:
+        server.terminate()
+    if output:
+        json.dump({'options': options, 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+############################################################################
+#
+#   Filename:           rib_modify.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 20:58:13 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import services.rib_api_service as rib_api
+import services.rib_generators as rib_generators
+import services.mock_server as mock_server
+from benchmarks.common import usage, start_server, run_client
+
+import click
+import grpc
+import json
+import time
+
+import logging
+
+logger = logging.getLogger()
+
+default_sizes = '10000,100000,1000000'
+
+
+def routes(count=None, first='10.0.0.0', tunnels=16):
+    '''
+        Yields count ipv4 /32 route add requests with next hop spread
+        over tunnels endpoints, requests are built lazily.
+    '''
+    return rib_generators.route_requests(
+                prefixes=rib_generators.prefix_range(first='{0}/32'.format(first), count=count),
+                operation='add',
+                key_preference=1,
+                rtm_preference=10,
+                metric=1,
+                next_hops=list(rib_generators.prefix_range(first='192.0.2.1', count=tunnels)))
+
+
+def servicer(options=None):
+    return mock_server.MockRibApi(ack_latency=options['ack_latency'] / 1000.0,
+                                  failure_rate=options['failure_rate'],
+                                  batch_cost=options['batch_cost'] / 1000.0,
+                                  request_cost=options['request_cost'] / 1000000.0,
+                                  seed=0)
+
+
+def run(port=None, size=None, options=None, results=None):
+    '''
+        Programs size routes over Modify and reports measurements
+        through results queue. Runs in its own process, so CPU time
+        and memory belong only to client of one run.
+    '''
+    target = '127.0.0.1:{0}'.format(port)
+    channels = [grpc.insecure_channel(target) for _ in range(options['shards'])]
+    for channel in channels:
+        grpc.channel_ready_future(channel).result(timeout=10)
+    stubs = [rib_api.create_stub(service='RibApi', channel=channel) for channel in channels]
+    if options['shards'] > 1:
+        rpc = rib_api.ShardedModify(stubs=stubs, name='benchmark', rpc_type='rib_modify',
+                                    batch_size=options['batch_size'],
+                                    max_in_flight=options['max_in_flight'])
+        rpcs = rpc.shards
+    else:
+        rpc = rib_api.Modify(stub=stubs[0], name='benchmark', rpc_type='rib_modify',
+                             batch_size=options['batch_size'],
+                             max_in_flight=options['max_in_flight'])
+        rpcs = [rpc]
+    cpu, rss = usage()
+    start = time.time()
+    rpc.load(routes(size))
+    rpc.execute()
+    rpc.wait()
+    elapsed = time.time() - start
+    cpu_end, rss_end = usage()
+    rpc.cancel()
+    stats = rpc.statistics()
+    counters = {}
+    for item in rpcs:
+        for name, count in item.processed_request.counters.items():
+            counters[name] = counters.get(name, 0) + count
+    results.put({
+        'routes': size,
+        'seconds': elapsed,
+        'routes_per_second': size / elapsed if elapsed else None,
+        'cpu_seconds': cpu_end - cpu,
+        'cpu_us_per_route': (cpu_end - cpu) * 1000000 / size,
+        # ru_maxrss is in kilobytes on linux
+        'rss_start_mb': rss / 1024.0,
+        'rss_peak_mb': rss_end / 1024.0,
+        'ok': counters.get('OK', 0),
+        'failed': counters.get('FAILED', 0),
+        'latency': stats.latency.to_dict(),
+        'tables': stats.to_dict()['tables'],
+    })
+
+
+def report(result=None):
+    latency = result['latency']
+    click.echo(('{routes:>9} routes: {seconds:8.2f} s, {routes_per_second:10.0f} routes/s, '
+                'cpu {cpu_seconds:7.2f} s ({cpu_us_per_route:.1f} us/route), '
+                'rss {rss_start_mb:.1f} -> {rss_peak_mb:.1f} MB, '
+                'ok {ok}, failed {failed}').format(**result))
+    click.echo('{0:>9} ack latency us: p50 {1}, p90 {2}, p99 {3}, p99.9 {4}, max {5}'.format(
+                    '', latency['p50'], latency['p90'], latency['p99'], latency['p99.9'],
+                    latency['max']))
+
+
+@click.command()
+@click.option('--sizes', default=default_sizes, type=str,
+              help='Comma separated numbers of routes programmed in each run.')
+@click.option('--repeat', default=1, type=int, help='Number of runs of every size.')
+@click.option('--batch_size', default=1000, type=int, help='Max number of requests in ModifyRequest.')
+@click.option('--max_in_flight', default=10000, type=int, help='Max number of unacknowledged requests.')
+@click.option('--shards', default=1, type=int, help='Number of parallel Modify streams.')
+@click.option('--ack_latency', default=1.0, type=float, help='Latency of server result in ms.')
+@click.option('--failure_rate', default=0.0, type=float, help='Probability of FAILED result.')
+@click.option('--batch_cost', default=0.0, type=float, help='Server processing time of ModifyRequest in ms.')
+@click.option('--request_cost', default=0.0, type=float, help='Server processing time of request in us.')
+@click.option('--output', default=None, type=click.File('w'), help='Write results to file as json')
+def main(sizes, repeat, batch_size, max_in_flight, shards, ack_latency, failure_rate,
+         batch_cost, request_cost, output):
+    '''
+        Benchmark of RibApi Modify against mock server.
+
+        Server and every client run are separate processes, so client
+        CPU time and peak memory are not affected by server or by
+        previous runs.
+    '''
+    logging.basicConfig(level=logging.WARNING)
+    options = {
+        'batch_size': batch_size,
+        'max_in_flight': max_in_flight,
+        'shards': shards,
+        'ack_latency': ack_latency,
+        'failure_rate': failure_rate,
+        'batch_cost': batch_cost,
+        'request_cost': request_cost,
+    }
+    server, port = start_server(servicer, options)
+    results = []
+    try:
+        for size in [int(size) for size in sizes.split(',')]:
+            for _ in range(repeat):
+                result = run_client(run, port, size, options)
+                report(result)
+                results.append(result)
+    finally:
+        server.terminate()
+    if output:
+        json.dump({'options': options, 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
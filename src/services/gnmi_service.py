@@ -15,6 +15,7 @@
 ############################################################################
 
 import grpc_lib
+from stats import Histogram, RateGauge
 
 from protos_gen import gnmi_pb2 as gnmi
 from protos_gen import gnmi_pb2_grpc as gnmi_stub
@@ -25,8 +26,14 @@ except:
     from itertools import izip_longest as zip_longest
 
 from collections import OrderedDict
+from array import array
+from threading import Thread, Lock
 import json
+import os
 import socket
+import struct
+import sys
+import time
 
 from google.protobuf import json_format
 
@@ -34,8 +41,22 @@ from logging import getLogger
 
 logger = getLogger(__name__)
 
+try:
+    array('q')
+    int64_typecode = 'q'
+except ValueError:
+    # python2 array doesnt know long long
+    int64_typecode = 'l'
+
 def create_stub(service=None, channel=None):
-    return gnmi_stub.gNMIStub(channel)
+    stub = gnmi_stub.gNMIStub(channel)
+    # Subscribe responses are left serialized on this method, so receiver
+    # can account wire size and decode time of each message
+    stub.SubscribeRaw = channel.stream_stream(
+                            '/gnmi.gNMI/Subscribe',
+                            request_serializer=gnmi.SubscribeRequest.SerializeToString,
+                            response_deserializer=None)
+    return stub
 
 yang2json_map = {
     "string":"string",
@@ -75,6 +96,46 @@ def str_path_to_proto(str_proto_el):
         return dict(name=str_proto_el, key={})
 
 
+def proto_path_to_str(path=None, delimiter='/'):
+    # inverse of translate_path, keys are sorted so the same path
+    # always results in the same string
+    elements = []
+    for el in path.elem:
+        keys = ''.join(['[{0}={1}]'.format(key, path_key)
+                        for key, path_key in sorted(el.key.items())])
+        elements.append(el.name + keys)
+    return delimiter.join(elements)
+
+
+def typed_value_to_python(val=None):
+    value_type = val.WhichOneof('value')
+    if value_type in ['json_val', 'json_ietf_val']:
+        return json.loads(getattr(val, value_type))
+    elif value_type == 'decimal_val':
+        return val.decimal_val.digits / float(10 ** val.decimal_val.precision)
+    elif value_type == 'leaflist_val':
+        return [typed_value_to_python(el) for el in val.leaflist_val.element]
+    elif value_type:
+        return getattr(val, value_type)
+    return None
+
+
+def path_match(pattern=None, elems=None):
+    '''
+        Returns True if list of PathElems in elems starts with pattern.
+        Keys which are missing in pattern or have value * match any value.
+    '''
+    if len(elems) < len(pattern):
+        return False
+    for pattern_el, el in zip(pattern, elems):
+        if pattern_el.name != el.name and pattern_el.name != '*':
+            return False
+        for key, value in pattern_el.key.items():
+            if value != '*' and el.key.get(key) != value:
+                return False
+    return True
+
+
 def values_to_dict(dict_data=None, values=None, types=None):
     res = dict()
     names = [x[0] for x in values]
@@ -358,12 +419,14 @@ class Subscribe(grpc_lib.Rpc):
 
         grpc_lib.Rpc.__init__(self, *args, **kwargs)
 
-        self.stub_method = self.stub.Subscribe
+        self.stub_method = getattr(self.stub, 'SubscribeRaw', self.stub.Subscribe)
         self.target = None
         self.response_processor = self.default_response_processor
 
         self._subscriptions = []
-        self._prefix = prefix
+        self._prefix = None
+        if prefix:
+            self.prefix(prefix=prefix, delimiter=self.delimiter or self.default_delimiter)
         self._mode = mode
         self._qos = qos
         self._allow_aggregation = allow_aggregation
@@ -375,6 +438,11 @@ class Subscribe(grpc_lib.Rpc):
         self.unprocessed_subs = False
 
         self._request = None
+        self.sink = None
+        self.watchdog = None
+        self.multiplexer = None
+        self.snapshots = None
+        self.stats = TelemetryStats()
 
         self.request_type = 'streaming'
 
@@ -402,10 +470,48 @@ class Subscribe(grpc_lib.Rpc):
         self.rpc_handler = self.stub_method(self.generator(),
                                             metadata = self.metadata,
                                             timeout = self._timeout)
-        for msg in self.rpc_handler:
-            self.response_processor(msg)
-            self.status = 'waiting'
-            
+        if self.watchdog:
+            self.watchdog.reset()
+        try:
+            for msg in self.rpc_handler:
+                if isinstance(msg, bytes):
+                    start = time.time()
+                    data = msg
+                    msg = gnmi.SubscribeResponse.FromString(data)
+                    self.stats.decoded(size=len(data), duration=time.time() - start)
+                self.handle(msg)
+        finally:
+            # rows buffered in columnar sink would be lost otherwise
+            if self.sink:
+                self.sink.flush()
+
+
+    def handle(self, msg=None):
+        '''
+            Processes one SubscribeResponse, either from own stream
+            or dispatched by SubscriptionMultiplexer.
+        '''
+        received = time.time()
+        if self.watchdog:
+            self.watchdog.process(msg)
+        self.response_processor(msg)
+        self.stats.processed(response=msg, received=received,
+                             duration=time.time() - received)
+        self.status = 'waiting'
+
+
+    def execute(self, timeout=None):
+        if self.multiplexer:
+            self.multiplexer.attach(self)
+            return
+        grpc_lib.Rpc.execute(self, timeout=timeout)
+
+
+    def cancel(self):
+        if self.multiplexer:
+            self.multiplexer.detach(self)
+            return
+        grpc_lib.Rpc.cancel(self)
 
 
     def default_response_processor(self, response = None):
@@ -448,8 +554,52 @@ class Subscribe(grpc_lib.Rpc):
 
 
     def poll(self):
+        if self.multiplexer:
+            self.multiplexer.poll(self)
+            return
         self.unprocessed_poll = True
 
+    def resubscribe(self, timeout=10):
+        '''
+            Cancels running stream and sends whole subscription list
+            again on new one.
+        '''
+        worker = self.worker
+        self.cancel()
+        if worker:
+            worker.join(timeout)
+            # work queued before old worker finishes would be dropped with
+            # its work queue, new stream would never send subscriptions
+            if worker.is_alive():
+                logger.error('{0}: stream did not finish in {1} seconds, not resubscribed'.format(
+                                                                            self.name, timeout))
+                return False
+        self.unprocessed_subs = True
+        self.execute()
+        return True
+
+    def watch(self, multiplier=3, resubscribe=False, tick=1, callback=None):
+        '''
+            Starts SubscriptionWatchdog for this rpc.
+
+            Args:
+                multiplier (int): path is considered stale when it didnt
+                    receive any update for multiplier times its sample or
+                    heartbeat interval.
+                resubscribe (bool): if True, stale path triggers resubscribe.
+                tick (int): granularity of checks in seconds.
+                callback: function called with path and seconds of silence
+                    for each stale path.
+        '''
+        if self.watchdog:
+            self.watchdog.stop()
+        self.watchdog = SubscriptionWatchdog(rpc=self,
+                                             multiplier=multiplier,
+                                             resubscribe=resubscribe,
+                                             tick=tick,
+                                             callback=callback)
+        self.watchdog.start()
+
     def json_response_processor(self, response = None):
         '''
             Translates incoming notifications to JSON and stores them in target.
@@ -494,14 +644,41 @@ class Subscribe(grpc_lib.Rpc):
                 fd.write('{msg}\n'.format(msg=json.dumps(output_msg)))
             else:
                 output_msg = {}
-                output_msg['notification'] = str(response)
+                output_msg['notification'] = json_format.MessageToDict(response,
+                                                    preserving_proto_field_name=True)
                 output_msg['timestamp'] = response.update.timestamp
-                output_msg['update_type'] = 'sync'
+                output_msg['update_type'] = 'sync' if response.sync_response else 'error'
                 fd.write('{msg}\n'.format(msg=json.dumps(output_msg)))
 
     def stream_response_processor(self, response = None):
         self.streamer.send(response)
 
+    def columnar_response_processor(self, response = None):
+        self.sink.process(response)
+
+    def snapshot_response_processor(self, response = None):
+        self.snapshots.process(response)
+
+    def snapshot(self, target=None, delta=True):
+        '''
+            Creates SnapshotTracker which assembles updates received until
+            sync_response into Snapshot and writes its difference against
+            previous snapshot (or whole snapshot if delta is False) to target.
+        '''
+        self.snapshots = SnapshotTracker(target=target, delta=delta,
+                                         delimiter=self.delimiter or self.default_delimiter)
+
+    def columnar(self, target=None, block_size=65536, flush_interval=60):
+        '''
+            Creates ColumnarSink which stores numeric values from incoming
+            notifications as blocks of .npy files in target directory.
+        '''
+        if self.sink:
+            self.sink.flush()
+        self.sink = ColumnarSink(target=target,
+                                 block_size=block_size,
+                                 flush_interval=flush_interval)
+
     def stream(self, ip = None, port = None, protocol = None, formatting=None):
         self.streamer = NotificationStreamer(ip=ip, port=port,
                                              server_addr=self.server_addr,
@@ -598,3 +775,744 @@ class NotificationStreamer(object):
 
         
 
+
+
+
+class SubscriptionMultiplexer(object):
+    '''
+        Shares Subscribe streams between Subscribe rpcs (consumers) created
+        for the same target.
+
+        Consumers with the same mode, encoding, prefix, qos and aliases are
+        compatible and their subscriptions are merged into one
+        SubscriptionList sent over one stream. Identical paths with same
+        trigger are subscribed only once with the shortest requested
+        interval. Each update from shared stream is delivered only to
+        consumers with matching subscription path, sync_response and
+        error messages are delivered to all consumers of the stream.
+        SAMPLE updates of STREAM subscriptions are delivered to consumer
+        with longer interval only once per its own interval, measured by
+        notification timestamps of every path.
+
+        gNMI doesnt allow changing subscriptions of running stream, so
+        attaching or detaching consumer restarts the shared stream. Stream
+        is restarted outside of lock, so dispatch and poll of other streams
+        are not blocked while old stream finishes.
+    '''
+
+    def __init__(self, stub=None, metadata=None, server_addr=None,
+                 server_port=None, name='multiplexer'):
+        self.stub = stub
+        self.metadata = metadata
+        self.server_addr = server_addr
+        self.server_port = server_port
+        self.name = name
+        # compatibility key -> shared Subscribe rpc
+        self.streams = OrderedDict()
+        # compatibility key -> list of consumers
+        self.consumers = OrderedDict()
+        # compatibility key -> list of (consumer, list of (subscription
+        # path, sample interval of consumer or 0 if every sample is
+        # delivered, slack in ns)))
+        self.patterns = {}
+        # (consumer, path) -> timestamp of last sample delivered to consumer
+        self.delivered = {}
+        self.lock = Lock()
+        # serializes restarts of shared streams
+        self.restarting = Lock()
+
+    def __str__(self):
+        display = '\nSubscriptionMultiplexer - {name}\n'.format(name=self.name)
+        if not self.streams:
+            display += '    No shared streams\n'
+        for key, stream in self.streams.items():
+            display += ('\n    stream {name}:\n'
+                        '        status: {status}\n'
+                        '        consumers: {consumers}\n'
+                        '        subscriptions: {subs}\n').format(
+                            name=stream.name,
+                            status=stream.status,
+                            consumers=', '.join([c.name for c in self.consumers[key]]),
+                            subs=', '.join([proto_path_to_str(sub.path) for sub in stream._subscriptions]))
+        return display
+
+    @staticmethod
+    def compatibility_key(rpc=None):
+        return (rpc._mode,
+                rpc._encoding,
+                rpc._qos,
+                bool(rpc._use_aliases),
+                rpc._prefix.SerializeToString() if rpc._prefix else None)
+
+    @staticmethod
+    def merge(consumers=None):
+        merged = OrderedDict()
+        for consumer in consumers:
+            for sub in consumer._subscriptions:
+                key = (sub.path.SerializeToString(), sub.mode, sub.suppress_redundant)
+                if key not in merged:
+                    merged[key] = gnmi.Subscription()
+                    merged[key].CopyFrom(sub)
+                    continue
+                # same path and trigger, shorter interval satisfies both
+                for interval in ['sample_interval', 'heartbeat_interval']:
+                    current = getattr(merged[key], interval)
+                    requested = getattr(sub, interval)
+                    if requested and (not current or requested < current):
+                        setattr(merged[key], interval, requested)
+        return list(merged.values())
+
+    @staticmethod
+    def decimated(stream=None, sub=None, merged=None):
+        '''
+            Returns (interval, slack) in ns for consumer subscription sub,
+            interval is 0 if all samples of merged subscription belong to it.
+        '''
+        if stream._mode not in [None, 'STREAM', gnmi.SubscriptionList.STREAM]:
+            return 0, 0
+        if sub.mode != gnmi.SAMPLE or not merged.sample_interval:
+            return 0, 0
+        if sub.sample_interval <= merged.sample_interval:
+            return 0, 0
+        # samples of shared stream jitter around multiples of its interval
+        return sub.sample_interval, merged.sample_interval // 2
+
+    def attach(self, consumer=None):
+        '''
+            Adds consumer to compatible shared stream and (re)starts it.
+        '''
+        with self.restarting:
+            with self.lock:
+                key = self._attach(consumer)
+                restart = self._update(key)
+            self._restart(key, restart)
+
+    def _attach(self, consumer=None):
+        key = self.compatibility_key(consumer)
+        if key not in self.streams:
+            stream = Subscribe(stub=self.stub,
+                               metadata=self.metadata,
+                               server_addr=self.server_addr,
+                               server_port=self.server_port,
+                               name='{0}-{1}'.format(self.name, len(self.streams)),
+                               rpc_type=consumer.rpc_type,
+                               mode=consumer._mode,
+                               qos=consumer._qos,
+                               encoding=consumer._encoding,
+                               use_aliases=consumer._use_aliases,
+                               use_models=consumer._use_models)
+            stream._prefix = consumer._prefix
+            stream.response_processor = lambda msg, key=key: self.dispatch(key, msg)
+            self.streams[key] = stream
+            self.consumers[key] = []
+        if consumer not in self.consumers[key]:
+            self.consumers[key].append(consumer)
+        consumer.status = 'multiplexed'
+        return key
+
+    def detach(self, consumer=None):
+        '''
+            Removes consumer from its shared stream. Stream without
+            consumers is cancelled.
+        '''
+        with self.restarting:
+            with self.lock:
+                key = self.compatibility_key(consumer)
+                if consumer not in self.consumers.get(key, []):
+                    return
+                self.consumers[key].remove(consumer)
+                consumer.status = 'finished'
+                # dispatch adds items meanwhile, keys are copied at once
+                for item in list(self.delivered):
+                    if item[0] is consumer:
+                        self.delivered.pop(item, None)
+                if consumer.sink:
+                    consumer.sink.flush()
+                if not self.consumers[key]:
+                    stream = self.streams.pop(key)
+                    del self.consumers[key]
+                    del self.patterns[key]
+                else:
+                    stream = None
+                    restart = self._update(key)
+            if stream:
+                stream.cancel()
+            else:
+                self._restart(key, restart)
+
+    def _update(self, key=None):
+        '''
+            Updates patterns and subscriptions of shared stream, returns
+            True if stream has to be (re)started.
+        '''
+        stream = self.streams[key]
+        subscriptions = self.merge(self.consumers[key])
+        merged = dict([((sub.path.SerializeToString(), sub.mode, sub.suppress_redundant), sub)
+                       for sub in subscriptions])
+        patterns = []
+        for consumer in self.consumers[key]:
+            consumer_prefix = list(consumer._prefix.elem) if consumer._prefix else []
+            consumer_patterns = []
+            for sub in consumer._subscriptions:
+                shared = merged[(sub.path.SerializeToString(), sub.mode, sub.suppress_redundant)]
+                interval, slack = self.decimated(stream, sub, shared)
+                consumer_patterns.append((consumer_prefix + list(sub.path.elem), interval, slack))
+            patterns.append((consumer, consumer_patterns))
+        self.patterns[key] = patterns
+
+        running = stream.worker and stream.worker.is_alive()
+        if ([sub.SerializeToString() for sub in subscriptions] !=
+            [sub.SerializeToString() for sub in stream._subscriptions] or
+            not running):
+            stream._subscriptions = subscriptions
+            return True
+        return False
+
+    def _restart(self, key=None, restart=False):
+        # called without lock, old stream can take a while to finish
+        stream = self.streams.get(key)
+        if stream is None:
+            return
+        if restart:
+            if stream.worker and stream.worker.is_alive():
+                stream.resubscribe()
+            else:
+                stream.unprocessed_subs = True
+                stream.execute()
+        with self.lock:
+            for consumer in self.consumers.get(key, []):
+                consumer.worker = stream.worker
+
+    def poll(self, consumer=None):
+        stream = self.streams.get(self.compatibility_key(consumer))
+        if stream:
+            stream.poll()
+            stream.execute()
+
+    def dispatch(self, key=None, response=None):
+        patterns = self.patterns.get(key, [])
+        if not response.HasField('update') or not response.update.update:
+            # sync_response, error and notifications with deletes only
+            for consumer, _ in patterns:
+                consumer.handle(response)
+            return
+        prefix = list(response.update.prefix.elem)
+        paths = [prefix + list(upd.path.elem) for upd in response.update.update]
+        timestamp = response.update.timestamp or int(time.time() * 10 ** 9)
+        for consumer, consumer_patterns in patterns:
+            matched = []
+            for index, path in enumerate(paths):
+                for pattern, interval, slack in consumer_patterns:
+                    if path_match(pattern, path):
+                        if not interval or self.due(consumer, path, interval, slack, timestamp):
+                            matched.append(index)
+                        break
+            if not matched:
+                continue
+            if len(matched) == len(paths):
+                consumer.handle(response)
+                continue
+            filtered = gnmi.SubscribeResponse()
+            filtered.CopyFrom(response)
+            del filtered.update.update[:]
+            filtered.update.update.extend([response.update.update[index] for index in matched])
+            consumer.handle(filtered)
+
+    def due(self, consumer=None, path=None, interval=None, slack=None, timestamp=None):
+        '''
+            Returns True if sample of path with timestamp is delivered to
+            consumer with sample interval longer than one of shared stream.
+        '''
+        item = (consumer, tuple([(elem.name, tuple(sorted(elem.key.items()))) for elem in path]))
+        last = self.delivered.get(item)
+        if last is not None and timestamp - last < interval - slack:
+            return False
+        self.delivered[item] = timestamp
+        return True
+
+
+class TelemetryStats(object):
+    '''
+        Throughput and latency counters of one Subscribe rpc.
+
+        decode_time is time spent deserializing SubscribeResponse, sink_time
+        is time spent in response_processor and lag is difference between
+        local receive time and notification timestamp set by router.
+        Lag is meaningful only with synchronized clocks, notifications with
+        timestamp from future are counted in clock_skew and recorded as 0.
+    '''
+
+    def __init__(self):
+        self.reset()
+
+    def __str__(self):
+        return ('    notifications: {notifications} ({rate})\n'
+                '    updates: {updates}\n'
+                '    sync responses: {sync}\n'
+                '    errors: {errors}\n'
+                '    bytes received: {bytes}\n'
+                '    updates per notification: {upn}\n'
+                '    decode time: {decode}\n'
+                '    sink time: {sink}\n'
+                '    lag: {lag}\n'
+                '    clock skew: {skew}\n').format(
+                    notifications=self.notifications,
+                    rate=self.rate,
+                    updates=self.updates,
+                    sync=self.sync_responses,
+                    errors=self.errors,
+                    bytes=self.bytes,
+                    upn=self.updates_per_notification,
+                    decode=self.decode_time,
+                    sink=self.sink_time,
+                    lag=self.lag,
+                    skew=self.clock_skew)
+
+    def reset(self):
+        self.notifications = 0
+        self.updates = 0
+        self.sync_responses = 0
+        self.errors = 0
+        self.bytes = 0
+        self.clock_skew = 0
+        self.rate = RateGauge()
+        self.updates_per_notification = Histogram(unit='updates')
+        self.decode_time = Histogram(unit='us')
+        self.sink_time = Histogram(unit='us')
+        self.lag = Histogram(unit='ms')
+
+    def decoded(self, size=None, duration=None):
+        self.bytes += size
+        self.decode_time.record(duration * 10 ** 6)
+
+    def processed(self, response=None, received=None, duration=None):
+        self.sink_time.record(duration * 10 ** 6)
+        if response.HasField('update'):
+            updates = len(response.update.update) + len(response.update.delete)
+            self.notifications += 1
+            self.updates += updates
+            self.rate.add(1, received)
+            self.updates_per_notification.record(updates)
+            if response.update.timestamp:
+                lag = received * 10 ** 3 - response.update.timestamp / float(10 ** 6)
+                if lag < 0:
+                    self.clock_skew += 1
+                self.lag.record(lag)
+        elif response.sync_response:
+            self.sync_responses += 1
+        else:
+            self.errors += 1
+
+    def to_dict(self):
+        return {'notifications': self.notifications,
+                'notifications_per_second': self.rate.rate(),
+                'updates': self.updates,
+                'sync_responses': self.sync_responses,
+                'errors': self.errors,
+                'bytes': self.bytes,
+                'clock_skew': self.clock_skew,
+                'updates_per_notification': self.updates_per_notification.to_dict(),
+                'decode_time': self.decode_time.to_dict(),
+                'sink_time': self.sink_time.to_dict(),
+                'lag': self.lag.to_dict()}
+
+
+class Snapshot(object):
+    '''
+        State of all leafs received in one ONCE or POLL cycle. Values are
+        stored in flat dictionary keyed by path of the leaf.
+    '''
+    __slots__ = ['cycle', 'timestamp', 'values']
+
+    def __init__(self, cycle=None, timestamp=None, values=None):
+        self.cycle = cycle
+        self.timestamp = timestamp
+        self.values = values if values is not None else {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def diff(self, previous=None):
+        '''
+            Returns dictionary with added and changed leafs and list of
+            removed paths against previous snapshot.
+        '''
+        old = previous.values if previous else {}
+        added = {}
+        changed = {}
+        for path, value in self.values.items():
+            if path not in old:
+                added[path] = value
+            elif old[path] != value:
+                changed[path] = value
+        removed = [path for path in old if path not in self.values]
+        return {'added': added, 'changed': changed, 'removed': removed}
+
+
+class SnapshotTracker(object):
+    '''
+        Assembles notifications of ONCE and POLL subscriptions into Snapshots.
+        Snapshot is closed by sync_response and then either its delta against
+        previous snapshot or the snapshot itself is emitted as one json line
+        to target file (or logged if no target is set).
+    '''
+
+    def __init__(self, target=None, delta=True, delimiter='/'):
+        self.target = target
+        self.delta = delta
+        self.delimiter = delimiter
+        self.cycle = 0
+        self.current = Snapshot(cycle=self.cycle, timestamp=0)
+        self.last = None
+
+    def set(self, path=None, value=None):
+        if isinstance(value, dict):
+            for name, leaf in value.items():
+                self.set(path=path + self.delimiter + name, value=leaf)
+        else:
+            self.current.values[path] = value
+
+    def process(self, response=None):
+        if response.HasField('update'):
+            notification = response.update
+            if notification.timestamp > self.current.timestamp:
+                self.current.timestamp = notification.timestamp
+            prefix = proto_path_to_str(notification.prefix, delimiter=self.delimiter)
+            for dlt in notification.delete:
+                path = proto_path_to_str(dlt, delimiter=self.delimiter)
+                path = prefix + self.delimiter + path if prefix else path
+                for leaf in [leaf for leaf in self.current.values
+                             if leaf == path or leaf.startswith(path + self.delimiter)]:
+                    del self.current.values[leaf]
+            for upd in notification.update:
+                path = proto_path_to_str(upd.path, delimiter=self.delimiter)
+                if prefix:
+                    path = prefix + self.delimiter + path if path else prefix
+                self.set(path=path, value=typed_value_to_python(upd.val))
+        elif response.sync_response:
+            self.close()
+        else:
+            logger.error(response)
+
+    def close(self):
+        snapshot = self.current
+        output_msg = {}
+        output_msg['cycle'] = snapshot.cycle
+        output_msg['timestamp'] = snapshot.timestamp
+        output_msg['size'] = len(snapshot)
+        if self.delta:
+            output_msg['update_type'] = 'delta'
+            output_msg.update(snapshot.diff(self.last))
+        else:
+            output_msg['update_type'] = 'snapshot'
+            output_msg['values'] = snapshot.values
+        self.emit(output_msg)
+        self.last = snapshot
+        self.cycle += 1
+        self.current = Snapshot(cycle=self.cycle, timestamp=0)
+        return snapshot
+
+    def emit(self, output_msg=None):
+        if self.target:
+            with open(self.target, 'a') as fd:
+                fd.write('{msg}\n'.format(msg=json.dumps(output_msg)))
+        else:
+            logger.info(json.dumps(output_msg))
+
+
+class SubscriptionWatchdog(object):
+    '''
+        Tracks time of last update for each subscription path of Subscribe rpc
+        and reports paths which went silent for longer than multiplier times
+        their sample_interval (SAMPLE) or heartbeat_interval (ON_CHANGE,
+        TARGET_DEFINED). Paths without any interval are not watched.
+
+        Deadlines are kept in hashed timer wheel. Incoming update only
+        rewrites deadline of its path, entries are moved to correct slot
+        lazily once their original slot expires, so the cost on receive
+        path is one dict lookup per update.
+    '''
+
+    def __init__(self, rpc=None, multiplier=3, resubscribe=False, tick=1,
+                 slots=512, callback=None):
+        self.rpc = rpc
+        self.multiplier = multiplier
+        self.resubscribe = resubscribe
+        self.tick = tick
+        self.slots = slots
+        self.callback = callback
+
+        self.patterns = []
+        self.timeouts = {}
+        self.deadlines = {}
+        self.last_seen = {}
+        self.stale = {}
+        self.stale_events = 0
+        self.resubscriptions = 0
+
+        self.wheel = [set() for _ in range(slots)]
+        self.position = 0
+        self.lock = Lock()
+        self.running = False
+        self.worker = None
+
+    def __str__(self):
+        now = time.time()
+        display = 'SubscriptionWatchdog - multiplier: {0}, stale events: {1}, resubscriptions: {2}\n'.format(
+                                                                                self.multiplier,
+                                                                                self.stale_events,
+                                                                                self.resubscriptions)
+        if not self.timeouts:
+            display += '    No paths with sample or heartbeat interval are watched\n'
+        for path in self.timeouts:
+            last_seen = self.last_seen.get(path)
+            display += '    {path}\n        timeout: {timeout}s, last update: {last}, state: {state}\n'.format(
+                            path=path,
+                            timeout=self.timeouts[path],
+                            last='{0:.1f}s ago'.format(now - last_seen) if last_seen else 'never',
+                            state='stale' if path in self.stale else 'ok')
+        return display
+
+    def reset(self):
+        '''
+            Rebuilds watched paths from subscriptions of rpc and
+            restarts all deadlines.
+        '''
+        prefix = list(self.rpc._prefix.elem) if self.rpc._prefix else []
+        with self.lock:
+            self.patterns = []
+            self.timeouts = {}
+            self.deadlines = {}
+            self.stale = {}
+            self.wheel = [set() for _ in range(self.slots)]
+            now = time.time()
+            for sub in self.rpc._subscriptions:
+                if sub.mode == gnmi.SAMPLE:
+                    interval = sub.sample_interval
+                else:
+                    interval = sub.heartbeat_interval
+                if not interval:
+                    continue
+                path = proto_path_to_str(sub.path)
+                self.patterns.append((prefix + list(sub.path.elem), path))
+                self.timeouts[path] = self.multiplier * interval / float(10 ** 9)
+                self._schedule(path, now + self.timeouts[path])
+
+    def _schedule(self, path=None, deadline=None):
+        self.deadlines[path] = deadline
+        self.wheel[int(deadline / self.tick) % self.slots].add(path)
+
+    def process(self, response=None):
+        if not response.HasField('update') or not self.patterns:
+            return
+        now = time.time()
+        prefix = list(response.update.prefix.elem)
+        for upd in response.update.update:
+            elems = prefix + list(upd.path.elem)
+            for pattern, path in self.patterns:
+                if path_match(pattern, elems):
+                    self.touch(path, now)
+                    break
+
+    def touch(self, path=None, now=None):
+        # runs on receiver thread, advance() walks the same state
+        with self.lock:
+            self.last_seen[path] = now
+            self.deadlines[path] = now + self.timeouts[path]
+            since = self.stale.pop(path, None)
+        if since is not None:
+            logger.info('Subscription path {0} received data after {1:.1f}s of silence'.format(
+                                                                path, now - since))
+
+    def advance(self, now=None):
+        '''
+            Walks wheel slots up to now and returns list of paths which
+            became stale.
+        '''
+        expired = []
+        with self.lock:
+            current = int(now / self.tick)
+            if not self.position:
+                self.position = current
+            # every slot has to be visited at most once per check
+            for position in range(self.position, min(current, self.position + self.slots) + 1):
+                slot = self.wheel[position % self.slots]
+                for path in list(slot):
+                    deadline = self.deadlines.get(path)
+                    if deadline is None or int(deadline / self.tick) % self.slots != position % self.slots:
+                        slot.discard(path)
+                        if deadline is not None:
+                            self.wheel[int(deadline / self.tick) % self.slots].add(path)
+                    elif deadline <= now:
+                        slot.discard(path)
+                        if path not in self.stale:
+                            self.stale[path] = self.last_seen.get(path) or (deadline - self.timeouts[path])
+                            self.stale_events += 1
+                            expired.append((path, now - self.stale[path]))
+                        # keep reporting silence each timeout period
+                        self._schedule(path, now + self.timeouts[path])
+            self.position = current + 1
+        for path, silence in expired:
+            logger.warning('Subscription path {0} is stale, no data for {1:.1f}s'.format(path, silence))
+            if self.callback:
+                self.callback(path, silence)
+        return [path for path, _ in expired]
+
+    def run(self):
+        while self.running:
+            time.sleep(self.tick)
+            # exception must not end the thread, staleness would not be checked anymore
+            try:
+                if self.advance(time.time()) and self.resubscribe:
+                    self.resubscriptions += 1
+                    logger.warning('Resubscribing {0} because of stale paths'.format(self.rpc.name))
+                    try:
+                        self.rpc.resubscribe()
+                    except Exception as e:
+                        logger.error('Resubscribe of {0} failed: {1}'.format(self.rpc.name, e))
+            except Exception as e:
+                logger.error('Watchdog of {0} failed: {1}'.format(self.rpc.name, e))
+
+    def start(self):
+        self.reset()
+        self.running = True
+        self.worker = Thread(target=self.run)
+        self.worker.daemon = True
+        self.worker.start()
+
+    def stop(self):
+        self.running = False
+
+
+class ColumnarSink(object):
+    '''
+        Accumulates numeric values from incoming notifications in column
+        buffers and flushes them as blocks to target directory.
+
+        Each block consists of three files which can be loaded directly
+        by numpy.load:
+            block_<n>.timestamp.npy - int64 timestamps in nanoseconds
+            block_<n>.path_id.npy - unsigned path ids
+            block_<n>.value.npy - float64 values
+        Mapping of path ids to paths is kept in paths.json and rewritten
+        with each flushed block. Non numeric values are not stored, only
+        counted in skipped attribute.
+    '''
+    columns = [('timestamp', 'i'), ('path_id', 'u'), ('value', 'f')]
+
+    def __init__(self, target=None, block_size=65536, flush_interval=60,
+                 delimiter='/'):
+        if not target:
+            raise ValueError('target has to contain path to directory')
+        if not os.path.isdir(target):
+            os.makedirs(target)
+        self.target = target
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self.delimiter = delimiter
+
+        self.path_ids = {}
+        self.paths = []
+        self.block = 0
+        self.rows = 0
+        self.skipped = 0
+        self.last_flush = time.time()
+        self._new_buffers()
+
+    def __str__(self):
+        return ('ColumnarSink:\n'
+                '   target: {target}\n'
+                '   blocks written: {block}\n'
+                '   rows written: {rows}\n'
+                '   rows buffered: {buffered}\n'
+                '   distinct paths: {paths}\n'
+                '   skipped values: {skipped}').format(
+                        target=self.target,
+                        block=self.block,
+                        rows=self.rows,
+                        buffered=len(self.timestamp),
+                        paths=len(self.paths),
+                        skipped=self.skipped)
+
+    def _new_buffers(self):
+        self.timestamp = array(int64_typecode)
+        self.path_id = array('I')
+        self.value = array('d')
+
+    def path_id_for(self, path=None):
+        path_id = self.path_ids.get(path)
+        if path_id is None:
+            path_id = len(self.paths)
+            self.path_ids[path] = path_id
+            self.paths.append(path)
+        return path_id
+
+    def append(self, timestamp=None, path=None, value=None):
+        if isinstance(value, dict):
+            # containers are flattened to their leafs
+            for name, leaf in value.items():
+                self.append(timestamp=timestamp,
+                            path=path + self.delimiter + name,
+                            value=leaf)
+            return
+        try:
+            # router returns 64bit numbers as strings
+            value = float(value)
+        except (TypeError, ValueError):
+            self.skipped += 1
+            return
+        self.timestamp.append(timestamp)
+        self.path_id.append(self.path_id_for(path))
+        self.value.append(value)
+
+    def process(self, response=None):
+        if not response.HasField('update'):
+            return
+        notification = response.update
+        prefix = proto_path_to_str(notification.prefix, delimiter=self.delimiter)
+        for upd in notification.update:
+            path = proto_path_to_str(upd.path, delimiter=self.delimiter)
+            if prefix:
+                path = prefix + self.delimiter + path if path else prefix
+            self.append(timestamp=notification.timestamp,
+                        path=path,
+                        value=typed_value_to_python(upd.val))
+        if (len(self.timestamp) >= self.block_size or
+            time.time() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.time()
+        if not len(self.timestamp):
+            return
+        for name, kind in ColumnarSink.columns:
+            buf = getattr(self, name)
+            file_name = os.path.join(self.target,
+                                     'block_{0:06d}.{1}.npy'.format(self.block, name))
+            with open(file_name, 'wb') as fd:
+                write_npy(fd, buf, kind)
+        with open(os.path.join(self.target, 'paths.json'), 'w') as fd:
+            json.dump(self.paths, fd)
+        self.rows += len(self.timestamp)
+        self.block += 1
+        self._new_buffers()
+
+
+def write_npy(fd=None, buf=None, kind=None):
+    '''
+        Writes array.array to fd as version 1.0 .npy file.
+    '''
+    descr = '<{kind}{size}'.format(kind=kind, size=buf.itemsize)
+    header = "{{'descr': '{descr}', 'fortran_order': False, 'shape': ({length},), }}".format(
+                                                            descr=descr,
+                                                            length=len(buf))
+    # magic string, version and header length take 10 bytes, header
+    # is padded with spaces and terminated by newline to 64 bytes alignment
+    header += ' ' * (63 - (10 + len(header)) % 64) + '\n'
+    fd.write(b'\x93NUMPY\x01\x00')
+    fd.write(struct.pack('<H', len(header)))
+    fd.write(header.encode('latin1'))
+    if sys.byteorder != 'little':
+        buf = array(buf.typecode, buf)
+        buf.byteswap()
+    buf.tofile(fd)
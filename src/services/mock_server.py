@@ -0,0 +1,365 @@
+############################################################################
+#
+#   Filename:           mock_server.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 20:31:44 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+from protos_gen import nokia_rib_api_pb2 as rib
+from protos_gen import nokia_rib_api_pb2_grpc as rib_stub
+from protos_gen import gnmi_pb2 as gnmi
+from protos_gen import gnmi_pb2_grpc as gnmi_stub
+
+import gnmi_service
+import rib_shadow
+
+from concurrent import futures
+from threading import Thread, Lock
+from Queue import Queue
+import grpc
+import json
+import random
+import time
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+operational_tables = [rib.IPv4RouteTable, rib.IPv6RouteTable, rib.IPv4TunnelTable,
+                      rib.IPv6TunnelTable, rib.MplsLabelTable]
+
+distributions = ['counter', 'uniform', 'gauss', 'constant']
+
+
+class MockRibApi(rib_stub.RibApiServicer):
+    '''
+        RibApi servicer answering Modify requests without router.
+
+        Every ModifyRequest is programmed as one batch, batches are
+        processed one after another and each takes batch_cost seconds
+        plus request_cost seconds per request. Result of batch is sent
+        ack_latency seconds after its programming finished, so latency
+        does not limit throughput, only processing cost does. Each request
+        fails with probability failure_rate.
+
+        Args:
+            ack_latency (float): seconds between end of programming and result.
+            failure_rate (float): probability of FAILED result, 0 - 1.
+            batch_cost (float): seconds spent on every ModifyRequest.
+            request_cost (float): seconds spent on every request in batch.
+            seed (int): seed of random generator deciding failures.
+            shadow (bool): keep programmed entries in ShadowRib.
+    '''
+
+    def __init__(self, ack_latency=0.0, failure_rate=0.0, batch_cost=0.0, request_cost=0.0,
+                 seed=None, shadow=False):
+        self.ack_latency = ack_latency
+        self.failure_rate = failure_rate
+        self.batch_cost = batch_cost
+        self.request_cost = request_cost
+        self.random = random.Random(seed)
+        self.shadow = rib_shadow.ShadowRib() if shadow else None
+        self.lock = Lock()
+        self.counters = {
+            'streams': 0,
+            'batches': 0,
+            'requests': 0,
+            'ok': 0,
+            'failed': 0,
+        }
+
+
+    def __str__(self):
+        return ('streams: {streams}, batches: {batches}, requests: {requests}, '
+                'ok: {ok}, failed: {failed}').format(**self.counters)
+
+
+    def result(self, msg=None):
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            return rib.ModifyResponse.Result(id=msg.id,
+                                             status=rib.ModifyResponse.Result.FAILED,
+                                             extended_status='Mock failure')
+        if self.shadow is not None:
+            self.shadow.apply(msg)
+        return rib.ModifyResponse.Result(id=msg.id, status=rib.ModifyResponse.Result.OK)
+
+
+    def program(self, batch=None):
+        with self.lock:
+            results = [self.result(msg) for msg in batch.request]
+            failed = len([result for result in results
+                          if result.status == rib.ModifyResponse.Result.FAILED])
+            self.counters['batches'] += 1
+            self.counters['requests'] += len(results)
+            self.counters['ok'] += len(results) - failed
+            self.counters['failed'] += failed
+        return rib.ModifyResponse(result=results)
+
+
+    def Modify(self, request_iterator, context):
+        # requests are read by separate thread, so arrival time of batch
+        # does not depend on how long we wait with result of previous one
+        received = Queue()
+
+        def reader():
+            try:
+                for batch in request_iterator:
+                    received.put((time.time(), batch))
+            except Exception as e:
+                logger.debug('Modify stream closed: {0}'.format(e))
+            finally:
+                received.put(None)
+
+        thread = Thread(target=reader)
+        thread.daemon = True
+        thread.start()
+        with self.lock:
+            self.counters['streams'] += 1
+        busy = 0
+        while True:
+            item = received.get()
+            if item is None:
+                return
+            arrived, batch = item
+            busy = max(arrived, busy) + self.batch_cost + self.request_cost * len(batch.request)
+            delay = busy + self.ack_latency - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            yield self.program(batch)
+
+
+    def GetVersion(self, request, context):
+        return rib.VersionResponse(api_version='1.0.0',
+                                   operational_tables=[rib.VersionResponse.Table(id=table_id,
+                                                                                 version='1.0.0')
+                                                       for table_id in operational_tables])
+
+
+class MockGnmi(gnmi_stub.gNMIServicer):
+    '''
+        gNMI servicer with synthetic telemetry.
+
+        Every subscribed or requested path has cardinality leaves
+        path/statistics[index=N]/value, notification carries values of
+        updates consecutive leaves. STREAM subscription sends all leaves
+        followed by sync_response (unless updates_only is set) and then
+        streams notifications at rate per second, ONCE sends all leaves
+        and sync_response and POLL does the same on every poll.
+        Values are encoded as json unless PROTO encoding is requested.
+
+        Args:
+            rate (float): notifications per second of STREAM subscription,
+                0 means as fast as possible.
+            cardinality (int): number of leaves under every path.
+            updates (int): number of updates in one notification.
+            distribution (str): counter (growing with every notification),
+                uniform, gauss or constant.
+            count (int): number of streamed notifications after which
+                Subscribe ends, None means never.
+            latency (float): seconds before Get and Set are answered.
+            seed (int): seed of random generator of values.
+    '''
+
+    def __init__(self, rate=1000.0, cardinality=100, updates=10, distribution='counter',
+                 count=None, latency=0.0, seed=None):
+        if distribution not in distributions:
+            raise ValueError('Unsupported distribution <{0}>, valid distributions: {1}'.format(
+                                                                    distribution, distributions))
+        self.rate = rate
+        self.cardinality = cardinality
+        self.updates = updates
+        self.distribution = distribution
+        self.count = count
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = Lock()
+        # path string -> TypedValue stored by Set
+        self.config = {}
+        # serialized path -> its synthetic leaves
+        self.paths = {}
+        self.counters = {
+            'get': 0,
+            'set': 0,
+            'subscribe': 0,
+            'notifications': 0,
+        }
+
+
+    def __str__(self):
+        return ('get: {get}, set: {set}, subscribe: {subscribe}, '
+                'notifications: {notifications}').format(**self.counters)
+
+
+    def value(self, index=None, sequence=None):
+        if self.distribution == 'counter':
+            return sequence * (index + 1)
+        elif self.distribution == 'uniform':
+            return self.random.randint(0, 1000000)
+        elif self.distribution == 'gauss':
+            return round(self.random.gauss(1000.0, 100.0), 3)
+        return index
+
+
+    def typed_value(self, value=None, encoding=None):
+        if encoding == gnmi.PROTO:
+            if isinstance(value, float):
+                return gnmi.TypedValue(float_val=value)
+            return gnmi.TypedValue(int_val=value)
+        elif encoding == gnmi.JSON_IETF:
+            return gnmi.TypedValue(json_ietf_val=json.dumps(value).encode())
+        return gnmi.TypedValue(json_val=json.dumps(value).encode())
+
+
+    def leaves(self, path=None):
+        key = path.SerializeToString()
+        with self.lock:
+            if key not in self.paths:
+                self.paths[key] = [gnmi.Path(elem=list(path.elem) +
+                                                  [gnmi.PathElem(name='statistics',
+                                                                 key={'index': str(index)}),
+                                                   gnmi.PathElem(name='value')])
+                                   for index in range(self.cardinality)]
+            return self.paths[key]
+
+
+    def notification(self, prefix=None, leaves=None, first=None, sequence=None, encoding=None):
+        updates = []
+        for offset in range(min(self.updates, len(leaves))):
+            index = (first + offset) % len(leaves)
+            updates.append(gnmi.Update(path=leaves[index],
+                                       val=self.typed_value(self.value(index, sequence), encoding)))
+        return gnmi.Notification(timestamp=int(time.time() * 10 ** 9),
+                                 prefix=prefix,
+                                 update=updates)
+
+
+    def initial(self, prefix=None, targets=None, encoding=None):
+        '''
+            Yields notifications with all leaves of all targets.
+        '''
+        for leaves in targets:
+            for first in range(0, len(leaves), self.updates):
+                yield self.notification(prefix, leaves, first, 0, encoding)
+
+
+    def Capabilities(self, request, context):
+        return gnmi.CapabilityResponse(supported_models=[gnmi.ModelData(name='mock',
+                                                                        organization='Nokia',
+                                                                        version='1.0.0')],
+                                       supported_encodings=[gnmi.JSON, gnmi.JSON_IETF, gnmi.PROTO],
+                                       gNMI_version='0.7.0')
+
+
+    def Get(self, request, context):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.counters['get'] += 1
+        targets = [self.leaves(path) for path in request.path]
+        return gnmi.GetResponse(notification=list(self.initial(request.prefix, targets,
+                                                               request.encoding)))
+
+
+    def Set(self, request, context):
+        if self.latency:
+            time.sleep(self.latency)
+        timestamp = int(time.time() * 10 ** 9)
+        results = []
+        with self.lock:
+            self.counters['set'] += 1
+            for path in request.delete:
+                self.config.pop(gnmi_service.proto_path_to_str(path), None)
+                results.append(gnmi.UpdateResult(path=path, op=gnmi.UpdateResult.DELETE))
+            for operation, updates in [(gnmi.UpdateResult.REPLACE, request.replace),
+                                       (gnmi.UpdateResult.UPDATE, request.update)]:
+                for update in updates:
+                    self.config[gnmi_service.proto_path_to_str(update.path)] = update.val
+                    results.append(gnmi.UpdateResult(path=update.path, op=operation))
+        return gnmi.SetResponse(prefix=request.prefix, response=results, timestamp=timestamp)
+
+
+    def Subscribe(self, request_iterator, context):
+        requests = Queue()
+
+        def reader():
+            try:
+                for msg in request_iterator:
+                    requests.put(msg)
+            except Exception as e:
+                logger.debug('Subscribe stream closed: {0}'.format(e))
+            finally:
+                requests.put(None)
+
+        thread = Thread(target=reader)
+        thread.daemon = True
+        thread.start()
+        msg = requests.get()
+        if msg is None or not msg.HasField('subscribe'):
+            return
+        with self.lock:
+            self.counters['subscribe'] += 1
+        subscription = msg.subscribe
+        targets = [self.leaves(item.path) for item in subscription.subscription]
+        if not targets:
+            return
+        if subscription.mode == gnmi.SubscriptionList.POLL:
+            while msg is not None:
+                for notification in self.initial(subscription.prefix, targets, subscription.encoding):
+                    yield gnmi.SubscribeResponse(update=notification)
+                yield gnmi.SubscribeResponse(sync_response=True)
+                msg = requests.get()
+            return
+        if not subscription.updates_only:
+            for notification in self.initial(subscription.prefix, targets, subscription.encoding):
+                yield gnmi.SubscribeResponse(update=notification)
+        yield gnmi.SubscribeResponse(sync_response=True)
+        if subscription.mode == gnmi.SubscriptionList.ONCE:
+            return
+        start = time.time()
+        sent = 0
+        while context.is_active() and (self.count is None or sent < self.count):
+            if self.rate:
+                delay = start + sent / float(self.rate) - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            leaves = targets[sent % len(targets)]
+            first = (sent // len(targets)) * self.updates
+            yield gnmi.SubscribeResponse(update=self.notification(subscription.prefix, leaves,
+                                                                  first, sent + 1,
+                                                                  subscription.encoding))
+            sent += 1
+            with self.lock:
+                self.counters['notifications'] += 1
+
+
+def serve(servicer=None, ip='127.0.0.1', port=0, max_workers=10):
+    '''
+        Starts insecure grpc server with given servicers on ip and port,
+        port 0 picks free port. Returns (server, port).
+
+        Args:
+            servicer: MockRibApi, MockGnmi or list of them.
+            ip (str): address to listen on.
+            port (int): port to listen on.
+            max_workers (int): number of threads handling rpcs.
+    '''
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    servicers = servicer if isinstance(servicer, list) else [servicer]
+    for item in servicers:
+        if isinstance(item, rib_stub.RibApiServicer):
+            rib_stub.add_RibApiServicer_to_server(item, server)
+        elif isinstance(item, gnmi_stub.gNMIServicer):
+            gnmi_stub.add_gNMIServicer_to_server(item, server)
+    port = server.add_insecure_port('{0}:{1}'.format(ip, port))
+    server.start()
+    logger.info('Mock server listening on {0}:{1}'.format(ip, port))
+    return server, port
@@ -20,14 +20,629 @@ from protos_gen import nokia_rib_api_pb2 as rib
 from protos_gen import nokia_rib_api_pb2_grpc as rib_stub
 from google.protobuf import json_format
 
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from itertools import chain
+from threading import Condition, RLock, Timer
+
+import rib_cache
+import rib_dependencies
+import rib_loader
+import rib_reconcile
+import rib_journal
+import rib_resync
+import rib_shadow
+import rib_validate
+from rib_tracker import RequestTracker
+from stats import Histogram, RateGauge
+import random
+import time
 
 from logging import getLogger
 
 logger = getLogger(__name__)
 
 def create_stub(service=None, channel=None):
-    return rib_stub.RibApiStub(channel)
+    stub = rib_stub.RibApiStub(channel)
+    # Modify requests are sent already serialized on this method,
+    # so CachedRequest bodies are only concatenated (see rib_cache)
+    stub.ModifyRaw = channel.stream_stream(
+                        '/Nokia.SROS.RibApi/Modify',
+                        request_serializer=None,
+                        response_deserializer=rib.ModifyResponse.FromString)
+    return stub
+
+
+operations = ['add', 'replace', 'delete']
+
+# (table, operation) -> field of ModifyRequest.Request.data oneof
+route_fields = {
+    ('ipv4', 'add'): 'ipv4_route_ADD',
+    ('ipv4', 'replace'): 'ipv4_route_REPLACE',
+    ('ipv4', 'delete'): 'ipv4_route_DELETE',
+    ('ipv6', 'add'): 'ipv6_route_ADD',
+    ('ipv6', 'replace'): 'ipv6_route_REPLACE',
+    ('ipv6', 'delete'): 'ipv6_route_DELETE',
+}
+
+tunnel_fields = {
+    ('ipv4', 'add'): 'ipv4_tunnel_ADD',
+    ('ipv4', 'replace'): 'ipv4_tunnel_REPLACE',
+    ('ipv4', 'delete'): 'ipv4_tunnel_DELETE',
+    ('ipv6', 'add'): 'ipv6_tunnel_ADD',
+    ('ipv6', 'replace'): 'ipv6_tunnel_REPLACE',
+    ('ipv6', 'delete'): 'ipv6_tunnel_DELETE',
+}
+
+label_fields = {
+    'add': 'mpls_label_ADD',
+    'replace': 'mpls_label_REPLACE',
+    'delete': 'mpls_label_DELETE',
+}
+
+# field of ModifyRequest.Request.data oneof -> (TableId, operation)
+field_tables = dict(
+    [(field, (rib.IPv4RouteTable if table == 'ipv4' else rib.IPv6RouteTable, operation))
+     for (table, operation), field in route_fields.items()] +
+    [(field, (rib.IPv4TunnelTable if table == 'ipv4' else rib.IPv6TunnelTable, operation))
+     for (table, operation), field in tunnel_fields.items()] +
+    [(field, (rib.MplsLabelTable, operation)) for operation, field in label_fields.items()])
+
+# (TableId, operation) -> field of ModifyRequest.Request.data oneof
+table_fields = dict([(info, field) for field, info in field_tables.items()])
+
+
+
+def request_table(msg=None):
+    '''
+        Returns (TableId, operation) of ModifyRequest.Request,
+        (None, None) for END_OF_RIB and NH_SWITCH.
+    '''
+    return field_tables.get(msg.WhichOneof('data'), (None, None))
+
+
+
+def request_field(fields=None, table=None, operation=None):
+    if operation not in operations:
+        raise ValueError('Unkown operation request <{0}>, valid operations: {1}'.format(operation,
+                                                                                        operations))
+    try:
+        return fields[(table, operation)]
+    except KeyError:
+        raise ValueError('Invalid combination of table and operation: <{table}:{operation}>'.format(
+                                                                            table=table,
+                                                                            operation=operation))
+
+
+def route_request(id=None, operation=None, table=None, key_prefix=None, key_preference=None,
+                  rtm_preference=None, metric=None, tunnel_next_hop=None):
+    '''
+        Returns ModifyRequest.Request with RouteTableEntry for add and replace
+        operations and RouteTableEntryKey for delete operation.
+    '''
+    field = request_field(route_fields, table, operation)
+    entry_key = rib.RouteTableEntryKey(prefix=key_prefix, preference=key_preference)
+    if operation == 'delete':
+        return rib.ModifyRequest.Request(id=id, **{field: entry_key})
+    return rib.ModifyRequest.Request(id=id, **{field: rib.RouteTableEntry(
+                                                        entry_key=entry_key,
+                                                        rtm_preference=rtm_preference,
+                                                        metric=metric,
+                                                        tunnel_next_hop=tunnel_next_hop)})
+
+
+def tunnel_request(id=None, operation=None, table=None, key_endpoint=None,
+                   key_preference=None, ttm_preference=None, metric=None):
+    '''
+        Returns ModifyRequest.Request with TunnelTableEntry for add and replace
+        operations and TunnelTableEntryKey for delete operation.
+    '''
+    field = request_field(tunnel_fields, table, operation)
+    entry_key = rib.TunnelTableEntryKey(endpoint=key_endpoint, preference=key_preference)
+    if operation == 'delete':
+        return rib.ModifyRequest.Request(id=id, **{field: entry_key})
+    return rib.ModifyRequest.Request(id=id, **{field: rib.TunnelTableEntry(
+                                                        entry_key=entry_key,
+                                                        ttm_preference=ttm_preference,
+                                                        metric=metric)})
+
+
+def label_request(id=None, operation=None, key_label=None, key_preference=None,
+                  ing_stats_enable=None, type=None):
+    '''
+        Returns ModifyRequest.Request with LabelTableEntry for add and replace
+        operations and LabelTableEntryKey for delete operation.
+    '''
+    if operation not in label_fields:
+        raise ValueError('Unkown operation request <{0}>, valid operations: {1}'.format(operation,
+                                                                                        operations))
+    entry_key = rib.LabelTableEntryKey(label=key_label, preference=key_preference)
+    if operation == 'delete':
+        return rib.ModifyRequest.Request(id=id, **{label_fields[operation]: entry_key})
+    return rib.ModifyRequest.Request(id=id, **{label_fields[operation]: rib.LabelTableEntry(
+                                                        entry_key=entry_key,
+                                                        ing_stats=rib.LabelTableIngrStats(
+                                                            enable=ing_stats_enable),
+                                                        type=type)})
+
+
+def next_hop_group_message(group_id=None, weight=None, primary_ip=None, primary_labels=None,
+                           backup_ip=None, backup_labels=None):
+    '''
+        Returns NextHopGroup, labels can be list of int or comma separated string.
+    '''
+    if type(primary_labels) is not list and primary_labels:
+        primary_labels = [int(x) for x in primary_labels.split(',')]
+    if primary_ip or primary_labels:
+        next_hop_primary = rib.NextHop(
+                                ip_address = primary_ip,
+                                pushed_label_stack = primary_labels)
+    else:
+        next_hop_primary = None
+
+    if type(backup_labels) is not list and backup_labels:
+        backup_labels = [int(x) for x in backup_labels.split(',')]
+    if backup_ip or backup_labels:
+        next_hop_backup = rib.NextHop(
+                                ip_address = backup_ip,
+                                pushed_label_stack = backup_labels)
+    else:
+        next_hop_backup = None
+
+    return rib.NextHopGroup(
+                id = group_id,
+                weight = weight,
+                primary = next_hop_primary,
+                backup = next_hop_backup)
+
+
+def entry_of(msg=None):
+    '''
+        Returns message set in data oneof of ModifyRequest.Request.
+    '''
+    return getattr(msg, msg.WhichOneof('data'))
+
+
+class NextHopGroupRegistry(object):
+    '''
+        Interns NextHopGroup messages.
+
+        Groups are looked up by arguments of next_hop_group_message first,
+        so repeated calls skip label parsing and message construction, and
+        then by serialized content, so equal groups built from differently
+        formatted arguments share one message. Returned messages are shared
+        and must not be modified.
+    '''
+
+    def __init__(self):
+        self.by_args = {}
+        self.by_content = {}
+        self.hits = 0
+        self.misses = 0
+
+
+    def __len__(self):
+        return len(self.by_content)
+
+
+    def __str__(self):
+        return 'groups: {0}, hits: {1}, misses: {2}'.format(len(self), self.hits, self.misses)
+
+
+    def intern(self, group_id=None, weight=None, primary_ip=None, primary_labels=None,
+               backup_ip=None, backup_labels=None):
+        args = (group_id, weight,
+                primary_ip, tuple(primary_labels) if type(primary_labels) is list else primary_labels,
+                backup_ip, tuple(backup_labels) if type(backup_labels) is list else backup_labels)
+        group = self.by_args.get(args)
+        if group is not None:
+            self.hits += 1
+            return group
+        group = self.add(next_hop_group_message(group_id=group_id, weight=weight,
+                                                primary_ip=primary_ip, primary_labels=primary_labels,
+                                                backup_ip=backup_ip, backup_labels=backup_labels))
+        self.by_args[args] = group
+        return group
+
+
+    def add(self, group=None):
+        '''
+            Returns already interned group with same content or group itself.
+        '''
+        interned = self.by_content.setdefault(group.SerializeToString(deterministic=True), group)
+        if interned is group:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return interned
+
+
+class AdaptiveWindow(object):
+    '''
+        AIMD controller of Modify flow control limits.
+
+        Latency of each ModifyResponse is measured from the time its oldest
+        request was sent. While results are OK and latency stays below
+        latency_target (or below spike_factor times its moving average when
+        no target is set), batch_size and max_in_flight grow additively by
+        batch_step and window_step. FAILED result or latency spike shrinks
+        both multiplicatively by decrease, at most once per average latency
+        so one congestion event is not punished for every batch in flight.
+
+        Args:
+            latency_target (float): ack latency in seconds considered as overload.
+            spike_factor (float): latency relative to its moving average considered
+                as spike.
+            alpha (float): weight of new sample in moving average of latency.
+    '''
+
+    def __init__(self, min_batch=10, max_batch=5000, min_in_flight=100, max_in_flight=100000,
+                 batch_step=10, window_step=100, decrease=0.5, latency_target=None,
+                 spike_factor=3.0, alpha=0.2):
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.min_in_flight = min_in_flight
+        self.max_in_flight = max_in_flight
+        self.batch_step = batch_step
+        self.window_step = window_step
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.spike_factor = spike_factor
+        self.alpha = alpha
+
+        self.latency = None
+        self.last_decrease = 0
+        self.increases = 0
+        self.decreases = 0
+
+
+    def __str__(self):
+        return ('latency avg: {latency}, target: {target}, increases: {increases}, '
+                'decreases: {decreases}').format(
+                    latency='{0:.2f} ms'.format(self.latency * 1000) if self.latency else None,
+                    target=self.latency_target,
+                    increases=self.increases,
+                    decreases=self.decreases)
+
+
+    def congested(self, latency=None):
+        if self.latency_target:
+            return latency > self.latency_target
+        return self.latency is not None and latency > self.spike_factor * self.latency
+
+
+    def update(self, rpc=None, latency=None, failed=False, now=None):
+        now = now or time.time()
+        congested = failed or self.congested(latency)
+        self.latency = latency if self.latency is None else (self.alpha * latency +
+                                                             (1 - self.alpha) * self.latency)
+        batch_size = rpc.batch_size or self.max_batch
+        max_in_flight = rpc.max_in_flight or self.max_in_flight
+        if congested:
+            if now - self.last_decrease < self.latency:
+                return
+            self.last_decrease = now
+            self.decreases += 1
+            batch_size = max(self.min_batch, int(batch_size * self.decrease))
+            max_in_flight = max(self.min_in_flight, int(max_in_flight * self.decrease))
+        else:
+            self.increases += 1
+            batch_size = min(self.max_batch, batch_size + self.batch_step)
+            max_in_flight = min(self.max_in_flight, max_in_flight + self.window_step)
+        # window smaller than batch would only split batches
+        rpc.set_window(batch_size=batch_size, max_in_flight=max(max_in_flight, batch_size))
+
+
+class RetryPolicy(object):
+    '''
+        Exponential backoff of automatic retry of FAILED requests.
+
+        Request which failed attempt times is sent again after
+        delay * multiplier ** (attempt - 1) seconds, at most max_delay,
+        randomized by +-jitter fraction so retries of one batch do not
+        arrive at once. Requests are not retried after max_attempts
+        retries or if reasons is set and their extended_status is not
+        in it.
+
+        Args:
+            max_attempts (int): max number of retries of one request.
+            delay (float): seconds before first retry.
+            multiplier (float): growth of delay with every retry.
+            max_delay (float): max seconds before retry.
+            jitter (float): random fraction of delay added or subtracted.
+            reasons (list of str): extended_status values which are retried,
+                all if not set.
+    '''
+
+    def __init__(self, max_attempts=3, delay=1.0, multiplier=2.0, max_delay=60.0, jitter=0.1,
+                 reasons=None):
+        self.max_attempts = max_attempts
+        self.delay = delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.reasons = reasons
+        self.random = random.Random()
+
+        self.scheduled = 0
+        self.exhausted = 0
+
+
+    def __str__(self):
+        return ('max attempts: {max_attempts}, delay: {delay} s, multiplier: {multiplier}, '
+                'scheduled: {scheduled}, exhausted: {exhausted}').format(
+                    max_attempts=self.max_attempts,
+                    delay=self.delay,
+                    multiplier=self.multiplier,
+                    scheduled=self.scheduled,
+                    exhausted=self.exhausted)
+
+
+    def retryable(self, result=None, attempt=None):
+        if self.reasons is not None and result.extended_status not in self.reasons:
+            return False
+        if attempt > self.max_attempts:
+            self.exhausted += 1
+            return False
+        return True
+
+
+    def backoff(self, attempt=None):
+        delay = min(self.delay * self.multiplier ** (attempt - 1), self.max_delay)
+        return delay * (1 + self.random.uniform(-self.jitter, self.jitter))
+
+
+def parse_window(window=None):
+    '''
+        Returns (start, end) seconds of day of programming window
+        given as HH:MM-HH:MM, end before start means window over midnight.
+    '''
+    try:
+        start, end = window.split('-')
+        return tuple([int(hours) * 3600 + int(minutes) * 60
+                      for hours, minutes in [start.split(':'), end.split(':')]])
+    except ValueError:
+        raise ValueError('Invalid programming window <{0}>, expected HH:MM-HH:MM'.format(window))
+
+
+class Pacer(object):
+    '''
+        Token bucket limiting rate of Modify requests.
+
+        Requests are sent only while there are tokens, rate tokens are added
+        every second up to burst. Bytes are limited by second bucket, which
+        can go into debt by the size of last batch, so batch is never split
+        because of its size. If windows are set, requests are sent only
+        within them, outside of them sending pauses until next window
+        starts. Windows are in local time.
+
+        Args:
+            rate (float): requests per second, unlimited if not set.
+            byte_rate (float): bytes of requests per second, unlimited if not set.
+            burst (int): max number of requests sent at once after idle time,
+                rate by default, at least 1.
+            byte_burst (int): max number of bytes sent at once after idle time,
+                byte_rate by default, at least 1.
+            windows (list of str): programming windows HH:MM-HH:MM.
+    '''
+
+    def __init__(self, rate=None, byte_rate=None, burst=None, byte_burst=None, windows=None):
+        self.rate = rate
+        self.byte_rate = byte_rate
+        # bucket smaller than one token would never allow any request
+        self.burst = max(burst or rate, 1) if rate else burst
+        self.byte_burst = max(byte_burst or byte_rate, 1) if byte_rate else byte_burst
+        self.windows = [parse_window(window) for window in windows or []]
+        self.tokens = self.burst
+        self.byte_tokens = self.byte_burst
+        self.updated = None
+
+        self.requests = 0
+        self.bytes = 0
+        self.delays = 0
+
+
+    def __str__(self):
+        return ('rate: {rate}/s, bytes: {byte_rate}/s, burst: {burst}, windows: {windows}, '
+                'sent: {requests}, bytes sent: {bytes}, delays: {delays}').format(
+                    rate=self.rate,
+                    byte_rate=self.byte_rate,
+                    burst=self.burst,
+                    windows=', '.join(['{0:02d}:{1:02d}-{2:02d}:{3:02d}'.format(
+                                            start // 3600, start % 3600 // 60,
+                                            end // 3600, end % 3600 // 60)
+                                       for start, end in self.windows]) or None,
+                    requests=self.requests,
+                    bytes=self.bytes,
+                    delays=self.delays)
+
+
+    def until_window(self, now=None):
+        '''
+            Returns seconds until next programming window, 0 within window.
+        '''
+        if not self.windows:
+            return 0
+        local = time.localtime(now)
+        second = local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec + now % 1
+        delays = []
+        for start, end in self.windows:
+            if (start <= second < end) or (end < start and (second >= start or second < end)):
+                return 0
+            delays.append((start - second) % 86400)
+        return min(delays)
+
+
+    def refill(self, now=None):
+        if self.updated is not None:
+            elapsed = now - self.updated
+            if self.rate:
+                self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            if self.byte_rate:
+                self.byte_tokens = min(self.byte_burst, self.byte_tokens + elapsed * self.byte_rate)
+        self.updated = now
+
+
+    def allowed(self, count=None, now=None):
+        '''
+            Returns (number of requests which can be sent now, at most count,
+            seconds to wait if none can be sent).
+        '''
+        now = now or time.time()
+        delay = self.until_window(now)
+        if delay:
+            self.delays += 1
+            return 0, delay
+        self.refill(now)
+        if self.rate and self.tokens < 1:
+            self.delays += 1
+            return 0, (1 - self.tokens) / float(self.rate)
+        if self.byte_rate and self.byte_tokens <= 0:
+            self.delays += 1
+            return 0, max(-self.byte_tokens, 1) / float(self.byte_rate)
+        if self.rate:
+            count = min(count, int(self.tokens))
+        return count, 0
+
+
+    def consume(self, batch=None):
+        self.requests += len(batch)
+        if self.rate:
+            self.tokens -= len(batch)
+        if self.byte_rate:
+            size = sum([msg.ByteSize() for msg in batch])
+            self.bytes += size
+            self.byte_tokens -= size
+
+
+class ModifyStats(object):
+    '''
+        Programming statistics of Modify.
+
+        Ack latency is time from sending request to receiving its result,
+        it is kept in HDR style histogram of all results and in histogram
+        per data field of request, which is table and operation. Rolling
+        rates of sent requests and of OK results show current programming
+        rate, average rate is computed from first send to last result.
+    '''
+
+    def __init__(self):
+        self.latency = Histogram(unit='us')
+        self.reset()
+
+
+    def __str__(self):
+        display = ('sent: {sent}, acknowledged: {acknowledged}, ok: {ok}, failed: {failed}\n'
+                   'rate: sent {sent_rate}, programmed {ok_rate}, average {average:.1f}/s\n'
+                   'ack latency: {latency}\n').format(
+                        sent=self.sent,
+                        acknowledged=self.acknowledged,
+                        ok=self.ok,
+                        failed=self.failed,
+                        sent_rate=self.sent_rate,
+                        ok_rate=self.ok_rate,
+                        average=self.average_rate(),
+                        latency=self.latency)
+        for (table, operation), histogram in sorted(self.tables().items()):
+            display += '    {0} {1}: {2}\n'.format(table, operation, histogram)
+        return display
+
+
+    def reset(self):
+        # reset in place, latency is shared with Modify.latency
+        self.latency.reset()
+        # data field of request -> Histogram of ack latency
+        self.fields = {}
+        self.sent_rate = RateGauge()
+        self.ok_rate = RateGauge()
+        self.sent = 0
+        self.acknowledged = 0
+        self.ok = 0
+        self.failed = 0
+        self.first_sent = None
+        self.last_result = None
+
+
+    def requests_sent(self, count=None, now=None):
+        if self.first_sent is None:
+            self.first_sent = now
+        self.sent += count
+        self.sent_rate.add(count, now)
+
+
+    def result(self, field=None, status=None, latency=None, now=None):
+        '''
+            Records result of request with data field, latency in seconds.
+        '''
+        histogram = self.fields.get(field)
+        if histogram is None:
+            histogram = self.fields[field] = Histogram(unit='us')
+        latency = latency * 1000000
+        self.latency.record(latency)
+        histogram.record(latency)
+        self.acknowledged += 1
+        self.last_result = now
+        if status == rib.ModifyResponse.Result.OK:
+            self.ok += 1
+            self.ok_rate.add(1, now)
+        else:
+            self.failed += 1
+
+
+    def average_rate(self):
+        if self.first_sent is None or self.last_result is None or self.last_result <= self.first_sent:
+            return 0.0
+        return self.ok / (self.last_result - self.first_sent)
+
+
+    def tables(self):
+        '''
+            Returns dict (table name, operation) -> Histogram of ack latency.
+        '''
+        tables = {}
+        for field, histogram in self.fields.items():
+            table_id, operation = field_tables.get(field, (None, None))
+            key = (rib.TableId.Name(table_id) if table_id is not None else str(field), operation)
+            if key not in tables:
+                tables[key] = Histogram(unit='us')
+            tables[key].merge(histogram)
+        return tables
+
+
+    def merge(self, other=None):
+        self.latency.merge(other.latency)
+        for field, histogram in other.fields.items():
+            if field not in self.fields:
+                self.fields[field] = Histogram(unit='us')
+            self.fields[field].merge(histogram)
+        self.sent_rate.merge(other.sent_rate)
+        self.ok_rate.merge(other.ok_rate)
+        self.sent += other.sent
+        self.acknowledged += other.acknowledged
+        self.ok += other.ok
+        self.failed += other.failed
+        if other.first_sent is not None and (self.first_sent is None or
+                                             other.first_sent < self.first_sent):
+            self.first_sent = other.first_sent
+        if other.last_result is not None and (self.last_result is None or
+                                              other.last_result > self.last_result):
+            self.last_result = other.last_result
+
+
+    def to_dict(self):
+        return {'timestamp': time.time(),
+                'sent': self.sent,
+                'acknowledged': self.acknowledged,
+                'ok': self.ok,
+                'failed': self.failed,
+                'sent_per_second': self.sent_rate.rate(),
+                'ok_per_second': self.ok_rate.rate(),
+                'average_ok_per_second': self.average_rate(),
+                'first_sent': self.first_sent,
+                'last_result': self.last_result,
+                'latency': self.latency.to_dict(),
+                'tables': [{'table': table, 'operation': operation, 'latency': histogram.to_dict()}
+                           for (table, operation), histogram in sorted(self.tables().items())]}
+
 
 class GetVersion(Rpc):
     '''
@@ -93,28 +708,83 @@ class GetVersion(Rpc):
 class Modify(Rpc):
     '''
         Implements Nokia.SROS.RibApi.Modify bidirectional streaming rpc.
-        
-        TODO: move this from docstring to more appropriate place
-        One way to track request-response is via storing all data in
-        dict and map id in rpcs to key in dics. This enables fast lookup of
-        request-response pairs. And if there will be need in future, we can expose
-        this to user to more easily implement scenarios where request must be
-        based on previous response or the request has to wait for certain
-        response.
+
+        Requests which were not sent yet are stored in request dict, sent
+        requests are correlated with results by id in processed_request,
+        which is RequestTracker keeping status of every request but full
+        messages only for requests waiting for result, failed requests
+        and last retain completed requests.
+
+        Args below are keyword only, positional args are passed to Rpc.
+
+        Args:
+            batch_size (int): max number of requests in one ModifyRequest,
+                all queued requests are sent at once if not set.
+            max_in_flight (int): max number of requests waiting for result,
+                not limited if not set.
+            retain (int): number of completed requests kept with messages.
     '''
 
 
     def __init__(self, *args, **kwargs):
 
+        batch_size = kwargs.pop('batch_size', None)
+        max_in_flight = kwargs.pop('max_in_flight', None)
+        retain = kwargs.pop('retain', 1000)
+
         Rpc.__init__(self, *args, **kwargs)
 
         self.request = OrderedDict()
-        self.processed_request = OrderedDict()
+        self.processed_request = RequestTracker(retain=retain)
         self.response = OrderedDict()
         self.request_counter = 0
         self.stub_method = self.stub.Modify
         self.response_processor = self.default_response_processor
 
+        # iterators of requests loaded by load(), consumed lazily by generator
+        self.sources = deque()
+        # max number of requests in one ModifyRequest and max number of
+        # requests sent but not yet acknowledged by result, None means no limit
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        # id -> (time when request was sent, data field of request)
+        self.in_flight = {}
+        # work items which were completely sent but still wait for results
+        self.pending_work = 0
+        self.lock = RLock()
+        self.window = Condition(self.lock)
+        # optional AdaptiveWindow tuning batch_size and max_in_flight
+        self.controller = None
+        # optional Pacer limiting rate of sent requests
+        self.pacer = None
+        # optional RetryPolicy, FAILED requests are retried automatically when set
+        self.retry_policy = None
+        # id -> number of retries of request
+        self.attempts = {}
+        # ids of failed requests waiting for delayed retry
+        self.scheduled = set()
+        # ack latency and programming rate, latency of all results
+        # in microseconds is also available as latency
+        self.stats = ModifyStats()
+        self.latency = self.stats.latency
+        # NextHopGroup messages shared by entries of this rpc
+        self.groups = NextHopGroupRegistry()
+        # optional RequestCache, requests are sent serialized when set
+        self.cache = None
+        # optional RequestValidation of loaded sources
+        self.validation = None
+        # optional DependencyOrder of loaded sources
+        self.ordering = None
+        # optional ShadowRib updated with requests acknowledged by OK result
+        self.shadow = None
+        # optional Journal of sent requests and received results
+        self.journal = None
+        # shadow RIB is replayed on every new stream if auto_resync is set
+        self.auto_resync = False
+        self.last_resync = None
+        self.streams = 0
+        self.raw = False
+
         self.request_type = 'streaming'
 
 
@@ -133,16 +803,19 @@ class Modify(Rpc):
                                     req = self.request[req])
 
             if self.processed_request:
-                display += "\nPROCESSED REQUESTS:\n"
-                for pair_id in self.processed_request:
+                display += "\nPROCESSED REQUESTS ({0}):\n".format(self.processed_request)
+                with self.lock:
+                    pairs = [(pair_id, self.processed_request[pair_id])
+                             for pair_id in self.processed_request]
+                for pair_id, pair in pairs:
                     display += ('\n======= id: {id} =======\n'
                                 '==request {id}:\n'
                                 '{req}\n'
                                 '==response {id}:\n'
                                 '{res}\n').format(
                                     id = pair_id,
-                                    req = self.processed_request[pair_id]['request'],
-                                    res = self.processed_request[pair_id]['response'])
+                                    req = pair['request'],
+                                    res = pair['response'])
 
         display += '\nError:\n{err}'.format(err = self.error)
         return display
@@ -153,35 +826,460 @@ class Modify(Rpc):
         return self.request_counter
 
 
-    def generator(self):
+    def build(self, entry=None, **kwargs):
+        '''
+            Returns request built from arguments of route_request,
+            tunnel_request or label_request selected by entry,
+            CachedRequest if cache is set.
+        '''
+        if self.cache is not None:
+            return self.cache.request(entry=entry, **kwargs)
+        return rib_loader.build_request(entry=entry, **kwargs)
+
+
+    def enqueue(self, msg=None):
+        with self.lock:
+            # assigned ids must not collide with explicit ones
+            self.request_counter = max(self.request_counter, msg.id)
+            self.request[msg.id] = msg
+
+
+    def load(self, source=None, format=None):
+        '''
+            Adds source of requests which will be sent on next execute.
+            Requests are read lazily in batches of batch_size, so whole source
+            is never held in memory. Requests without id get one assigned.
+
+            Args:
+                source: path to csv, jsonl or length delimited binary file,
+                    or any iterable of ModifyRequest.Request messages or dicts
+                    with arguments of route_request, tunnel_request or
+                    label_request (see rib_loader.read_csv).
+                format (str): csv, jsonl or binary. Guessed from file extension
+                    if not specified.
+
+            Requests are validated in chunks while they are read if
+            validation is set, invalid ones are not sent. Chunks are
+            put in dependency order if ordering is set.
+        '''
+        source = rib_loader.open_source(source=source, format=format, cache=self.cache)
+        if self.validation is not None:
+            source = self.validation.filter(source)
+        if self.ordering is not None:
+            source = self.ordering.filter(source)
+        with self.lock:
+            self.sources.append(iter(source))
+
+
+    def validate(self, normalize=True, drop=True):
+        '''
+            Validates prefixes and endpoints of requests which were not
+            sent yet and returns RequestValidation with invalid requests.
+            Sources added by load() are validated while they are read
+            only if validation is set.
+
+            Args:
+                normalize (bool): rewrite prefixes and endpoints to canonical form.
+                drop (bool): remove invalid requests, so they are never sent.
+        '''
+        validation = rib_validate.RequestValidation(normalize=normalize)
+        with self.lock:
+            valid = validation.check(list(self.request.values()))
+            if drop and validation.invalid:
+                self.request = OrderedDict([(msg.id, msg) for msg in valid])
+        return validation
+
+
+    def order(self):
+        '''
+            Puts requests which were not sent yet in dependency order, so
+            tunnels and labels are programmed before entries referencing
+            them and deleted after them, and returns DependencyOrder with
+            counters. References of deleted entries are taken from shadow.
+            Sources added by load() are ordered while they are read only
+            if ordering is set.
+        '''
+        ordering = rib_dependencies.DependencyOrder(shadow=self.shadow)
+        with self.lock:
+            ordered = ordering.order(list(self.request.values()))
+            self.request = OrderedDict([(msg.id, msg) for msg in ordered])
+        return ordering
+
+
+    def check_consistency(self):
+        '''
+            Checks requests which were not sent yet, applied in their order
+            on entries of shadow, for routes using missing tunnels, entries
+            pushing missing labels and deletes of still referenced tunnels
+            and labels. Returns ConsistencyCheck with problems found.
+        '''
+        check = rib_dependencies.ConsistencyCheck(shadow=self.shadow)
+        with self.lock:
+            check.check(list(self.request.values()))
+        return check
+
+
+    def reconcile(self, source=None, format=None, tables=None):
+        '''
+            Adds source of requests which change shadow RIB to desired
+            state from source and returns Reconciliation with its progress.
+            Shadow RIB must be enabled.
+
+            Args:
+                source: desired entries, same as in load().
+                format (str): csv, jsonl or binary.
+                tables (list of TableId): tables which receive END_OF_RIB
+                    after all changes, all tables if not specified.
+        '''
+        if self.shadow is None:
+            raise ValueError('Shadow RIB must be enabled for reconciliation')
+        reconciliation = rib_reconcile.Reconciliation(shadow=self.shadow,
+                                                      desired=rib_loader.open_source(source=source,
+                                                                                     format=format),
+                                                      tables=tables)
+        self.load(source=iter(reconciliation))
+        return reconciliation
+
+
+    def recover(self, path=None, **kwargs):
+        '''
+            Rebuilds shadow RIB from journal, queues requests which were
+            sent but never acknowledged and continues journaling to the
+            same file. Returns number of queued requests.
+
+            Args:
+                path (str): journal file of previous session.
+                kwargs: passed to Journal.
+        '''
+        if self.shadow is None:
+            self.shadow = rib_shadow.ShadowRib()
+        shadow, unacknowledged, last_id = rib_journal.replay(path=path, shadow=self.shadow)
+        with self.lock:
+            self.request_counter = max([self.request_counter, last_id] +
+                                       [msg.id for msg in unacknowledged.values()])
+            for msg in unacknowledged.values():
+                self.request[msg.id] = msg
+        self.journal = rib_journal.Journal(path=path, **kwargs)
+        return len(unacknowledged)
+
+
+    def resync(self, tables=None):
+        '''
+            Replays shadow RIB table by table, each followed by END_OF_RIB,
+            ahead of other loaded sources. Queued requests, including requests
+            sent on previous stream which got no result, are sent before
+            the replay, so they are programmed before END_OF_RIB. Returns
+            Resync with per table progress.
+
+            Args:
+                tables (list of TableId): tables to replay, all if not specified.
+        '''
+        if self.shadow is None:
+            raise ValueError('Shadow RIB must be enabled for resync')
+        self.last_resync = rib_resync.Resync(shadow=self.shadow, tables=tables, cache=self.cache)
+        with self.lock:
+            self.sources.appendleft(iter(self.last_resync))
+        return self.last_resync
+
+
+    def set_window(self, batch_size=None, max_in_flight=None):
+        '''
+            Changes flow control limits, takes effect also for requests
+            which are already waiting to be sent.
+        '''
+        with self.window:
+            if batch_size is not None:
+                self.batch_size = batch_size
+            if max_in_flight is not None:
+                self.max_in_flight = max_in_flight
+            self.window.notify_all()
+
+
+    def set_pacer(self, pacer=None):
+        '''
+            Sets Pacer limiting rate of sent requests, None removes limits.
+        '''
+        with self.window:
+            self.pacer = pacer
+            self.window.notify_all()
+
+
+    def window_size(self):
+        '''
+            Returns number of requests which can be sent right now.
+        '''
+        count = self.batch_size or float('inf')
+        if self.max_in_flight:
+            count = min(count, self.max_in_flight - len(self.in_flight))
+        return count
+
+
+    def next_requests(self, count=None):
+        '''
+            Returns up to count requests, queued requests go first,
+            then requests from loaded sources.
+        '''
+        batch = []
+        with self.lock:
+            while self.request and len(batch) < count:
+                batch.append(self.request.popitem(last=False)[1])
+            while self.sources and len(batch) < count:
+                try:
+                    msg = next(self.sources[0])
+                except StopIteration:
+                    self.sources.popleft()
+                    continue
+                if not msg.id:
+                    msg.id = self.request_id()
+                elif msg.id > self.request_counter:
+                    # assigned ids must not collide with explicit ones
+                    self.request_counter = msg.id
+                batch.append(msg)
+        return batch
+
+
+    def generator(self, stream=None):
         '''
             Each time someone decides to put some work in queue, we yield all
-            collected requests.
+            collected requests and loaded sources in batches of at most batch_size.
+            Sending is paused while max_in_flight requests wait for result
+            and continues as results arrive, and while pacer has no tokens
+            or is outside of programming windows.
+
+            Args:
+                stream (int): number of stream the generator feeds, generator
+                    of broken stream still polled by grpc stops without taking
+                    requests, which would never get result.
         '''
         while True:
-            self.work_queue.get()
+            work_queue = self.work_queue
+            item = work_queue.get()
+            if stream != self.streams:
+                self.hand_over(work_queue, item)
+                return
             self.status = 'processing'
-            for request_id in self.request:
-                self.processed_request[request_id] = {}
-                self.processed_request[request_id]['request'] = self.request[request_id]
-                self.processed_request[request_id]['response'] = None
-            yield rib.ModifyRequest(request=self.request.values())
-            self.request.clear()
+            while True:
+                with self.window:
+                    while True:
+                        if stream != self.streams:
+                            self.hand_over(work_queue, item)
+                            return
+                        count = self.window_size()
+                        if count <= 0:
+                            self.window.wait()
+                            continue
+                        if self.pacer is None:
+                            break
+                        count, delay = self.pacer.allowed(count)
+                        if count:
+                            break
+                        self.window.wait(delay)
+                    batch = self.next_requests(count)
+                    if self.pacer is not None:
+                        self.pacer.consume(batch)
+                    if not batch:
+                        self.pending_work += 1
+                        self.work_done()
+                        break
+                    # wake up dispatcher of ShardedModify waiting for free backlog
+                    self.window.notify_all()
+                    now = time.time()
+                    for msg in batch:
+                        self.in_flight[msg.id] = (now, msg.WhichOneof('data'))
+                        self.processed_request.sent(msg)
+                    self.stats.requests_sent(len(batch), now)
+                # journal syncs file, receiver is not blocked meanwhile, batch
+                # is still journaled before it is sent, so before its results
+                if self.journal:
+                    self.journal.requests(batch)
+                if self.cache is None:
+                    yield rib.ModifyRequest(request=batch)
+                elif self.raw:
+                    yield rib_cache.encode_batch(batch)
+                else:
+                    yield rib.ModifyRequest.FromString(rib_cache.encode_batch(batch))
+
+
+    def hand_over(self, work_queue=None, item=None):
+        # work item taken by generator of broken stream is left to generator
+        # of current stream, unless it belongs to queue of finished run
+        if work_queue is self.work_queue:
+            work_queue.put(item)
+        work_queue.task_done()
+
+
+    def work_done(self):
+        # work item is done once all its requests received result
+        if not self.in_flight:
+            while self.pending_work:
+                self.pending_work -= 1
+                self.work_queue.task_done()
 
 
     def receiver(self):
-        self.rpc_handler = self.stub_method(self.generator(),
-                                            metadata = self.metadata,
-                                            timeout = self._timeout)
+        # results of requests sent on previous stream never arrive, so they
+        # are queued again ahead of other queued requests and of resync
+        with self.window:
+            lost = self.processed_request.unsent(sorted(self.in_flight))
+            if lost:
+                logger.info('{0}: {1} requests without result are sent again'.format(self.name,
+                                                                                    len(lost)))
+                queued = self.request
+                self.request = OrderedDict([(msg.id, msg) for msg in lost])
+                self.request.update(queued)
+            self.in_flight = {}
+            self.pending_work = 0
+        if self.streams and self.auto_resync and self.shadow is not None:
+            self.resync()
+        self.streams += 1
+        # stubs which were not created by create_stub dont have raw method
+        self.raw = self.cache is not None and hasattr(self.stub, 'ModifyRaw')
+        stub_method = self.stub.ModifyRaw if self.raw else self.stub_method
+        self.rpc_handler = stub_method(self.generator(self.streams),
+                                       metadata = self.metadata,
+                                       timeout = self._timeout)
         for msg in self.rpc_handler:
+            received = time.time()
+            if self.journal:
+                self.journal.results(msg.result)
+            if self.last_resync:
+                self.last_resync.results(msg.result)
             self.response_processor(msg)
             self.status = 'waiting'
-            self.work_queue.task_done()
+            with self.window:
+                now = time.time()
+                sent = now
+                failed = False
+                for result in msg.result:
+                    in_flight = self.in_flight.pop(result.id, None)
+                    if in_flight is not None:
+                        sent_at, field = in_flight
+                        self.stats.result(field, result.status, received - sent_at, received)
+                        sent = min(sent, sent_at)
+                    failed = failed or result.status == rib.ModifyResponse.Result.FAILED
+                if self.controller and msg.result:
+                    self.controller.update(rpc=self, latency=now - sent, failed=failed, now=now)
+                if failed and self.retry_policy is not None:
+                    self.schedule_retries(msg.result)
+                self.work_done()
+                self.window.notify_all()
 
 
     def default_response_processor(self, response = None):
-        for result in response.result:
-            self.processed_request[result.id]['response'] = result
+        with self.lock:
+            for result in response.result:
+                entry = self.processed_request.result(result)
+                if (self.shadow is not None and entry['request'] is not None and
+                        result.status == rib.ModifyResponse.Result.OK):
+                    self.shadow.apply(entry['request'])
+
+
+    def statistics(self):
+        '''
+            Returns ModifyStats of this rpc.
+        '''
+        return self.stats
+
+
+    def failed(self, status=rib.ModifyResponse.Result.FAILED, reason=None):
+        '''
+            Returns sorted ids of requests whose last result has status,
+            all which did not end with OK if status is None, optionally
+            only with extended_status equal to reason.
+        '''
+        with self.lock:
+            return self.processed_request.failed(status=status, reason=reason)
+
+
+    def failure_summary(self):
+        '''
+            Returns dict (table name, operation, extended_status) -> number
+            of failures received, including failures which were retried.
+        '''
+        summary = {}
+        with self.lock:
+            reasons = list(self.processed_request.reasons.items())
+        for (field, reason), count in reasons:
+            table_id, operation = field_tables.get(field, (None, None))
+            key = (rib.TableId.Name(table_id) if table_id is not None else field, operation, reason)
+            summary[key] = summary.get(key, 0) + count
+        return summary
+
+
+    def retry(self, ids=None, status=rib.ModifyResponse.Result.FAILED, reason=None, delay=None):
+        '''
+            Sends failed requests again with their original ids and returns
+            ids which were retried. Requests waiting for result or for
+            scheduled retry are skipped.
+
+            Args:
+                ids (list of int): ids of failed requests, selected by status
+                    and reason if not specified.
+                status (int): status of last result of retried requests.
+                reason (str): extended_status of retried requests, any if not set.
+                delay (float): seconds after which requests are sent.
+        '''
+        with self.lock:
+            if ids is None:
+                ids = self.processed_request.failed(status=status, reason=reason)
+            requests = []
+            for request_id in ids:
+                entry = self.processed_request.failures.get(request_id)
+                if (entry is None or entry['request'] is None or request_id in self.scheduled or
+                        request_id in self.processed_request.pending):
+                    continue
+                self.attempts[request_id] = self.attempts.get(request_id, 0) + 1
+                self.scheduled.add(request_id)
+                requests.append(entry['request'])
+        if not requests:
+            return []
+        if delay:
+            timer = Timer(delay, self.requeue, [requests])
+            timer.daemon = True
+            timer.start()
+        else:
+            self.requeue(requests)
+        return [msg.id for msg in requests]
+
+
+    def requeue(self, requests=None):
+        with self.lock:
+            for msg in requests:
+                self.request[msg.id] = msg
+        self.execute()
+        # work is queued before ids leave scheduled, so wait() does not miss it
+        with self.lock:
+            for msg in requests:
+                self.scheduled.discard(msg.id)
+
+
+    def schedule_retries(self, results=None):
+        '''
+            Retries FAILED results according to retry_policy, requests
+            with the same number of previous retries are sent together.
+        '''
+        attempts = {}
+        for result in results:
+            if result.status != rib.ModifyResponse.Result.FAILED:
+                continue
+            attempt = self.attempts.get(result.id, 0) + 1
+            if self.retry_policy.retryable(result, attempt):
+                attempts.setdefault(attempt, []).append(result.id)
+        for attempt, ids in attempts.items():
+            self.retry_policy.scheduled += len(self.retry(ids=ids,
+                                                          delay=self.retry_policy.backoff(attempt)))
+
+
+    def wait(self, timeout=None):
+        '''
+            Waits until all requests receive result, including scheduled retries.
+        '''
+        stop = time.time() + timeout if timeout else None
+        while True:
+            Rpc.wait(self, timeout=max(stop - time.time(), 0.001) if stop else None)
+            if not self.scheduled or (stop and time.time() >= stop):
+                return
+            time.sleep(0.1)
 
 
     def clear(self, request=True, response=True, error=True):
@@ -197,8 +1295,11 @@ class Modify(Rpc):
         self.wait()
         if request:
             self.request = OrderedDict()
+            self.sources = deque()
         if response:
-            self.processed_request = OrderedDict()
+            self.processed_request = RequestTracker(retain=self.processed_request.retain)
+            self.stats.reset()
+            self.attempts = {}
         if error:
             self.error = None
 
@@ -262,6 +1363,65 @@ class Modify(Rpc):
             return str(msg)
 
 
+    def exported_requests(self, sources=False):
+        '''
+            Returns iterator of requests which were not sent yet. Loaded
+            sources are included if sources is set, they are consumed
+            by export, so they are not sent by next execute.
+        '''
+        with self.lock:
+            requests = [iter(list(self.request.values()))]
+            if sources:
+                requests.extend(self.sources)
+                self.sources.clear()
+        return chain(*requests)
+
+
+    def to_json(self, file_path=None, sources=False):
+        '''
+            Returns requests which were not sent yet as json lines, one
+            ModifyRequest.Request per line. If file_path is specified,
+            requests are streamed to file and their number is returned.
+
+            Args:
+                file_path (str): path to jsonl file.
+                sources (bool): export also loaded sources, see exported_requests.
+        '''
+        if file_path:
+            return rib_loader.write_jsonl(file_path, self.exported_requests(sources))
+        return '\n'.join([rib_loader.json_line(msg) for msg in self.exported_requests(sources)])
+
+
+    def to_binary(self, file_path=None, sources=False):
+        '''
+            Streams requests which were not sent yet to file as length
+            delimited ModifyRequest.Request messages. Returns number
+            of written requests.
+
+            Args:
+                file_path (str): path to binary file.
+                sources (bool): export also loaded sources, see exported_requests.
+        '''
+        return rib_loader.write_delimited(file_path, self.exported_requests(sources))
+
+
+    def from_json(self, file_path=None):
+        '''
+            Adds jsonl file with one ModifyRequest.Request per line as source
+            of requests, see load.
+        '''
+        self.load(source=file_path, format='jsonl')
+
+
+    def from_binary(self, file_path=None):
+        '''
+            Adds file with length delimited ModifyRequest.Request messages
+            as source of requests, see load. File is memory mapped and with
+            cache set requests are sent without being parsed.
+        '''
+        self.load(source=file_path, format='binary')
+
+
     def route(self, id=None, operation=None, table=None, key_prefix=None, key_preference=None,
               rtm_preference=None, metric=None, tunnel_next_hop=None, json=None):
         '''
@@ -287,56 +1447,12 @@ class Modify(Rpc):
         else:
             if id == None:
                 id = self.request_id()
-            if operation in ['add', 'replace']:
-                table_entry = rib.RouteTableEntry(
-                                entry_key = rib.RouteTableEntryKey(
-                                    prefix = key_prefix,
-                                    preference = key_preference
-                                ),
-                                rtm_preference = rtm_preference,
-                                metric = metric,
-                                tunnel_next_hop = tunnel_next_hop
-                              )
-                if table == 'ipv4' and operation == 'add':
-                    msg = rib.ModifyRequest.Request(id=id,ipv4_route_ADD = table_entry)
-                elif table == 'ipv4' and operation == 'replace':
-                    msg = rib.ModifyRequest.Request(id=id,ipv4_route_REPLACE = table_entry)
-                elif table == 'ipv6' and operation == 'add':
-                    msg = rib.ModifyRequest.Request(id=id,ipv6_route_ADD = table_entry)
-                elif table == 'ipv6' and operation == 'replace':
-                    msg = rib.ModifyRequest.Request(id=id,ipv6_route_REPLACE = table_entry)
-                else:
-                    raise ValueError('Invalid combination of table and operation: <{table}:{operation}>'.format(
-                                                                                    table=table,
-                                                                                    operation=operation))
-            elif operation == 'delete':
-                if table == 'ipv4':
-                    msg = rib.ModifyRequest.Request(
-                                                id=id,
-                                                ipv4_route_DELETE = rib.RouteTableEntryKey(
-                                                            prefix = key_prefix,
-                                                            preference = key_preference
-                                                )
-                                             )
-                elif table == 'ipv6':
-                    msg = rib.ModifyRequest.Request(
-                                                id=id,
-                                                ipv6_route_DELETE = rib.RouteTableEntryKey(
-                                                            prefix = key_prefix,
-                                                            preference = key_preference
-                                                )
-                                            )
-                                        
-                else:
-                    raise ValueError('Invalid combination of table and operation: <{table}:{operation}>'.format(
-                                                                                    table=table,
-                                                                                    operation=operation))
-
-            else:
-                raise ValueError('Unkown operation request <{0}>, valid operations: {1}'.format(operation,
-                                                                                                ['add', 'replace', 'delete']))
+            msg = self.build(entry='route', id=id, operation=operation, table=table,
+                             key_prefix=key_prefix, key_preference=key_preference,
+                             rtm_preference=rtm_preference, metric=metric,
+                             tunnel_next_hop=tunnel_next_hop)
 
-        self.request[id] = msg
+        self.enqueue(msg)
         return msg.id
 
 
@@ -364,54 +1480,11 @@ class Modify(Rpc):
         else:
             if id == None:
                 id = self.request_id()
-            if operation in ['add', 'replace']:
-                table_entry = rib.TunnelTableEntry(
-                                entry_key = rib.TunnelTableEntryKey(
-                                    endpoint = key_endpoint,
-                                    preference = key_preference
-                                ),
-                                ttm_preference = ttm_preference,
-                                metric = metric
-                              )
-                if table == 'ipv4' and operation == 'add':
-                    msg = rib.ModifyRequest.Request(id=id,ipv4_tunnel_ADD = table_entry)
-                elif table == 'ipv4' and operation == 'replace':
-                    msg = rib.ModifyRequest.Request(id=id,ipv4_tunnel_REPLACE = table_entry)
-                elif table == 'ipv6' and operation == 'add':
-                    msg = rib.ModifyRequest.Request(id=id,ipv6_tunnel_ADD = table_entry)
-                elif table == 'ipv6' and operation == 'replace':
-                    msg = rib.ModifyRequest.Request(id=id,ipv6_tunnel_REPLACE = table_entry)
-                else:
-                    raise ValueError('Invalid combination of table and operation: <{table}:{operation}>'.format(
-                                                                                    table=table,
-                                                                                    operation=operation))
-            elif operation == 'delete':
-                if table == 'ipv4':
-                    msg = rib.ModifyRequest.Request(
-                                                id=id,
-                                                ipv4_tunnel_DELETE = rib.TunnelTableEntryKey(
-                                                            endpoint = key_endpoint,
-                                                            preference = key_preference
-                                                )
-                                             )
-                elif table == 'ipv6':
-                    msg = rib.ModifyRequest.Request(
-                                                id=id,
-                                                ipv6_tunnel_DELETE = rib.TunnelTableEntryKey(
-                                                            endpoint = key_endpoint,
-                                                            preference = key_preference
-                                                )
-                                            )
-                                        
-                else:
-                    raise ValueError('Invalid combination of table and operation: <{table}:{operation}>'.format(
-                                                                                    table=table,
-                                                                                    operation=operation))
-            else:
-                raise ValueError('Unkown operation request <{0}>, valid operations: {1}'.format(operation,
-                                                                                                ['add', 'replace', 'delete']))
+            msg = self.build(entry='tunnel', id=id, operation=operation, table=table,
+                             key_endpoint=key_endpoint, key_preference=key_preference,
+                             ttm_preference=ttm_preference, metric=metric)
 
-        self.request[msg.id] = msg
+        self.enqueue(msg)
         return msg.id
 
 
@@ -439,33 +1512,11 @@ class Modify(Rpc):
         else:
             if not id:
                 id = self.request_id()
-            if operation in ['add', 'replace']:
-                label_entry = rib.LabelTableEntry (
-                                        entry_key = rib.LabelTableEntryKey(
-                                                label = key_label,
-                                                preference = key_preference
-                                        ),
-                                        ing_stats = rib.LabelTableIngrStats(
-                                            enable = ing_stats_enable
-                                        ),
-                                        type=type
-                                    )
-                if operation == 'add':
-                    msg = rib.ModifyRequest.Request(id=id,mpls_label_ADD = label_entry)
-                else:
-                    msg = rib.ModifyRequest.Request(id=id,mpls_label_REPLACE = label_entry)
-            elif operation == 'delete':
-                msg = rib.ModifyRequest.Request(
-                                                id=id,
-                                                mpls_label_DELETE = rib.LabelTableEntryKey(
-                                                    label = key_label,
-                                                    preference = key_preference
-                                                )
-                                            )
-            else:
-                raise ValueError('Unkown operation request <{0}>, valid operations: {1}'.format(operation, ['add', 'replace', 'delete']))
+            msg = self.build(entry='label', id=id, operation=operation, key_label=key_label,
+                             key_preference=key_preference,
+                             ing_stats_enable=ing_stats_enable, type=type)
 
-        self.request[msg.id] = msg
+        self.enqueue(msg)
         return msg.id
 
 
@@ -496,7 +1547,7 @@ class Modify(Rpc):
                                                         nh_group_id=nh_group_id,
                                                         preference=preference,
                                                         type=nhs_type))
-        self.request[id] = msg
+        self.enqueue(msg)
         return msg.id
 
 
@@ -514,7 +1565,7 @@ class Modify(Rpc):
                 id = self.request_id()
             msg = rib.ModifyRequest.Request(id=id,
                                                 END_OF_RIB=rib.EndOfRib(id=table_id))
-        self.request[id] = msg
+        self.enqueue(msg)
         return msg.id
 
 
@@ -542,49 +1593,293 @@ class Modify(Rpc):
             raise ValueError('request_id must be specified for NextHopGroup')
 
         if json:
-            group = json_format.Parse(json, rib.NextHopGroup())
+            group = self.groups.add(json_format.Parse(json, rib.NextHopGroup()))
         else:
-            if type(primary_labels) is not list and primary_labels:
-                primary_labels = [int(x) for x in primary_labels.split(',')]
-            if primary_ip or primary_labels:
-                next_hop_primary = rib.NextHop(
-                                        ip_address = primary_ip,
-                                        pushed_label_stack = primary_labels)
-            else:
-                next_hop_primary = None
-
-            if type(backup_labels) is not list and backup_labels:
-                backup_labels = [int(x) for x in backup_labels.split(',')]
-            if backup_ip or backup_labels:
-                next_hop_backup = rib.NextHop(
-                                        ip_address = backup_ip,
-                                        pushed_label_stack = backup_labels)
-            else:
-                next_hop_backup = None
-
-            group = rib.NextHopGroup(
-                        id = group_id,
-                        weight = weight,
-                        primary = next_hop_primary,
-                        backup = next_hop_backup)
-
-        msg_type = self.request[request_id].WhichOneof('data')
-        if msg_type == 'ipv4_tunnel_ADD':
-            self.request[request_id].ipv4_tunnel_ADD.groups.extend([group])
-        elif msg_type == 'ipv4_tunnel_REPLACE':
-            self.request[request_id].ipv4_tunnel_REPLACE.groups.extend([group])
-        elif msg_type == 'ipv6_tunnel_ADD':
-            self.request[request_id].ipv6_tunnel_ADD.groups.extend([group])
-        elif msg_type == 'ipv6_tunnel_REPLACE':
-            self.request[request_id].ipv6_tunnel_REPLACE.groups.extend([group])
-        elif msg_type == 'mpls_label_ADD':
-            self.request[request_id].mpls_label_ADD.groups.extend([group])
-        elif msg_type == 'mpls_label_REPLACE':
-            self.request[request_id].mpls_label_REPLACE.groups.extend([group])
+            group = self.groups.intern(group_id=group_id, weight=weight,
+                                       primary_ip=primary_ip, primary_labels=primary_labels,
+                                       backup_ip=backup_ip, backup_labels=backup_labels)
+
+        entry = entry_of(self.request[request_id])
+        if hasattr(entry, 'groups'):
+            entry.groups.extend([group])
         return request_id
 
 
+    def attach_group(self, request_ids=None, group=None, **kwargs):
+        '''
+            Appends one NextHopGroup to many queued tunnel or label requests.
+            Group is built and interned only once. Returns number of
+            requests which were extended.
+
+            Args:
+                request_ids (list of int): ids of queued requests.
+                group (NextHopGroup): prebuilt group, if not specified
+                    it is built from kwargs (see next_hop_group).
+        '''
+        group = self.groups.add(group) if group is not None else self.groups.intern(**kwargs)
+        count = 0
+        with self.lock:
+            for request_id in request_ids:
+                entry = entry_of(self.request[request_id])
+                if hasattr(entry, 'groups'):
+                    entry.groups.extend([group])
+                    count += 1
+        return count
+
+
+def shard_key(msg=None):
+    '''
+        Returns key which must keep order of requests, None for
+        requests which are not bound to one entry.
+    '''
+    table_id, operation = request_table(msg)
+    if table_id is None:
+        return None
+    entry = entry_of(msg)
+    key = entry if operation == 'delete' else entry.entry_key
+    if table_id in [rib.IPv4RouteTable, rib.IPv6RouteTable]:
+        return table_id, key.prefix
+    elif table_id in [rib.IPv4TunnelTable, rib.IPv6TunnelTable]:
+        return table_id, key.endpoint
+    return table_id, key.label
+
+
+class ShardedModify(Modify):
+    '''
+        Modify which distributes requests over several Modify streams.
+
+        Requests are queued and loaded same way as in Modify. Dispatcher
+        thread partitions them by hash of table and entry key (prefix,
+        endpoint or label), so all requests of one entry go to the same
+        shard in original order. END_OF_RIB and NH_SWITCH are barriers,
+        they are sent on first shard after all previous requests were
+        acknowledged on all shards. Shards share lock of this rpc and
+        shadow RIB, journal, request cache, retry policy and pacer are
+        propagated to them on execute. Failed requests are tracked and retried
+        by shards. If ordering is set, request which needs tunnel or label
+        dispatched to other shard waits until all shards have results.
+
+        Args below are keyword only, other args are those of Modify.
+
+        Args:
+            stubs (list): RibApiStub per shard, stubs from separate channels
+                spread streams over several HTTP2 connections.
+            max_backlog (int): max number of requests waiting in each shard
+                before dispatcher is paused.
+    '''
+
+
+    def __init__(self, *args, **kwargs):
+
+        stubs = kwargs.pop('stubs')
+        max_backlog = kwargs.pop('max_backlog', 10000)
+
+        Modify.__init__(self, stub=stubs[0], *args, **kwargs)
+
+        self.max_backlog = max_backlog
+        self.shards = []
+        for index, stub in enumerate(stubs):
+            shard = Modify(stub=stub,
+                           name='{0}-shard-{1}'.format(self.name, index),
+                           rpc_type=self.rpc_type,
+                           metadata=self.metadata,
+                           timeout=self._timeout,
+                           batch_size=self.batch_size,
+                           max_in_flight=self.max_in_flight,
+                           retain=self.processed_request.retain // len(stubs) or 1)
+            shard.lock = self.lock
+            shard.window = self.window
+            self.shards.append(shard)
+        # reference -> shard which got add of its tunnel or label, reference ->
+        # shards which got deletes of entries using it, since shards were
+        # last synchronized, kept only if ordering is set
+        self.provided_on = {}
+        self.used_on = {}
+
+
+    def __str__(self):
+        display = 'Modify - {name} ({count} shards)\n'.format(name=self.name, count=len(self.shards))
+        display += '    Waiting for dispatch: {0}\n'.format(len(self.request))
+        for shard in self.shards:
+            display += '    {name}: {status}, {tracker}, error: {error}\n'.format(
+                                name=shard.name,
+                                status=shard.status,
+                                tracker=shard.processed_request,
+                                error=shard.error)
+        display += '\nError:\n{err}'.format(err = self.error)
+        return display
+
+
+    def shard(self, key=None):
+        return self.shards[hash(key) % len(self.shards)]
+
+
+    def execute(self, timeout=None):
+        for shard in self.shards:
+            shard.shadow = self.shadow
+            shard.journal = self.journal
+            shard.cache = self.cache
+            shard.retry_policy = self.retry_policy
+            # shards share pacer, so limits apply to all streams together
+            shard.pacer = self.pacer
+        if (self.auto_resync and self.shadow is not None and
+                any([shard.streams and shard.status == 'finished' for shard in self.shards])):
+            self.resync()
+        Modify.execute(self, timeout=timeout)
+
 
+    def receiver(self):
+        '''
+            Dispatcher, runs in worker thread instead of stream receiver.
+        '''
+        while True:
+            self.work_queue.get()
+            self.status = 'processing'
+            while True:
+                # batch_size is not limited by default, backlog of shard is
+                batch = self.next_requests(self.batch_size or self.max_backlog)
+                if not batch:
+                    break
+                self.dispatch(batch)
+            for shard in self.shards:
+                shard.wait()
+            self.provided_on.clear()
+            self.used_on.clear()
+            self.status = 'waiting'
+            self.work_queue.task_done()
 
 
+    def dispatch(self, batch=None):
+        used = set()
+        for msg in batch:
+            key = shard_key(msg)
+            if key is None:
+                self.barrier(msg, used)
+                used = set()
+                continue
+            shard = self.shard(key)
+            if self.ordering is not None and self.depends(msg, shard):
+                self.sync(used)
+                used = set()
+            with self.window:
+                if len(shard.request) >= self.max_backlog:
+                    shard.execute()
+                    while len(shard.request) >= self.max_backlog:
+                        self.window.wait(1.0)
+                shard.request[msg.id] = msg
+            used.add(shard)
+        for shard in used:
+            shard.execute()
+
+
+    def depends(self, msg=None, shard=None):
+        '''
+            Returns True if msg needs tunnel or label added on other shard
+            since last sync, or deletes tunnel or label still used by entry
+            deleted on other shard since last sync. Shards are not ordered
+            against each other, so such msg can be sent only after sync.
+        '''
+        entry, operation, provided, references = rib_dependencies.dependencies(msg, self.shadow)
+        if operation == 'delete':
+            conflict = provided is not None and bool(self.used_on.get(provided, set()) - set([shard]))
+        else:
+            conflict = any([self.provided_on.get(reference, shard) is not shard
+                            for reference in references])
+        if conflict:
+            self.provided_on.clear()
+            self.used_on.clear()
+        if operation == 'delete':
+            for reference in references:
+                self.used_on.setdefault(reference, set()).add(shard)
+        elif provided is not None:
+            self.provided_on[provided] = shard
+        return conflict
+
+
+    def sync(self, used=None):
+        '''
+            Sends requests dispatched to used shards and waits
+            until all shards have results of all requests.
+        '''
+        for shard in used:
+            shard.execute()
+        for shard in self.shards:
+            shard.wait()
 
+
+    def barrier(self, msg=None, used=None):
+        self.sync(used)
+        self.provided_on.clear()
+        self.used_on.clear()
+        self.shards[0].enqueue(msg)
+        self.shards[0].execute()
+        self.shards[0].wait()
+
+
+    def cancel(self):
+        for shard in self.shards:
+            shard.cancel()
+
+
+    def wait(self, timeout=None):
+        Modify.wait(self, timeout=timeout)
+        for shard in self.shards:
+            shard.wait(timeout=timeout)
+
+
+    def statistics(self):
+        '''
+            Returns ModifyStats merged from all shards.
+        '''
+        stats = ModifyStats()
+        with self.lock:
+            for shard in self.shards:
+                stats.merge(shard.stats)
+        return stats
+
+
+    def failed(self, status=rib.ModifyResponse.Result.FAILED, reason=None):
+        ids = []
+        for shard in self.shards:
+            ids.extend(shard.failed(status=status, reason=reason))
+        return sorted(ids)
+
+
+    def failure_summary(self):
+        summary = {}
+        for shard in self.shards:
+            for key, count in shard.failure_summary().items():
+                summary[key] = summary.get(key, 0) + count
+        return summary
+
+
+    def retry(self, ids=None, status=rib.ModifyResponse.Result.FAILED, reason=None, delay=None):
+        retried = []
+        for shard in self.shards:
+            shard.retry_policy = self.retry_policy
+            if ids is None:
+                shard_ids = None
+            else:
+                with self.lock:
+                    shard_ids = [request_id for request_id in ids
+                                 if request_id in shard.processed_request.failures]
+            retried.extend(shard.retry(ids=shard_ids, status=status, reason=reason, delay=delay))
+        return sorted(retried)
+
+
+    def set_pacer(self, pacer=None):
+        Modify.set_pacer(self, pacer=pacer)
+        for shard in self.shards:
+            shard.set_pacer(pacer=pacer)
+
+
+    def set_window(self, batch_size=None, max_in_flight=None):
+        Modify.set_window(self, batch_size=batch_size, max_in_flight=max_in_flight)
+        for shard in self.shards:
+            shard.set_window(batch_size=batch_size, max_in_flight=max_in_flight)
+
+
+    def clear(self, request=True, response=True, error=True):
+        Modify.clear(self, request=request, response=response, error=error)
+        for shard in self.shards:
+            shard.clear(request=request, response=response, error=error)
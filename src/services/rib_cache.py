@@ -0,0 +1,237 @@
+############################################################################
+#
+#   Filename:           rib_cache.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 22:54:37 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import rib_loader
+
+from protos_gen import nokia_rib_api_pb2 as rib
+
+from collections import deque
+
+# wire tags of ModifyRequest.Request.id and ModifyRequest.request
+ID_TAG = b'\x08'
+REQUEST_TAG = b'\x0a'
+
+# field number -> name of fields in ModifyRequest.Request.data oneof
+data_fields = dict([(field.number, field.name)
+                    for field in rib.ModifyRequest.Request.DESCRIPTOR.oneofs_by_name['data'].fields])
+
+# varints of values below 1 << 14, which covers lengths of requests
+short_varints = ([bytes(bytearray([value])) for value in range(0x80)] +
+                 [bytes(bytearray([(value & 0x7f) | 0x80, value >> 7]))
+                  for value in range(0x80, 1 << 14)])
+
+
+def varint(value=None):
+    if value < 1 << 14:
+        return short_varints[value]
+    return rib_loader.encode_varint(value)
+
+
+class CachedRequest(object):
+    '''
+        ModifyRequest.Request kept as id and serialized rest of message.
+
+        Serialization only prepends id to cached body. Message is parsed
+        only when some of its fields is accessed, after that message
+        is authoritative, so changes done on it (eg. appended groups)
+        are sent.
+    '''
+
+    __slots__ = ('id', 'body', '_message')
+
+    def __init__(self, id=None, body=None):
+        self.id = id
+        self.body = body
+        self._message = None
+
+
+    def __str__(self):
+        return str(self.message)
+
+
+    def __getattr__(self, name):
+        return getattr(self.message, name)
+
+
+    def WhichOneof(self, name=None):
+        # body without id starts with field of data oneof, so field
+        # is known without parsing message
+        if self._message is None and name == 'data' and self.body:
+            return data_fields.get(rib_loader.decode_varint(bytearray(self.body[:5]), 0)[0] >> 3)
+        return self.message.WhichOneof(name)
+
+
+    @property
+    def message(self):
+        if self._message is None:
+            self._message = rib.ModifyRequest.Request.FromString(self.body)
+        self._message.id = self.id or 0
+        return self._message
+
+
+    def ByteSize(self):
+        if self._message is not None:
+            return self.message.ByteSize()
+        if not self.id:
+            return len(self.body)
+        return len(ID_TAG) + len(varint(self.id)) + len(self.body)
+
+
+    def SerializeToString(self):
+        if self._message is not None:
+            return self.message.SerializeToString()
+        if not self.id:
+            return self.body
+        return ID_TAG + varint(self.id) + self.body
+
+
+def encode_batch(batch=None):
+    '''
+        Returns serialized ModifyRequest with requests from batch,
+        which can mix messages and CachedRequests.
+    '''
+    data = []
+    for msg in batch:
+        request = msg.SerializeToString()
+        data.append(REQUEST_TAG)
+        data.append(varint(len(request)))
+        data.append(request)
+    return b''.join(data)
+
+
+class RequestCache(object):
+    '''
+        LRU cache of serialized request bodies keyed by entry content.
+
+        Requests built from the same arguments, or wrapping the same
+        shadow RIB entry, share one body, so programming them again needs
+        no message construction, only id and body concatenation.
+        Least recently used bodies are evicted above max_entries.
+
+        Recency is tracked by use stamps appended to deque, stale stamps
+        are skipped during eviction and dropped when deque grows over
+        four times the number of entries. Hit only updates plain dicts
+        and deques without allocating containers, python2 OrderedDict
+        and garbage collector are too slow for per request use.
+
+        Args:
+            max_entries (int): max number of cached bodies.
+    '''
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self.clear()
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def __str__(self):
+        lookups = self.hits + self.misses
+        return ('Cached bodies: {size}/{max_entries}, hits: {hits}, misses: {misses}, '
+                'evictions: {evictions}, hit ratio: {ratio:.1f}%').format(
+                    size=len(self.entries),
+                    max_entries=self.max_entries,
+                    hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions,
+                    ratio=100.0 * self.hits / lookups if lookups else 0.0)
+
+
+    def touch(self, key=None):
+        self.stamp += 1
+        self.stamps[key] = self.stamp
+        self.order.append(key)
+        self.order_stamps.append(self.stamp)
+        if len(self.order) > 4 * len(self.entries) + 1024:
+            self.compact()
+
+
+    def compact(self):
+        stamps = self.stamps
+        used = [(key, stamp) for key, stamp in zip(self.order, self.order_stamps)
+                if stamps.get(key) == stamp]
+        self.order = deque([key for key, _ in used])
+        self.order_stamps = deque([stamp for _, stamp in used])
+
+
+    def lookup(self, key=None):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touch(key)
+        return value
+
+
+    def store(self, key=None, value=None):
+        self.entries[key] = value
+        self.touch(key)
+        while len(self.entries) > self.max_entries:
+            key = self.order.popleft()
+            stamp = self.order_stamps.popleft()
+            if self.stamps.get(key) == stamp:
+                del self.entries[key]
+                del self.stamps[key]
+                self.evictions += 1
+
+
+    def request(self, entry=None, id=None, **kwargs):
+        '''
+            Returns CachedRequest built from arguments of rib_loader.build_request.
+        '''
+        key = (entry,) + tuple(sorted([(name, tuple(value) if isinstance(value, list) else value)
+                                      for name, value in kwargs.items() if value is not None]))
+        body = self.lookup(key)
+        if body is None:
+            body = rib_loader.build_request(entry=entry, **kwargs).SerializeToString()
+            self.store(key, body)
+        return CachedRequest(id=id, body=body)
+
+
+    def wrap(self, field=None, entry=None, request_id=None):
+        '''
+            Returns CachedRequest with entry set in field of data oneof.
+            Entry is identified by object, so cached body stays valid as
+            long as entry is not modified in place, which holds for
+            entries of ShadowRib.
+        '''
+        # int keys dont collide with tuple keys of request()
+        key = id(entry)
+        value = self.entries.get(key)
+        if value is not None and value[1] is entry and value[0] == field:
+            self.hits += 1
+            self.touch(key)
+            return CachedRequest(request_id, value[2])
+        self.misses += 1
+        body = rib.ModifyRequest.Request(**{field: entry}).SerializeToString()
+        # entry is referenced by cache, so its id cannot be reused by other object
+        self.store(key, (field, entry, body))
+        return CachedRequest(request_id, body)
+
+
+    def clear(self):
+        self.entries = {}
+        # key -> stamp of last use, stamps of all uses in order of use
+        self.stamps = {}
+        self.order = deque()
+        self.order_stamps = deque()
+        self.stamp = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
@@ -0,0 +1,353 @@
+############################################################################
+#
+#   Filename:           rib_dependencies.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Tue Oct 20 00:37:52 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import rib_api_service
+
+from protos_gen import nokia_rib_api_pb2 as rib
+
+from itertools import islice
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+MISSING_TUNNEL = 'missing tunnel'
+MISSING_LABEL = 'missing label'
+REFERENCED = 'deleted entry is still referenced'
+
+route_tables = [rib.IPv4RouteTable, rib.IPv6RouteTable]
+tunnel_tables = [rib.IPv4TunnelTable, rib.IPv6TunnelTable]
+
+# labels 0 - 15 are reserved, they are never programmed in label table
+first_label = 16
+
+
+def entry_references(table_id=None, entry=None):
+    '''
+        Returns sorted tuple of references of RouteTableEntry (tunnel of
+        tunnel_next_hop) or of TunnelTableEntry and LabelTableEntry (labels
+        pushed by their NextHopGroups). Reference is ('tunnel', table,
+        endpoint) or ('label', label).
+    '''
+    if table_id in route_tables:
+        hop = entry.tunnel_next_hop
+        if not hop:
+            return ()
+        return (('tunnel', 'ipv6' if ':' in hop else 'ipv4', hop),)
+    labels = set()
+    for group in entry.groups:
+        for hop in [group.primary, group.backup]:
+            labels.update([label for label in hop.pushed_label_stack if label >= first_label])
+    return tuple([('label', label) for label in sorted(labels)])
+
+
+def dependencies(msg=None, shadow=None):
+    '''
+        Returns (entry, operation, provided, references) of request.
+
+        entry identifies entry by table and key, provided is reference
+        under which other entries use it (tunnels and labels only) and
+        references are entries it needs. Deleted entry needs nothing, its
+        references are those of entry in shadow, so they can be deleted
+        only after it. entry is None for END_OF_RIB and NH_SWITCH.
+    '''
+    table_id, operation = rib_api_service.request_table(msg)
+    if table_id is None:
+        return None, None, None, ()
+    data = rib_api_service.entry_of(msg)
+    delete = operation == 'delete'
+    key = data if delete else data.entry_key
+    current = None if delete else data
+    if table_id in route_tables:
+        entry = (table_id, key.prefix, key.preference)
+        provided = None
+        if delete and shadow is not None:
+            try:
+                current = shadow.route(key.prefix).get(key.preference)
+            except ValueError:
+                pass
+    elif table_id in tunnel_tables:
+        entry = (table_id, key.endpoint, key.preference)
+        provided = ('tunnel', 'ipv4' if table_id == rib.IPv4TunnelTable else 'ipv6', key.endpoint)
+        if delete and shadow is not None:
+            current = shadow.tunnel(key.endpoint, key.preference)
+    else:
+        entry = (table_id, key.label, key.preference)
+        provided = ('label', key.label)
+        if delete and shadow is not None:
+            current = shadow.label(key.label, key.preference)
+    references = entry_references(table_id, current) if current is not None else ()
+    return entry, operation, provided, references
+
+
+def split(requests=None):
+    '''
+        Yields lists of requests between END_OF_RIB and NH_SWITCH
+        requests and these requests alone.
+    '''
+    segment = []
+    for msg in requests:
+        if rib_api_service.request_table(msg)[0] is None:
+            if segment:
+                yield segment
+            yield [msg]
+            segment = []
+        else:
+            segment.append(msg)
+    if segment:
+        yield segment
+
+
+class DependencyOrder(object):
+    '''
+        Orders Modify requests so that tunnels referenced by tunnel_next_hop
+        of routes and labels pushed by NextHopGroups of tunnels and labels
+        are programmed before entries which reference them, and deleted
+        after them.
+
+        Requests are topologically sorted by levels, all requests which
+        need nothing go first, then requests which need only them and so
+        on, each level in original order. Edges are found by dict lookups
+        of entries and references, so ordering takes O(n log n) time.
+        Requests of the same entry keep original order. Segment which
+        already is in dependency order is not changed. END_OF_RIB and
+        NH_SWITCH are never moved and nothing is moved across them.
+        References of deleted entries are looked up in shadow. If
+        references form a cycle, requests of the cycle keep original
+        order after all other requests.
+
+        Args:
+            shadow (ShadowRib): programmed entries, references of deletes
+                are not known without it.
+            chunk_size (int): number of requests ordered together by filter().
+    '''
+
+    def __init__(self, shadow=None, chunk_size=100000):
+        self.shadow = shadow
+        self.chunk_size = chunk_size
+        self.ordered = 0
+        self.moved = 0
+        self.cycles = 0
+
+
+    def __str__(self):
+        return 'ordered: {0}, moved: {1}, cycles: {2}'.format(self.ordered, self.moved, self.cycles)
+
+
+    def order_segment(self, segment=None):
+        '''
+            Returns requests of segment in dependency order, segment
+            is END_OF_RIB or NH_SWITCH alone or has none of them.
+        '''
+        info = [dependencies(msg, self.shadow) for msg in segment]
+        # entry -> index of its last request, reference -> index of last
+        # add or replace of its provider, reference -> indexes of deletes
+        # of entries using it
+        last = {}
+        added = {}
+        users = {}
+        edges = []
+        for index, (entry, operation, provided, references) in enumerate(info):
+            previous = last.get(entry)
+            if previous is not None:
+                edges.append((previous, index))
+            last[entry] = index
+            if operation == 'delete':
+                for reference in references:
+                    users.setdefault(reference, []).append(index)
+            elif provided is not None:
+                added[provided] = index
+        for index, (entry, operation, provided, references) in enumerate(info):
+            if operation != 'delete':
+                for reference in references:
+                    provider = added.get(reference)
+                    if provider is not None and provider != index:
+                        edges.append((provider, index))
+            elif provided is not None:
+                for user in users.get(provided, []):
+                    if user != index:
+                        edges.append((user, index))
+        self.ordered += len(segment)
+        # without edge pointing back original order satisfies all dependencies
+        if all([first < second for first, second in edges]):
+            return segment
+        successors = {}
+        waiting = [0] * len(segment)
+        for first, second in edges:
+            successors.setdefault(first, []).append(second)
+            waiting[second] += 1
+        # requests are sent in levels, every level has all requests ready
+        # after previous levels, so tunnels and labels are not interleaved
+        # with entries using them
+        ready = [index for index, count in enumerate(waiting) if not count]
+        result = []
+        while ready:
+            result.extend(ready)
+            following = []
+            for index in ready:
+                for successor in successors.get(index, []):
+                    waiting[successor] -= 1
+                    if not waiting[successor]:
+                        following.append(successor)
+            ready = sorted(following)
+        if len(result) < len(segment):
+            self.cycles += 1
+            emitted = set(result)
+            cycle = [index for index in range(len(segment)) if index not in emitted]
+            logger.warning('Dependency cycle of {0} requests, first id {1}'.format(
+                                                            len(cycle), segment[cycle[0]].id))
+            result.extend(cycle)
+        self.moved += len([1 for position, index in enumerate(result) if position != index])
+        return [segment[index] for index in result]
+
+
+    def order(self, requests=None):
+        '''
+            Returns list of ModifyRequest.Request (or CachedRequest)
+            in dependency order.
+        '''
+        result = []
+        for segment in split(requests):
+            result.extend(self.order_segment(segment))
+        return result
+
+
+    def filter(self, iterable=None):
+        '''
+            Yields requests of iterable ordered in chunks of chunk_size
+            requests, so only dependencies within one chunk are ordered.
+        '''
+        iterator = iter(iterable)
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                return
+            for msg in self.order(chunk):
+                yield msg
+
+
+class ConsistencyCheck(object):
+    '''
+        Checks references between route, tunnel and label tables.
+
+        Requests are applied in given order on index of entries built
+        from shadow. Route with tunnel_next_hop of tunnel which does not
+        exist, tunnel or label pushing label which does not exist and
+        delete of last tunnel or label entry still referenced by other
+        entries are reported. Tunnel is referenced by endpoint and label
+        by label, so any preference satisfies reference.
+
+        Args:
+            shadow (ShadowRib): programmed entries, requests are checked
+                against empty tables if not set.
+    '''
+
+    def __init__(self, shadow=None):
+        self.shadow = shadow
+        self.checked = 0
+        # reason -> number of problems
+        self.counters = {}
+        # (reason, reference, request) of every problem
+        self.problems = []
+        self.index()
+
+
+    def __str__(self):
+        return 'checked: {0}, problems: {1}{2}'.format(
+                    self.checked,
+                    len(self.problems),
+                    ''.join([', {0}: {1}'.format(reason, count)
+                             for reason, count in sorted(self.counters.items())]))
+
+
+    def index(self):
+        # entry -> its references, reference -> number of entries providing
+        # it and number of entries using it
+        self.entries = {}
+        self.providers = {}
+        self.users = {}
+        if self.shadow is None:
+            return
+        for table_id, table in [(rib.IPv4RouteTable, 'ipv4'), (rib.IPv6RouteTable, 'ipv6')]:
+            for _, _, preferences in self.shadow.routes[table].items():
+                for preference, entry in preferences.items():
+                    self.add((table_id, entry.entry_key.prefix, preference), None,
+                             entry_references(table_id, entry))
+        for table_id, table in [(rib.IPv4TunnelTable, 'ipv4'), (rib.IPv6TunnelTable, 'ipv6')]:
+            for (endpoint, preference), entry in self.shadow.tunnels[table].items():
+                self.add((table_id, endpoint, preference), ('tunnel', table, endpoint),
+                         entry_references(table_id, entry))
+        for (label, preference), entry in self.shadow.labels.items():
+            self.add((rib.MplsLabelTable, label, preference), ('label', label),
+                     entry_references(rib.MplsLabelTable, entry))
+
+
+    def add(self, entry=None, provided=None, references=None):
+        old = self.entries.get(entry)
+        if old is None:
+            if provided is not None:
+                self.providers[provided] = self.providers.get(provided, 0) + 1
+        else:
+            for reference in old:
+                self.users[reference] -= 1
+        for reference in references:
+            self.users[reference] = self.users.get(reference, 0) + 1
+        self.entries[entry] = references
+
+
+    def remove(self, entry=None, provided=None):
+        '''
+            Returns True if last provider of still used reference was removed.
+        '''
+        old = self.entries.pop(entry, None)
+        if old is None:
+            return False
+        for reference in old:
+            self.users[reference] -= 1
+        if provided is None:
+            return False
+        self.providers[provided] -= 1
+        return not self.providers[provided] and self.users.get(provided, 0) > 0
+
+
+    def problem(self, reason=None, reference=None, msg=None):
+        self.counters[reason] = self.counters.get(reason, 0) + 1
+        self.problems.append((reason, reference, msg))
+        logger.debug('Request {0}: {1} {2}'.format(msg.id, reason, reference[-1]))
+
+
+    def check(self, requests=None):
+        '''
+            Applies iterable of ModifyRequest.Request (or CachedRequest)
+            and returns list of problems found, which are also appended
+            to problems.
+        '''
+        count = len(self.problems)
+        for msg in requests:
+            entry, operation, provided, references = dependencies(msg)
+            if entry is None:
+                continue
+            self.checked += 1
+            if operation == 'delete':
+                if self.remove(entry, provided):
+                    self.problem(REFERENCED, provided, msg)
+                continue
+            for reference in references:
+                if not self.providers.get(reference):
+                    self.problem(MISSING_TUNNEL if reference[0] == 'tunnel' else MISSING_LABEL,
+                                 reference, msg)
+            self.add(entry, provided, references)
+        return self.problems[count:]
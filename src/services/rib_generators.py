@@ -0,0 +1,350 @@
+############################################################################
+#
+#   Filename:           rib_generators.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 23:41:08 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import rib_api_service
+import rib_cache
+import rib_loader
+import rib_shadow
+import rib_validate
+
+from protos_gen import nokia_rib_api_pb2 as rib
+
+from bisect import bisect
+import binascii
+import random
+import socket
+import struct
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+entries = ['route', 'tunnel', 'label']
+
+# wire tags of string and varint key field, which is field 1 of every entry key
+STRING_KEY_TAG = b'\x0a'
+LABEL_KEY_TAG = b'\x08'
+# wire tag of entry_key, field 1 of every entry
+ENTRY_KEY_TAG = b'\x0a'
+
+max_label = (1 << 20) - 1
+
+
+def address(table=None, key=None):
+    '''
+        Returns ipv4 or ipv6 address of table formatted from int key.
+    '''
+    if table == 'ipv4':
+        return socket.inet_ntoa(struct.pack('!I', key))
+    return socket.inet_ntop(socket.AF_INET6, binascii.unhexlify('{0:032x}'.format(key)))
+
+
+def prefix_range(first=None, count=None, step=1):
+    '''
+        Yields count consecutive prefixes with length of first, every next
+        one step subnets after previous. Host address without length
+        yields host addresses, so it also generates tunnel endpoints.
+        Stops at end of address space if count is not specified.
+
+        Args:
+            first (str): first prefix in CIDR or address, eg. 10.0.0.0/24.
+            count (int): number of prefixes.
+            step (int): distance of consecutive prefixes in subnets.
+    '''
+    table, key, length, _ = rib_validate.parse(first)
+    width = rib_shadow.families[table][1]
+    suffix = '/{0}'.format(length) if '/' in first else ''
+    increment = step << (width - length)
+    last = (1 << width) - 1
+    if count is not None:
+        last = min(last, key + (count - 1) * increment)
+    return addresses(table, key, last, increment, suffix)
+
+
+def addresses(table=None, key=None, last=None, increment=None, suffix=''):
+    '''
+        Yields addresses of table from int key up to last with suffix appended.
+    '''
+    if table == 'ipv4':
+        # most common case formatted without generic address()
+        pack = struct.Struct('!I').pack
+        ntoa = socket.inet_ntoa
+        while key <= last:
+            yield ntoa(pack(key)) + suffix
+            key += increment
+        return
+    while key <= last:
+        yield address(table, key) + suffix
+        key += increment
+
+
+def parse_lengths(lengths=None):
+    '''
+        Returns dict prefix length -> weight from string like 24:70,32:30,
+        weight defaults to 1.
+    '''
+    result = {}
+    for item in lengths.split(','):
+        length, _, weight = item.partition(':')
+        result[int(length)] = float(weight) if weight else 1.0
+    return result
+
+
+def random_prefixes(within=None, count=None, lengths=None, seed=None, unique=False):
+    '''
+        Yields count random prefixes inside of within prefix, with lengths
+        drawn from weighted distribution.
+
+        Args:
+            within (str): prefix containing all generated prefixes, eg. 10.0.0.0/8.
+            count (int): number of prefixes.
+            lengths (dict): prefix length -> weight, or string like 24:70,32:30.
+                Length of within if not specified.
+            seed (int): seed of random generator, same seed yields same prefixes.
+            unique (bool): skip already generated prefixes. Keeps set of ints
+                of all generated prefixes, stops when no new prefix was found
+                in 100 consecutive attempts.
+    '''
+    table, base, within_length, _ = rib_validate.parse(within)
+    width = rib_shadow.families[table][1]
+    if not isinstance(lengths, dict):
+        lengths = parse_lengths(lengths) if lengths else {within_length: 1.0}
+    for length in lengths:
+        if not within_length <= length <= width:
+            raise ValueError('Prefix length {0} is outside of {1}'.format(length, within))
+    choices = sorted(lengths)
+    cumulative = []
+    total = 0.0
+    for length in choices:
+        total += lengths[length]
+        cumulative.append(total)
+
+    # arguments are checked on call, not on first next()
+    def generate():
+        generator = random.Random(seed)
+        draw = generator.random
+        bits = generator.getrandbits
+        seen = set() if unique else None
+        misses = 0
+        generated = 0
+        while count is None or generated < count:
+            length = choices[bisect(cumulative, draw() * total)]
+            free = length - within_length
+            key = base | ((bits(free) if free else 0) << (width - length))
+            if seen is not None:
+                marker = (key << 8) | length
+                if marker in seen:
+                    misses += 1
+                    if misses >= 100:
+                        logger.warning('No new prefix in {0} after {1} prefixes'.format(within,
+                                                                                       generated))
+                        return
+                    continue
+                seen.add(marker)
+                misses = 0
+            yield '{0}/{1}'.format(address(table, key), length)
+            generated += 1
+
+    return generate()
+
+
+def label_block(first=None, count=None, step=1):
+    '''
+        Yields count labels starting with first, stops at highest label
+        if count is not specified.
+    '''
+    last = max_label if count is None else min(max_label, first + (count - 1) * step)
+    label = first
+    while label <= last:
+        yield label
+        label += step
+
+
+def fan_out(next_hops=None, width=1, labels=None, backup=False):
+    '''
+        Returns list of NextHopGroup sets, set N has width groups with next
+        hops N, N+1, ... of next_hops, so entries cycling over sets spread
+        over all next hops evenly. Number of sets is number of next hops.
+
+        Args:
+            next_hops (list): ip addresses of next hops.
+            width (int): number of groups in one set, ECMP fan-out.
+            labels (list): label stacks pushed on next hops, list of int
+                or comma separated string for every next hop.
+            backup (bool): use following next hop as backup of every group.
+    '''
+    count = len(next_hops)
+    labels = labels or [None] * count
+    sets = []
+    for index in range(count):
+        groups = []
+        for offset in range(width):
+            primary = (index + offset) % count
+            kwargs = {}
+            if backup and count > 1:
+                kwargs = dict(backup_ip=next_hops[(primary + 1) % count],
+                              backup_labels=labels[(primary + 1) % count])
+            groups.append(rib_api_service.next_hop_group_message(group_id=offset + 1,
+                                                                 weight=1,
+                                                                 primary_ip=next_hops[primary],
+                                                                 primary_labels=labels[primary],
+                                                                 **kwargs))
+        sets.append(groups)
+    return sets
+
+
+class Template(object):
+    '''
+        Serialized parts of ModifyRequest.Request around its key.
+
+        Request is split to data field tag, rest of entry key and rest
+        of entry, so request with new key is only concatenation of
+        bytes, without building message.
+
+        Args:
+            msg: ModifyRequest.Request without key and id.
+            groups (list): NextHopGroups added to entry.
+    '''
+
+    __slots__ = ('tag', 'key_rest', 'entry_rest')
+
+    def __init__(self, msg=None, groups=None):
+        field = msg.WhichOneof('data')
+        data = getattr(msg, field)
+        self.tag = rib_loader.encode_varint((msg.DESCRIPTOR.fields_by_name[field].number << 3) | 2)
+        if field.endswith('_DELETE'):
+            self.key_rest = data.SerializeToString()
+            self.entry_rest = None
+            return
+        self.key_rest = data.entry_key.SerializeToString()
+        data.ClearField('entry_key')
+        if groups:
+            data.groups.extend(groups)
+        self.entry_rest = data.SerializeToString()
+
+
+    def body(self, key=None):
+        '''
+            Returns serialized request with serialized key field.
+        '''
+        varint = rib_cache.varint
+        key += self.key_rest
+        if self.entry_rest is None:
+            return self.tag + varint(len(key)) + key
+        entry = ENTRY_KEY_TAG + varint(len(key)) + key + self.entry_rest
+        return self.tag + varint(len(entry)) + entry
+
+
+def emit(templates=None, keys=None, raw=False):
+    '''
+        Yields requests for keys, templates are cycled. Serialized key
+        is looked up by template key, which is table of prefix or endpoint.
+    '''
+    parse = rib.ModifyRequest.Request.FromString
+    varint = rib_cache.varint
+    # body() inlined, it is called for every one of millions of requests
+    parts = dict([(name, [(item.tag, item.key_rest, item.entry_rest) for item in variants])
+                  for name, variants in templates.items()])
+    index = 0
+    for key in keys:
+        if isinstance(key, (int, long)):
+            key = LABEL_KEY_TAG + rib_loader.encode_varint(key)
+            variants = parts[None]
+        else:
+            variants = parts['ipv6' if ':' in key else 'ipv4']
+            key = STRING_KEY_TAG + varint(len(key)) + key
+        tag, key_rest, entry_rest = variants[index % len(variants)]
+        index += 1
+        key += key_rest
+        if entry_rest is None:
+            body = tag + varint(len(key)) + key
+        else:
+            entry = ENTRY_KEY_TAG + varint(len(key)) + key + entry_rest
+            body = tag + varint(len(entry)) + entry
+        if raw:
+            yield rib_cache.CachedRequest(body=body)
+        else:
+            yield parse(body)
+
+
+def route_requests(prefixes=None, operation='add', key_preference=None, rtm_preference=None,
+                   metric=None, next_hops=None, raw=False):
+    '''
+        Yields route requests for prefixes, table is selected by family
+        of prefix. Only prefix is set per request, other fields are
+        serialized once, so generator costs about one message parse
+        per request, or nothing more than bytes concatenation if raw.
+
+        Args:
+            prefixes: iterable of prefixes, eg. prefix_range or random_prefixes.
+            next_hops (list): tunnel_next_hop addresses cycled over routes.
+            raw (bool): yield CachedRequests, which are sent without
+                parsing if cache of Modify is set.
+    '''
+    templates = {}
+    for table in ['ipv4', 'ipv6']:
+        templates[table] = [Template(rib_api_service.route_request(operation=operation,
+                                                                   table=table,
+                                                                   key_preference=key_preference,
+                                                                   rtm_preference=rtm_preference,
+                                                                   metric=metric,
+                                                                   tunnel_next_hop=next_hop))
+                            for next_hop in next_hops or [None]]
+    return emit(templates, prefixes, raw)
+
+
+def tunnel_requests(endpoints=None, operation='add', key_preference=None, ttm_preference=None,
+                    metric=None, groups=None, raw=False):
+    '''
+        Yields tunnel requests for endpoints, table is selected by family
+        of endpoint.
+
+        Args:
+            endpoints: iterable of addresses, eg. prefix_range of host address.
+            groups (list): NextHopGroup sets cycled over tunnels, see fan_out.
+            raw (bool): yield CachedRequests, which are sent without
+                parsing if cache of Modify is set.
+    '''
+    templates = {}
+    for table in ['ipv4', 'ipv6']:
+        templates[table] = [Template(rib_api_service.tunnel_request(operation=operation,
+                                                                    table=table,
+                                                                    key_preference=key_preference,
+                                                                    ttm_preference=ttm_preference,
+                                                                    metric=metric),
+                                     group_set)
+                            for group_set in groups or [None]]
+    return emit(templates, endpoints, raw)
+
+
+def label_requests(labels=None, operation='add', key_preference=None, ing_stats_enable=None,
+                   type=None, groups=None, raw=False):
+    '''
+        Yields label requests for labels.
+
+        Args:
+            labels: iterable of int labels, eg. label_block.
+            groups (list): NextHopGroup sets cycled over labels, see fan_out.
+            raw (bool): yield CachedRequests, which are sent without
+                parsing if cache of Modify is set.
+    '''
+    templates = {None: [Template(rib_api_service.label_request(operation=operation,
+                                                               key_preference=key_preference,
+                                                               ing_stats_enable=ing_stats_enable,
+                                                               type=type),
+                                 group_set)
+                        for group_set in groups or [None]]}
+    return emit(templates, labels, raw)
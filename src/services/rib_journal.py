@@ -0,0 +1,152 @@
+############################################################################
+#
+#   Filename:           rib_journal.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 17:05:52 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import rib_loader
+import rib_shadow
+
+from protos_gen import nokia_rib_api_pb2 as rib
+
+from collections import OrderedDict
+from threading import Lock
+
+import os
+import time
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+REQUEST = b'Q'
+RESULT = b'R'
+
+
+class Journal(object):
+    '''
+        Append only write-ahead journal of Modify session.
+
+        Every sent ModifyRequest.Request and every received
+        ModifyResponse.Result is appended as varint length prefixed record
+        starting with one byte record type. Requests must be synced before
+        they are sent, results are synced in batches, when sync_every records
+        are waiting or sync_interval seconds elapsed since last sync. Result
+        lost in crash only causes request to be resent during recovery.
+
+        Args:
+            path (str): journal file, records are appended to existing file.
+            sync_every (int): max number of records waiting for fsync.
+            sync_interval (float): max number of seconds between fsyncs.
+    '''
+
+    def __init__(self, path=None, sync_every=1000, sync_interval=1.0):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = Lock()
+        self.fd = open(path, 'ab')
+        self.unsynced = 0
+        self.last_sync = time.time()
+        self.records = 0
+        self.syncs = 0
+
+
+    def __str__(self):
+        return '{path}: records: {records}, fsyncs: {syncs}, waiting for fsync: {unsynced}'.format(
+                    path=self.path,
+                    records=self.records,
+                    syncs=self.syncs,
+                    unsynced=self.unsynced)
+
+
+    def append(self, kind=None, messages=None):
+        data = []
+        for msg in messages:
+            record = kind + msg.SerializeToString()
+            data.append(rib_loader.encode_varint(len(record)))
+            data.append(record)
+        with self.lock:
+            self.fd.write(b''.join(data))
+            self.unsynced += len(messages)
+            self.records += len(messages)
+
+
+    def requests(self, requests=None):
+        '''
+            Appends requests and syncs journal, must be called
+            before requests are sent.
+        '''
+        self.append(REQUEST, requests)
+        self.sync()
+
+
+    def results(self, results=None):
+        self.append(RESULT, results)
+        if (self.unsynced >= self.sync_every or
+                time.time() - self.last_sync >= self.sync_interval):
+            self.sync()
+
+
+    def sync(self):
+        with self.lock:
+            if not self.unsynced:
+                return
+            self.fd.flush()
+            os.fsync(self.fd.fileno())
+            self.unsynced = 0
+            self.last_sync = time.time()
+            self.syncs += 1
+
+
+    def close(self):
+        self.sync()
+        with self.lock:
+            self.fd.close()
+
+
+def replay(path=None, shadow=None):
+    '''
+        Reads journal and returns (shadow, unacknowledged, last_id).
+        Shadow contains entries of requests with OK result, unacknowledged
+        is OrderedDict of id -> request which has no result, in order they
+        were sent, and last_id is highest request id in journal.
+        Truncated record at the end of journal is cut off, so new
+        records can be appended.
+    '''
+    if shadow is None:
+        shadow = rib_shadow.ShadowRib()
+    unacknowledged = OrderedDict()
+    last_id = 0
+    if not os.path.exists(path):
+        return shadow, unacknowledged, last_id
+    size = 0
+    for record in rib_loader.read_delimited(path, handler=None, strict=False):
+        size += len(rib_loader.encode_varint(len(record))) + len(record)
+        kind, data = record[:1], record[1:]
+        if kind == REQUEST:
+            msg = rib.ModifyRequest.Request.FromString(data)
+            unacknowledged[msg.id] = msg
+            last_id = max(last_id, msg.id)
+        elif kind == RESULT:
+            result = rib.ModifyResponse.Result.FromString(data)
+            msg = unacknowledged.pop(result.id, None)
+            if msg is not None and result.status == rib.ModifyResponse.Result.OK:
+                shadow.apply(msg)
+        else:
+            logger.warning('Unknown record type {0} in journal {1}'.format(kind, path))
+    if os.path.getsize(path) > size:
+        logger.warning('Truncated record at the end of journal {0} removed'.format(path))
+        with open(path, 'r+b') as fd:
+            fd.truncate(size)
+    return shadow, unacknowledged, last_id
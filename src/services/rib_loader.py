@@ -0,0 +1,342 @@
+############################################################################
+#
+#   Filename:           rib_loader.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 11:02:17 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import rib_api_service
+import rib_cache
+
+from protos_gen import nokia_rib_api_pb2 as rib
+from google.protobuf import json_format
+
+import csv
+import json
+import mmap
+import os
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+formats = ['csv', 'jsonl', 'binary']
+
+extensions = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.json': 'jsonl',
+    '.bin': 'binary',
+    '.pb': 'binary',
+}
+
+# csv columns which are converted to int, empty cell means unset field
+int_columns = ['id', 'key_preference', 'rtm_preference', 'metric', 'ttm_preference',
+               'key_label', 'group_id', 'weight']
+
+group_columns = ['group_id', 'weight', 'primary_ip', 'primary_labels',
+                 'backup_ip', 'backup_labels']
+
+
+def open_source(source=None, format=None, cache=None):
+    '''
+        Returns iterator of ModifyRequest.Request messages from file path
+        or iterable. Format of file is guessed from extension if not specified.
+        Requests built from csv rows and dicts are taken from RequestCache
+        if cache is specified, requests of binary file are then kept
+        serialized as CachedRequests.
+    '''
+    if not isinstance(source, basestring):
+        return iter_requests(source, cache=cache)
+    if not format:
+        format = extensions.get(os.path.splitext(source)[1].lower())
+    if format == 'csv':
+        return read_csv(source, cache=cache)
+    elif format == 'jsonl':
+        return read_jsonl(source)
+    elif format == 'binary':
+        return map_requests(source, raw=cache is not None)
+    raise ValueError('{format} is not supported, use one of {supported}'.format(
+                                                                format=format,
+                                                                supported=formats))
+
+
+def build_request(entry=None, registry=None, **kwargs):
+    '''
+        Builds ModifyRequest.Request from arguments of route_request,
+        tunnel_request or label_request selected by entry (route, tunnel
+        or label). NextHopGroup arguments add one group to the entry,
+        group is interned in registry if specified.
+    '''
+    group = dict([(column, kwargs.pop(column)) for column in group_columns
+                  if kwargs.get(column) is not None])
+    if entry == 'route':
+        msg = rib_api_service.route_request(**kwargs)
+    elif entry == 'tunnel':
+        msg = rib_api_service.tunnel_request(**kwargs)
+    elif entry == 'label':
+        msg = rib_api_service.label_request(**kwargs)
+    else:
+        raise ValueError('Unknown entry <{0}>, valid entries: {1}'.format(entry,
+                                                                         ['route', 'tunnel', 'label']))
+    if group:
+        if registry is not None:
+            group = registry.intern(**group)
+        else:
+            group = rib_api_service.next_hop_group_message(**group)
+        rib_api_service.entry_of(msg).groups.extend([group])
+    return msg
+
+
+def iter_requests(iterable=None, cache=None):
+    registry = rib_api_service.NextHopGroupRegistry()
+    for item in iterable:
+        if isinstance(item, dict) and cache is not None:
+            yield cache.request(**item)
+        elif isinstance(item, dict):
+            yield build_request(registry=registry, **item)
+        else:
+            yield item
+
+
+def read_csv(path=None, cache=None):
+    '''
+        Reads requests from csv file with header. Column entry selects
+        route, tunnel or label, other columns are named as arguments of
+        route_request, tunnel_request or label_request, eg:
+
+            entry,operation,table,key_prefix,metric,tunnel_next_hop
+            route,add,ipv4,10.0.0.0/24,10,192.168.0.1
+
+        Optional columns group_id, weight, primary_ip, primary_labels,
+        backup_ip and backup_labels add one NextHopGroup to tunnel or label
+        entry, labels are separated by space.
+    '''
+    registry = rib_api_service.NextHopGroupRegistry()
+    with open(path, 'r') as fd:
+        for row in csv.DictReader(fd):
+            kwargs = {}
+            for column, value in row.items():
+                if value is None or value == '':
+                    continue
+                if column in int_columns:
+                    value = int(value)
+                elif column == 'ing_stats_enable':
+                    value = value.lower() in ['1', 'true']
+                elif column in ['primary_labels', 'backup_labels']:
+                    value = [int(label) for label in value.split()]
+                kwargs[column] = value
+            if cache is not None:
+                yield cache.request(**kwargs)
+            else:
+                yield build_request(registry=registry, **kwargs)
+
+
+def read_jsonl(path=None):
+    '''
+        Reads requests from file with one json representation
+        of ModifyRequest.Request per line.
+    '''
+    with open(path, 'r') as fd:
+        for line in fd:
+            line = line.strip()
+            if line:
+                yield parse_json(line)
+
+
+def parse_json(line=None):
+    '''
+        Returns ModifyRequest.Request parsed from json. Message constructor
+        accepts nested dicts and is several times faster than json_format,
+        which is used only for json it does not accept (eg. lowerCamelCase
+        names, enums as numbers).
+    '''
+    data = json.loads(line)
+    try:
+        # only uint64 id is encoded as string in json
+        if 'id' in data:
+            data['id'] = int(data['id'])
+        return rib.ModifyRequest.Request(**data)
+    except (TypeError, ValueError, AttributeError, KeyError):
+        return json_format.ParseDict(data, rib.ModifyRequest.Request())
+
+
+def json_line(msg=None):
+    '''
+        Returns compact single line json of ModifyRequest.Request or CachedRequest.
+    '''
+    if not isinstance(msg, rib.ModifyRequest.Request):
+        msg = msg.message
+    return json.dumps(json_format.MessageToDict(msg, preserving_proto_field_name=True),
+                      separators=(',', ':'), sort_keys=True)
+
+
+def write_jsonl(path=None, requests=None, chunk_size=1 << 20):
+    '''
+        Writes requests to file as json lines, output is written in chunks
+        of about chunk_size bytes, so requests can be any iterable
+        including generators. Returns number of written requests.
+    '''
+    count = 0
+    with open(path, 'w') as fd:
+        lines = []
+        size = 0
+        for msg in requests:
+            line = json_line(msg)
+            lines.append(line)
+            size += len(line) + 1
+            count += 1
+            if size >= chunk_size:
+                lines.append('')
+                fd.write('\n'.join(lines))
+                lines = []
+                size = 0
+        if lines:
+            lines.append('')
+            fd.write('\n'.join(lines))
+    return count
+
+
+def encode_varint(value=None):
+    data = bytearray()
+    while value > 0x7f:
+        data.append((value & 0x7f) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def decode_varint(data=None, position=None):
+    '''
+        Returns decoded value and position after varint,
+        IndexError is raised if data ends within varint.
+    '''
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+def read_delimited(path=None, handler=rib.ModifyRequest.Request, chunk_size=1 << 20, strict=True):
+    '''
+        Reads varint length prefixed messages from file in chunks.
+        Raw bytes are yielded if handler is None. Truncated message at the end
+        of file raises ValueError, or is ignored if strict is False.
+    '''
+    with open(path, 'rb') as fd:
+        buf = bytearray()
+        position = 0
+        while True:
+            try:
+                length, start = decode_varint(buf, position)
+                if start + length > len(buf):
+                    raise IndexError
+            except IndexError:
+                chunk = fd.read(chunk_size)
+                if not chunk:
+                    if position < len(buf) and strict:
+                        raise ValueError('{0} ends with truncated message'.format(path))
+                    return
+                buf = buf[position:] + bytearray(chunk)
+                position = 0
+                continue
+            data = bytes(buf[start:start + length])
+            yield handler.FromString(data) if handler else data
+            position = start + length
+
+
+def write_delimited(path=None, requests=None, chunk_size=1 << 20):
+    '''
+        Writes messages or CachedRequests to file, each prefixed by its
+        length as varint. Output is written in chunks of about chunk_size
+        bytes. Returns number of written messages.
+    '''
+    varint = rib_cache.varint
+    count = 0
+    with open(path, 'wb') as fd:
+        parts = []
+        size = 0
+        for msg in requests:
+            data = msg.SerializeToString()
+            parts.append(varint(len(data)))
+            parts.append(data)
+            size += len(data) + 2
+            count += 1
+            if size >= chunk_size:
+                fd.write(b''.join(parts))
+                parts = []
+                size = 0
+        fd.write(b''.join(parts))
+    return count
+
+
+# serialized one and two byte varints -> value, filled on first use as
+# rib_cache may be only partially imported when this module is imported
+short_lengths = {}
+
+
+def map_requests(path=None, raw=False, strict=True):
+    '''
+        Reads varint length prefixed requests from memory mapped file, so
+        file is paged in by kernel and nothing but the current request
+        is copied. Requests are parsed as ModifyRequest.Request, or if raw
+        is set kept serialized as CachedRequests with id split from body,
+        which is possible as protobuf serializes id as the first field.
+        Truncated request at the end of file raises ValueError, or is
+        ignored if strict is False.
+    '''
+    parse = rib.ModifyRequest.Request.FromString
+    cached = rib_cache.CachedRequest
+    if not short_lengths:
+        short_lengths.update([(varint, value) for value, varint in enumerate(rib_cache.short_varints)])
+    with open(path, 'rb') as fd:
+        size = os.fstat(fd.fileno()).st_size
+        if not size:
+            return
+        data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            position = 0
+            while position < size:
+                # lengths are mostly one or two byte varints, which are
+                # looked up without decoding
+                length = short_lengths.get(data[position:position + 1])
+                start = position + 1
+                if length is None:
+                    length = short_lengths.get(data[position:position + 2])
+                    start = position + 2
+                if length is None:
+                    # varint of length has at most 10 bytes
+                    try:
+                        length, start = decode_varint(bytearray(data[position:position + 10]), 0)
+                    except IndexError:
+                        length, start = size, 0
+                    start += position
+                position = start + length
+                if position > size:
+                    if strict:
+                        raise ValueError('{0} ends with truncated message'.format(path))
+                    return
+                msg = data[start:position]
+                if not raw:
+                    yield parse(msg)
+                elif msg[:1] == rib_cache.ID_TAG:
+                    id, body = decode_varint(bytearray(msg[1:11]), 0)
+                    yield cached(id=id, body=msg[body + 1:])
+                else:
+                    yield cached(body=msg)
+        finally:
+            data.close()
@@ -0,0 +1,142 @@
+############################################################################
+#
+#   Filename:           rib_reconcile.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 16:21:37 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import rib_api_service
+import rib_shadow
+
+from protos_gen import nokia_rib_api_pb2 as rib
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+table_ids = [rib.IPv4RouteTable, rib.IPv6RouteTable, rib.IPv4TunnelTable,
+             rib.IPv6TunnelTable, rib.MplsLabelTable]
+
+
+class Reconciliation(object):
+    '''
+        Iterator of requests which change entries in ShadowRib to desired state.
+
+        Desired entries are streamed once, entry missing in shadow is added,
+        entry which differs is replaced and equal entry is skipped. Only keys
+        of desired entries are remembered, after desired source is exhausted
+        all shadow entries with key which was not seen are deleted. Finally
+        END_OF_RIB is sent for every table in tables.
+
+        Args:
+            shadow (ShadowRib): state programmed on router.
+            desired: iterable of ModifyRequest.Request with add or replace
+                operations, other requests are skipped.
+            tables (list of TableId): tables receiving END_OF_RIB, all tables
+                if not specified.
+    '''
+
+    def __init__(self, shadow=None, desired=None, tables=None):
+        self.shadow = shadow
+        self.desired = desired
+        self.tables = table_ids if tables is None else tables
+        self.seen = set()
+        self.counters = {
+            'add': 0,
+            'replace': 0,
+            'delete': 0,
+            'unchanged': 0,
+            'skipped': 0,
+        }
+        self.finished = False
+
+
+    def __str__(self):
+        return ('add: {add}, replace: {replace}, delete: {delete}, unchanged: {unchanged}, '
+                'skipped: {skipped}{state}').format(state='' if self.finished else ' (in progress)',
+                                                     **self.counters)
+
+
+    def __iter__(self):
+        for msg in self.desired:
+            request = self.compare(msg)
+            if request is not None:
+                yield request
+        # shadow is updated by results while we iterate, so take snapshot
+        for request in self.deletes():
+            self.counters['delete'] += 1
+            yield request
+        self.seen = set()
+        for table_id in self.tables:
+            yield rib.ModifyRequest.Request(END_OF_RIB=rib.EndOfRib(id=table_id))
+        self.finished = True
+
+
+    def key(self, table_id=None, key=None):
+        if table_id in [rib.IPv4RouteTable, rib.IPv6RouteTable]:
+            return rib_shadow.parse_prefix(key.prefix) + (key.preference,)
+        elif table_id in [rib.IPv4TunnelTable, rib.IPv6TunnelTable]:
+            return (table_id, key.endpoint, key.preference)
+        return (table_id, key.label, key.preference)
+
+
+    def current(self, table_id=None, key=None):
+        if table_id in [rib.IPv4RouteTable, rib.IPv6RouteTable]:
+            table, prefix, length = rib_shadow.parse_prefix(key.prefix)
+            return (self.shadow.routes[table].get(prefix, length) or {}).get(key.preference)
+        elif table_id in [rib.IPv4TunnelTable, rib.IPv6TunnelTable]:
+            table = 'ipv4' if table_id == rib.IPv4TunnelTable else 'ipv6'
+            return self.shadow.tunnels[table].get((key.endpoint, key.preference))
+        return self.shadow.labels.get((key.label, key.preference))
+
+
+    def compare(self, msg=None):
+        '''
+            Returns add or replace request for desired entry,
+            None if shadow already has equal entry.
+        '''
+        table_id, operation = rib_api_service.request_table(msg)
+        if operation not in ['add', 'replace']:
+            self.counters['skipped'] += 1
+            return None
+        entry = rib_api_service.entry_of(msg)
+        self.seen.add(self.key(table_id, entry.entry_key))
+        current = self.current(table_id, entry.entry_key)
+        if current == entry:
+            self.counters['unchanged'] += 1
+            return None
+        operation = 'add' if current is None else 'replace'
+        self.counters[operation] += 1
+        return rib.ModifyRequest.Request(**{rib_api_service.table_fields[(table_id, operation)]: entry})
+
+
+    def deletes(self):
+        '''
+            Returns delete requests of shadow entries which are not desired.
+        '''
+        requests = []
+        for table_id, table in [(rib.IPv4RouteTable, 'ipv4'), (rib.IPv6RouteTable, 'ipv6')]:
+            field = rib_api_service.table_fields[(table_id, 'delete')]
+            for prefix, length, preferences in self.shadow.routes[table].items():
+                for preference, entry in preferences.items():
+                    if (table, prefix, length, preference) not in self.seen:
+                        requests.append(rib.ModifyRequest.Request(**{field: entry.entry_key}))
+        for table_id, table in [(rib.IPv4TunnelTable, 'ipv4'), (rib.IPv6TunnelTable, 'ipv6')]:
+            field = rib_api_service.table_fields[(table_id, 'delete')]
+            for (endpoint, preference), entry in self.shadow.tunnels[table].items():
+                if (table_id, endpoint, preference) not in self.seen:
+                    requests.append(rib.ModifyRequest.Request(**{field: entry.entry_key}))
+        field = rib_api_service.table_fields[(rib.MplsLabelTable, 'delete')]
+        for (label, preference), entry in self.shadow.labels.items():
+            if (rib.MplsLabelTable, label, preference) not in self.seen:
+                requests.append(rib.ModifyRequest.Request(**{field: entry.entry_key}))
+        return requests
@@ -0,0 +1,142 @@
+############################################################################
+#
+#   Filename:           rib_resync.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 18:12:09 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import rib_api_service
+
+from protos_gen import nokia_rib_api_pb2 as rib
+
+import time
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+# routes are resolved over tunnels, so tunnel and label tables go first
+resync_order = [rib.IPv4TunnelTable, rib.IPv6TunnelTable, rib.MplsLabelTable,
+                rib.IPv4RouteTable, rib.IPv6RouteTable]
+
+
+class TableProgress(object):
+
+    __slots__ = ('table_id', 'total', 'sent', 'started', 'sent_all', 'finished', 'status')
+
+    def __init__(self, table_id=None):
+        self.table_id = table_id
+        self.total = None
+        self.sent = 0
+        self.started = None
+        self.sent_all = None
+        self.finished = None
+        self.status = None
+
+
+    def __str__(self):
+        if self.started is None:
+            return '{0}: waiting'.format(rib.TableId.Name(self.table_id))
+        end = self.finished or time.time()
+        return '{table}: {sent}/{total} sent, {state} {duration:.2f} s{rate}'.format(
+                    table=rib.TableId.Name(self.table_id),
+                    sent=self.sent,
+                    total=self.total,
+                    state=('END_OF_RIB ' + rib.ModifyResponse.Result.Status.Name(self.status)
+                           if self.finished else 'running'),
+                    duration=end - self.started,
+                    rate=', {0:.0f} entries/s'.format(self.sent / (end - self.started))
+                         if self.sent and end > self.started else '')
+
+
+class Resync(object):
+    '''
+        Iterator of requests which program whole shadow RIB again after
+        the Modify stream was re-established.
+
+        Tables are replayed one by one in resync_order, every entry of
+        table is sent as add request and table is closed by END_OF_RIB, so
+        router can flush entries which were not refreshed. Entries of table
+        are copied when its replay starts, so results arriving during resync
+        do not disturb iteration. Progress and duration of every table is
+        kept in progress dict.
+
+        Args:
+            shadow (ShadowRib): entries to replay.
+            tables (list of TableId): tables to replay, all if not specified.
+            cache (RequestCache): if specified, requests are CachedRequests,
+                so repeated resync of unchanged entries only reuses their
+                serialized bodies.
+    '''
+
+    def __init__(self, shadow=None, tables=None, cache=None):
+        self.shadow = shadow
+        self.cache = cache
+        self.tables = [table_id for table_id in resync_order if tables is None or table_id in tables]
+        self.progress = dict([(table_id, TableProgress(table_id)) for table_id in self.tables])
+        # END_OF_RIB request -> table, ids are assigned after requests are yielded
+        self.end_of_rib = {}
+        self.started = None
+        self.finished = None
+
+
+    def __str__(self):
+        lines = [str(self.progress[table_id]) for table_id in self.tables]
+        if self.finished:
+            lines.append('Resync finished in {0:.2f} s'.format(self.finished - self.started))
+        return '\n'.join(lines)
+
+
+    def __iter__(self):
+        self.started = time.time()
+        for table_id in self.tables:
+            progress = self.progress[table_id]
+            entries = self.entries(table_id)
+            progress.total = len(entries)
+            progress.started = time.time()
+            field = rib_api_service.table_fields[(table_id, 'add')]
+            for entry in entries:
+                progress.sent += 1
+                if self.cache is not None:
+                    yield self.cache.wrap(field, entry)
+                else:
+                    yield rib.ModifyRequest.Request(**{field: entry})
+            progress.sent_all = time.time()
+            msg = rib.ModifyRequest.Request(END_OF_RIB=rib.EndOfRib(id=table_id))
+            self.end_of_rib[table_id] = msg
+            yield msg
+
+
+    def entries(self, table_id=None):
+        if table_id in [rib.IPv4RouteTable, rib.IPv6RouteTable]:
+            trie = self.shadow.routes['ipv4' if table_id == rib.IPv4RouteTable else 'ipv6']
+            return [entry for _, _, preferences in trie.items() for entry in preferences.values()]
+        elif table_id in [rib.IPv4TunnelTable, rib.IPv6TunnelTable]:
+            return list(self.shadow.tunnels['ipv4' if table_id == rib.IPv4TunnelTable else 'ipv6'].values())
+        return list(self.shadow.labels.values())
+
+
+    def results(self, results=None):
+        '''
+            Marks tables whose END_OF_RIB was acknowledged as finished.
+        '''
+        if self.end_of_rib:
+            tables = dict([(msg.id, table_id) for table_id, msg in self.end_of_rib.items()])
+            for result in results:
+                if result.id in tables:
+                    progress = self.progress[tables[result.id]]
+                    progress.finished = time.time()
+                    progress.status = result.status
+                    del self.end_of_rib[tables[result.id]]
+                    logger.info(str(progress))
+        if all([progress.finished for progress in self.progress.values()]):
+            self.finished = self.finished or time.time()
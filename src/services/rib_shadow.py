@@ -0,0 +1,338 @@
+############################################################################
+#
+#   Filename:           rib_shadow.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 15:08:44 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import rib_api_service
+
+from protos_gen import nokia_rib_api_pb2 as rib
+
+import binascii
+import socket
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+families = {
+    'ipv4': (socket.AF_INET, 32),
+    'ipv6': (socket.AF_INET6, 128),
+}
+
+
+def parse_prefix(prefix=None):
+    '''
+        Returns (table, key, length) of ipv4 or ipv6 prefix in CIDR notation,
+        key is integer with host bits cleared. Address without length
+        is host prefix. ValueError is raised for invalid prefix.
+    '''
+    address, _, length = prefix.partition('/')
+    table = 'ipv6' if ':' in address else 'ipv4'
+    family, width = families[table]
+    try:
+        key = int(binascii.hexlify(socket.inet_pton(family, address)), 16)
+    except (socket.error, ValueError):
+        raise ValueError('Invalid address in prefix <{0}>'.format(prefix))
+    length = int(length) if length else width
+    if not 0 <= length <= width:
+        raise ValueError('Invalid prefix length in prefix <{0}>'.format(prefix))
+    return table, key >> (width - length) << (width - length), length
+
+
+def format_prefix(table=None, key=None, length=None):
+    family, width = families[table]
+    address = binascii.unhexlify('{0:0{1}x}'.format(key, width // 4))
+    return '{0}/{1}'.format(socket.inet_ntop(family, address), length)
+
+
+class TrieNode(object):
+
+    __slots__ = ('key', 'length', 'value', 'children')
+
+    def __init__(self, key=0, length=0, value=None):
+        self.key = key
+        self.length = length
+        self.value = value
+        self.children = [None, None]
+
+
+class PrefixTrie(object):
+    '''
+        Path compressed binary (Patricia) trie of prefixes.
+
+        Prefixes are integer keys left aligned to width bits with length,
+        only nodes which hold value or branch are stored.
+    '''
+
+    def __init__(self, width=32):
+        self.width = width
+        self.root = TrieNode()
+        self.size = 0
+
+
+    def __len__(self):
+        return self.size
+
+
+    def bit(self, key=None, position=None):
+        return (key >> (self.width - 1 - position)) & 1
+
+
+    def common_length(self, key=None, length=None, other=None, other_length=None):
+        shortest = min(length, other_length)
+        if not shortest:
+            return 0
+        diff = (key ^ other) >> (self.width - shortest)
+        return shortest - diff.bit_length()
+
+
+    def node(self, key=None, length=None, create=False):
+        '''
+            Returns node of exact prefix or None, with create missing node
+            is inserted into trie.
+        '''
+        node = self.root
+        while True:
+            if node.length == length:
+                return node
+            position = self.bit(key, node.length)
+            child = node.children[position]
+            if child is None:
+                if not create:
+                    return None
+                node.children[position] = TrieNode(key, length)
+                return node.children[position]
+            common = self.common_length(key, length, child.key, child.length)
+            if common == child.length:
+                node = child
+                continue
+            if not create:
+                return None
+            mask = ((1 << common) - 1) << (self.width - common)
+            split = TrieNode(key & mask, common)
+            split.children[self.bit(child.key, common)] = child
+            node.children[position] = split
+            if common == length:
+                return split
+            leaf = TrieNode(key, length)
+            split.children[self.bit(key, common)] = leaf
+            return leaf
+
+
+    def get(self, key=None, length=None):
+        node = self.node(key, length)
+        return node.value if node else None
+
+
+    def insert(self, key=None, length=None, value=None):
+        node = self.node(key, length, create=True)
+        if node.value is None:
+            self.size += 1
+        node.value = value
+
+
+    def remove(self, key=None, length=None):
+        '''
+            Removes value of prefix and prunes nodes which
+            neither hold value nor branch.
+        '''
+        path = [self.root]
+        node = self.root
+        while node.length != length:
+            node = node.children[self.bit(key, node.length)]
+            if node is None or self.common_length(key, length, node.key, node.length) < node.length:
+                return None
+            path.append(node)
+        if node.value is None:
+            return None
+        value = node.value
+        node.value = None
+        self.size -= 1
+        while len(path) > 1:
+            node = path.pop()
+            if node.value is not None:
+                break
+            children = [child for child in node.children if child]
+            if len(children) == 2:
+                break
+            parent = path[-1]
+            parent.children[parent.children.index(node)] = children[0] if children else None
+        return value
+
+
+    def lookup(self, key=None, length=None):
+        '''
+            Returns (key, length, value) of longest prefix covering
+            key of given length or None.
+        '''
+        if length is None:
+            length = self.width
+        node = self.root
+        found = None
+        while node is not None:
+            if self.common_length(key, length, node.key, node.length) < node.length:
+                break
+            if node.value is not None:
+                found = node
+            if node.length >= length:
+                break
+            node = node.children[self.bit(key, node.length)]
+        return (found.key, found.length, found.value) if found else None
+
+
+    def items(self, key=0, length=0):
+        '''
+            Yields (key, length, value) of all prefixes covered
+            by given prefix in order of addresses.
+        '''
+        node = self.root
+        while node is not None and node.length < length:
+            node = node.children[self.bit(key, node.length)]
+        if node is None or self.common_length(key, length, node.key, node.length) < length:
+            return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.value is not None:
+                yield node.key, node.length, node.value
+            stack.extend([child for child in reversed(node.children) if child])
+
+
+class ShadowRib(object):
+    '''
+        Client side copy of entries successfully programmed by Modify.
+
+        Routes are stored per table in PrefixTrie, every prefix holds dict
+        of preference -> RouteTableEntry. Tunnels are stored in dict per
+        table keyed by (endpoint, preference) and labels in dict keyed by
+        (label, preference). Only requests acknowledged with OK result
+        should be applied.
+    '''
+
+    def __init__(self):
+        self.routes = {
+            'ipv4': PrefixTrie(width=32),
+            'ipv6': PrefixTrie(width=128),
+        }
+        self.tunnels = {
+            'ipv4': {},
+            'ipv6': {},
+        }
+        self.labels = {}
+        self.route_count = {
+            'ipv4': 0,
+            'ipv6': 0,
+        }
+
+
+    def __str__(self):
+        return '\n'.join(['{0}: {1}'.format(rib.TableId.Name(table), count)
+                          for table, count in sorted(self.counts().items())])
+
+
+    def counts(self):
+        '''
+            Returns number of entries per TableId.
+        '''
+        return {rib.IPv4RouteTable: self.route_count['ipv4'],
+                rib.IPv6RouteTable: self.route_count['ipv6'],
+                rib.IPv4TunnelTable: len(self.tunnels['ipv4']),
+                rib.IPv6TunnelTable: len(self.tunnels['ipv6']),
+                rib.MplsLabelTable: len(self.labels)}
+
+
+    def apply(self, msg=None):
+        '''
+            Applies ModifyRequest.Request, END_OF_RIB and NH_SWITCH are ignored.
+        '''
+        field = msg.WhichOneof('data')
+        table_id, operation = rib_api_service.request_table(msg)
+        if table_id is None:
+            return
+        data = getattr(msg, field)
+        key = data if operation == 'delete' else data.entry_key
+        if table_id in [rib.IPv4RouteTable, rib.IPv6RouteTable]:
+            self.apply_route(key, None if operation == 'delete' else data)
+        elif table_id in [rib.IPv4TunnelTable, rib.IPv6TunnelTable]:
+            table = 'ipv4' if table_id == rib.IPv4TunnelTable else 'ipv6'
+            if operation == 'delete':
+                self.tunnels[table].pop((key.endpoint, key.preference), None)
+            else:
+                self.tunnels[table][(key.endpoint, key.preference)] = data
+        else:
+            if operation == 'delete':
+                self.labels.pop((key.label, key.preference), None)
+            else:
+                self.labels[(key.label, key.preference)] = data
+
+
+    def apply_route(self, key=None, entry=None):
+        table, prefix, length = parse_prefix(key.prefix)
+        trie = self.routes[table]
+        preferences = trie.get(prefix, length)
+        if entry is not None:
+            if preferences is None:
+                preferences = {}
+                trie.insert(prefix, length, preferences)
+            if key.preference not in preferences:
+                self.route_count[table] += 1
+            preferences[key.preference] = entry
+        elif preferences and key.preference in preferences:
+            del preferences[key.preference]
+            self.route_count[table] -= 1
+            if not preferences:
+                trie.remove(prefix, length)
+
+
+    def route(self, prefix=None):
+        '''
+            Returns dict of preference -> RouteTableEntry of exact prefix.
+        '''
+        table, key, length = parse_prefix(prefix)
+        return self.routes[table].get(key, length) or {}
+
+
+    def lookup(self, address=None):
+        '''
+            Returns (prefix, {preference: RouteTableEntry}) of longest
+            prefix matching address or prefix, None if there is no match.
+        '''
+        table, key, length = parse_prefix(address)
+        found = self.routes[table].lookup(key, length)
+        if found is None:
+            return None
+        return format_prefix(table, found[0], found[1]), found[2]
+
+
+    def routes_in(self, prefix=None):
+        '''
+            Yields (prefix, {preference: RouteTableEntry}) of all routes
+            covered by prefix.
+        '''
+        table, key, length = parse_prefix(prefix)
+        for found in self.routes[table].items(key, length):
+            yield format_prefix(table, found[0], found[1]), found[2]
+
+
+    def tunnel(self, endpoint=None, preference=0):
+        table = 'ipv6' if ':' in endpoint else 'ipv4'
+        return self.tunnels[table].get((endpoint, preference))
+
+
+    def label(self, label=None, preference=0):
+        return self.labels.get((label, preference))
+
+
+    def clear(self):
+        self.__init__()
@@ -0,0 +1,205 @@
+############################################################################
+#
+#   Filename:           rib_tracker.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 14:26:05 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+from protos_gen import nokia_rib_api_pb2 as rib
+
+from array import array
+from collections import OrderedDict
+
+# status codes stored in tracker, non-negative codes are ModifyResponse.Result.Status
+UNKNOWN = -1
+SENT = -2
+
+status_names = {
+    UNKNOWN: 'UNKNOWN',
+    SENT: 'SENT',
+    rib.ModifyResponse.Result.UNSET: 'UNSET',
+    rib.ModifyResponse.Result.OK: 'OK',
+    rib.ModifyResponse.Result.FAILED: 'FAILED',
+}
+
+
+class RequestTracker(object):
+    '''
+        Compact store correlating Modify requests with their results.
+
+        Status of every request is kept as one byte in array indexed by
+        request id relative to first seen id, ids too far from that range
+        fall back to dict. Full request messages are kept only while
+        waiting for result and for requests which did not end with OK.
+        Last retain OK requests are kept with their results for display,
+        older are evicted and only their status is remembered.
+
+        Tracker can be accessed as mapping of retained ids to dicts
+        with request and response keys.
+
+        Requests which did not end with OK are indexed by status and
+        extended_status, so they are found without scanning all results.
+        Request which ends with OK on retry leaves the index. Counters
+        of results are kept per data field of request (table and
+        operation) and of failures per field and extended_status.
+
+        Args:
+            retain (int): number of completed OK requests kept with messages.
+            max_gap (int): max distance of id from end of array, which
+                still extends the array.
+    '''
+
+    def __init__(self, retain=1000, max_gap=1 << 20):
+        self.retain = retain
+        self.max_gap = max_gap
+        self.base = None
+        self.statuses = array('b')
+        self.overflow = {}
+        self.pending = {}
+        self.failures = OrderedDict()
+        self.recent = OrderedDict()
+        self.counters = dict([(name, 0) for name in status_names.values()])
+        # (status, extended_status) -> ids of current failures
+        self.index = {}
+        # data field of request -> status name -> number of results
+        self.field_counters = {}
+        # (data field of request, extended_status) -> number of failures
+        self.reasons = {}
+
+
+    def __str__(self):
+        return 'Tracked: {tracked}, waiting: {waiting}, ok: {ok}, failed: {failed}'.format(
+                    tracked=len(self),
+                    waiting=len(self.pending),
+                    ok=self.counters['OK'],
+                    failed=self.counters['FAILED'])
+
+
+    def __len__(self):
+        return self.counters['SENT']
+
+
+    def __bool__(self):
+        return len(self) > 0
+
+    __nonzero__ = __bool__
+
+
+    def __contains__(self, request_id=None):
+        return (request_id in self.pending or request_id in self.failures or
+                request_id in self.recent)
+
+
+    def __iter__(self):
+        return iter(sorted(set(self.pending) | set(self.failures) | set(self.recent)))
+
+
+    def __getitem__(self, request_id=None):
+        if request_id in self.pending:
+            return {'request': self.pending[request_id], 'response': None}
+        if request_id in self.failures:
+            return self.failures[request_id]
+        return self.recent[request_id]
+
+
+    def set_status(self, request_id=None, code=None):
+        if self.base is None:
+            self.base = request_id
+        offset = request_id - self.base
+        if 0 <= offset < len(self.statuses):
+            self.statuses[offset] = code
+        elif len(self.statuses) <= offset < len(self.statuses) + self.max_gap:
+            self.statuses.extend(array('b', [UNKNOWN]) * (offset - len(self.statuses) + 1))
+            self.statuses[offset] = code
+        else:
+            self.overflow[request_id] = code
+
+
+    def status(self, request_id=None):
+        '''
+            Returns status code of request, UNKNOWN if id was never sent.
+        '''
+        if request_id in self.overflow:
+            return self.overflow[request_id]
+        if self.base is not None and 0 <= request_id - self.base < len(self.statuses):
+            return self.statuses[request_id - self.base]
+        return UNKNOWN
+
+
+    def sent(self, msg=None):
+        # retried request is counted only once
+        if self.status(msg.id) == UNKNOWN:
+            self.counters['SENT'] += 1
+        self.pending[msg.id] = msg
+        self.set_status(msg.id, SENT)
+
+
+    def unsent(self, request_ids=None):
+        '''
+            Returns messages of pending requests with given ids, which will
+            never get result, and forgets they were sent, so they can be
+            sent again.
+        '''
+        messages = []
+        for request_id in request_ids:
+            msg = self.pending.pop(request_id, None)
+            if msg is not None:
+                self.set_status(request_id, UNKNOWN)
+                messages.append(msg)
+        self.counters['SENT'] -= len(messages)
+        return messages
+
+
+    def result(self, result=None):
+        '''
+            Stores result and returns dict with request and response,
+            request is None if it was not sent by tracker.
+        '''
+        entry = {'request': self.pending.pop(result.id, None), 'response': result}
+        self.set_status(result.id, result.status)
+        name = status_names[result.status]
+        self.counters[name] += 1
+        field = entry['request'].WhichOneof('data') if entry['request'] is not None else None
+        if field not in self.field_counters:
+            self.field_counters[field] = dict([(item, 0) for item in status_names.values()])
+        self.field_counters[field][name] += 1
+        previous = self.failures.pop(result.id, None)
+        if previous is not None:
+            key = (previous['response'].status, previous['response'].extended_status)
+            self.index[key].discard(result.id)
+            if not self.index[key]:
+                del self.index[key]
+        if result.status != rib.ModifyResponse.Result.OK:
+            self.failures[result.id] = entry
+            self.index.setdefault((result.status, result.extended_status), set()).add(result.id)
+            self.reasons[(field, result.extended_status)] = (
+                    self.reasons.get((field, result.extended_status), 0) + 1)
+            return entry
+        self.recent[result.id] = entry
+        while len(self.recent) > self.retain:
+            self.recent.popitem(last=False)
+        return entry
+
+
+    def failed(self, status=None, reason=None):
+        '''
+            Returns sorted ids of requests which did not end with OK,
+            optionally only with given status code and extended_status.
+        '''
+        ids = []
+        for (code, extended_status), items in self.index.items():
+            if status is not None and code != status:
+                continue
+            if reason is not None and extended_status != reason:
+                continue
+            ids.extend(items)
+        return sorted(ids)
@@ -0,0 +1,382 @@
+############################################################################
+#
+#   Filename:           rib_validate.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Tue Oct 20 09:14:52 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import rib_shadow
+
+from protos_gen import nokia_rib_api_pb2 as rib
+
+from itertools import islice
+import binascii
+import socket
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+INVALID = 'invalid prefix'
+LENGTH = 'invalid prefix length'
+HOST_BITS = 'host bits set'
+NOT_HOST = 'endpoint is not host address'
+FAMILY = 'address family does not match table'
+DUPLICATE = 'duplicate key'
+
+# smaller batches are not worth numpy conversion
+vector_threshold = 256
+
+# longest ipv4 prefix 255.255.255.255/32 has 18 characters, wider rows are
+# detected by non padding last column, width is multiple of 8 so that rows
+# are viewed as uint64 words
+ipv4_width = 24
+
+
+def parse(prefix=None, host=False):
+    '''
+        Returns (table, key, length, canonical) of ipv4 or ipv6 prefix,
+        or of address if host is set. ValueError with reason is raised
+        for invalid prefix.
+    '''
+    try:
+        address, slash, length = prefix.partition('/')
+        table = 'ipv6' if ':' in address else 'ipv4'
+        family, width = rib_shadow.families[table]
+        packed = socket.inet_pton(family, address)
+    except (socket.error, ValueError, TypeError, AttributeError, UnicodeError):
+        raise ValueError(INVALID)
+    if slash:
+        if not length.isdigit() or int(length) > width:
+            raise ValueError(LENGTH)
+        length = int(length)
+    else:
+        length = width
+    if host and length != width:
+        raise ValueError(NOT_HOST)
+    key = int(binascii.hexlify(packed), 16)
+    if key & ((1 << (width - length)) - 1):
+        raise ValueError(HOST_BITS)
+    address = socket.inet_ntop(family, packed)
+    return table, key, length, address if host else '{0}/{1}'.format(address, length)
+
+
+def row_any(mask=None):
+    '''
+        Returns which rows of flat bool mask of ipv4_width columns have any
+        True value.
+    '''
+    words = mask.view(numpy.uint64).reshape(-1, ipv4_width // 8)
+    return (words[:, 0] | words[:, 1] | words[:, 2]) != 0
+
+
+def row_count(mask=None):
+    '''
+        Returns number of True values in every row of flat bool mask
+        of ipv4_width columns.
+    '''
+    words = mask.view(numpy.uint64).reshape(-1, ipv4_width // 8)
+    # every byte is 0 or 1, so byte sums of three words fit in byte
+    # and multiplication sums all bytes into the highest one
+    return ((words[:, 0] + words[:, 1] + words[:, 2]) * numpy.uint64(0x0101010101010101)) >> numpy.uint64(56)
+
+
+def parse_ipv4(prefixes=None, host=False):
+    '''
+        Vectorized parsing of ipv4 prefixes (addresses if host) with numpy.
+        Returns (parsed, key, length, canonical) arrays, parsed is False
+        for rows which are not well formed ipv4 prefix, these are left
+        for parse(). Rows with leading zeros in octets are not parsed,
+        as they may be meant as octal.
+
+        Prefixes are converted to fixed width byte rows and checked
+        on flat array of characters, so every check is one pass over
+        contiguous memory.
+    '''
+    count = len(prefixes)
+    width = ipv4_width
+    chars = numpy.array(prefixes, dtype='S{0}'.format(width)).view(numpy.uint8)
+    digit = (chars >= 48) & (chars <= 57)
+    dot = chars == 46
+    slash = chars == 47
+    pad = chars == 0
+    separator = dot | slash
+    bad = ~(digit | separator | pad)
+    following = numpy.zeros(len(chars), dtype=bool)
+    # empty field, separator at the end and data after padding
+    following[:-1] = (separator[:-1] & (separator[1:] | pad[1:])) | (pad[:-1] & ~pad[1:])
+    # leading zero, octet may be meant as octal
+    following[:-2] |= separator[:-2] & (chars[1:-1] == 48) & digit[2:]
+    # length goes after all octets and has at most two digits
+    following[:-3] |= slash[:-3] & ~(pad[2:-1] | (digit[2:-1] & pad[3:]))
+    # octet has at most three digits
+    following[:-3] |= digit[:-3] & digit[1:-2] & digit[2:-1] & digit[3:]
+    # padding of row followed by next row
+    following[width - 1::width] = False
+    bad |= following
+    rows = bad.reshape(count, width)
+    rows[:, 0] |= separator[::width] | pad[::width] | ((chars[::width] == 48) & digit[1::width])
+    rows[:, -1] |= ~pad[width - 1::width]
+    slashes = row_count(slash)
+    parsed = ~row_any(bad) & (row_count(dot) == 3) & (slashes <= 1)
+    has_slash = slashes == 1
+    key = numpy.zeros(count, dtype=numpy.int64)
+    length = numpy.full(count, 32, dtype=numpy.int64)
+    rows = numpy.nonzero(parsed)[0]
+    if len(rows):
+        # first digit of every field of parsed rows
+        start = digit.copy()
+        start[1:] &= separator[:-1]
+        start[::width] = digit[::width]
+        start.reshape(count, width)[~parsed] = False
+        starts = numpy.flatnonzero(start)
+        values = chars.take(starts).astype(numpy.int16) - 48
+        more = numpy.ones(len(starts), dtype=bool)
+        for offset in [1, 2]:
+            # padding of last row ends every field, so clipping is safe
+            following = chars.take(starts + offset, mode='clip')
+            more &= (following >= 48) & (following <= 57)
+            values = numpy.where(more, values * 10 + following - 48, values)
+        counts = 4 + has_slash[rows]
+        offsets = numpy.cumsum(counts) - counts
+        octets = values[offsets[:, None] + numpy.arange(4)].astype(numpy.int64)
+        lengths = numpy.where(has_slash[rows], values[numpy.minimum(offsets + 4, len(values) - 1)], 32)
+        in_range = (octets <= 255).all(axis=1) & (lengths <= 32)
+        parsed[rows[~in_range]] = False
+        key[rows] = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+        length[rows] = numpy.where(in_range, lengths, 32)
+    canonical = has_slash == (not host)
+    return parsed, key, length, canonical
+
+
+class PrefixValidation(object):
+    '''
+        Result of validate_prefixes.
+
+        Attributes:
+            count (int): number of validated prefixes.
+            errors (dict): index of invalid prefix -> reason.
+            canonical (dict): index of valid prefix which is not written
+                in canonical form -> canonical form.
+    '''
+
+    def __init__(self, count=0):
+        self.count = count
+        self.errors = {}
+        self.canonical = {}
+
+
+    def __str__(self):
+        counters = {}
+        for reason in self.errors.values():
+            counters[reason] = counters.get(reason, 0) + 1
+        return 'checked: {0}, invalid: {1}{2}, not canonical: {3}'.format(
+                    self.count,
+                    len(self.errors),
+                    ''.join([', {0}: {1}'.format(reason, count)
+                             for reason, count in sorted(counters.items())]),
+                    len(self.canonical))
+
+
+def validate_prefixes(prefixes=None, tables=None, preferences=None, host=False, duplicates=True):
+    '''
+        Validates batch of prefixes, or tunnel endpoints if host is set.
+
+        Prefix must be valid ipv4 or ipv6 CIDR without host bits, endpoint
+        must be address or host prefix. Address family must match table
+        and (prefix, preference) must be unique if duplicates is set,
+        first occurrence of key is valid. Well formed ipv4 rows are checked
+        vectorized with numpy if available, remaining rows one by one.
+
+        Args:
+            prefixes (list of str): prefixes or endpoints.
+            tables (str or list of str): ipv4 or ipv6, for all or every
+                prefix, family is not checked if not specified.
+            preferences (list of int): preference of every key, used
+                for duplicate detection.
+            host (bool): prefixes are tunnel endpoints.
+            duplicates (bool): report duplicate keys.
+    '''
+    count = len(prefixes)
+    result = PrefixValidation(count)
+    if tables is not None and not isinstance(tables, list):
+        tables = [tables] * count
+    keys = {}
+    remaining = range(count)
+    if numpy is not None and count >= vector_threshold:
+        try:
+            parsed, key, length, canonical = parse_ipv4(prefixes, host)
+        except UnicodeError:
+            parsed = None
+        if parsed is not None:
+            valid = parsed.copy()
+            if host:
+                wrong = parsed & (length != 32)
+                reason = NOT_HOST
+            else:
+                wrong = parsed & ((key & ((numpy.int64(1) << (32 - length)) - 1)) != 0)
+                reason = HOST_BITS
+            valid &= ~wrong
+            result.errors.update(dict.fromkeys(numpy.flatnonzero(wrong).tolist(), reason))
+            # conversion of lists to arrays is avoided when all values are same
+            if tables is not None and tables.count('ipv4') != count:
+                wrong = valid & (numpy.array(tables) != 'ipv4')
+                valid &= ~wrong
+                result.errors.update(dict.fromkeys(numpy.flatnonzero(wrong).tolist(), FAMILY))
+            if duplicates:
+                rows = numpy.flatnonzero(valid)
+                entries = (key[rows] << 6) | length[rows]
+                if preferences is None or preferences.count(preferences[0]) == count:
+                    # stable sort keeps first occurrence of key first
+                    order = numpy.argsort(entries, kind='mergesort')
+                    same = entries[order][1:] == entries[order][:-1]
+                else:
+                    weights = numpy.array(preferences, dtype=numpy.int64)[rows]
+                    order = numpy.lexsort((rows, weights, entries))
+                    same = ((entries[order][1:] == entries[order][:-1]) &
+                            (weights[order][1:] == weights[order][:-1]))
+                wrong = rows[order[1:][same]]
+                valid[wrong] = False
+                result.errors.update(dict.fromkeys(wrong.tolist(), DUPLICATE))
+            # parsed octets are canonical, only length is missing or extra
+            for index in numpy.flatnonzero(valid & ~canonical).tolist():
+                if host:
+                    result.canonical[index] = prefixes[index].partition('/')[0]
+                else:
+                    result.canonical[index] = prefixes[index] + '/32'
+            # every ipv4 accepted by inet_pton is parsed vectorized, so remaining
+            # valid rows are ipv6 and cannot duplicate vectorized ones
+            remaining = numpy.flatnonzero(~parsed).tolist()
+    for index in remaining:
+        try:
+            table, key, length, canonical = parse(prefixes[index], host)
+        except ValueError as e:
+            result.errors[index] = str(e)
+            continue
+        if tables is not None and tables[index] != table:
+            result.errors[index] = FAMILY
+            continue
+        if duplicates:
+            entry = (table, key, length, preferences[index] if preferences is not None else 0)
+            if entry in keys:
+                result.errors[index] = DUPLICATE
+                continue
+            keys[entry] = index
+        if canonical != prefixes[index]:
+            result.canonical[index] = canonical
+    return result
+
+
+# field of ModifyRequest.Request.data oneof -> (entry kind, table, operation),
+# fields are named <table>_<kind>_<OPERATION>, eg. ipv4_route_ADD
+checked_fields = {}
+for field in rib.ModifyRequest.Request.DESCRIPTOR.oneofs_by_name['data'].fields:
+    table, kind, operation = (field.name.split('_') + [None, None])[:3]
+    if kind in ['route', 'tunnel']:
+        checked_fields[field.name] = (kind, table, operation.lower())
+
+class RequestValidation(object):
+    '''
+        Validates route prefixes and tunnel endpoints of Modify requests
+        in batches and collects invalid requests.
+
+        Requests of one batch are grouped by entry kind and by delete or
+        add/replace operation, every group is checked by one call of
+        validate_prefixes, so duplicate keys are reported only inside
+        one batch. Labels, END_OF_RIB and NH_SWITCH are always valid.
+
+        Args:
+            normalize (bool): rewrite prefixes and endpoints of valid
+                requests to canonical form.
+            chunk_size (int): number of requests validated together by filter().
+    '''
+
+    def __init__(self, normalize=True, chunk_size=100000):
+        self.normalize = normalize
+        self.chunk_size = chunk_size
+        self.checked = 0
+        self.normalized = 0
+        # reason -> number of invalid requests
+        self.counters = {}
+        # (reason, request) of every invalid request
+        self.invalid = []
+
+
+    def __str__(self):
+        return 'checked: {0}, invalid: {1}{2}, normalized: {3}'.format(
+                    self.checked,
+                    len(self.invalid),
+                    ''.join([', {0}: {1}'.format(reason, count)
+                             for reason, count in sorted(self.counters.items())]),
+                    self.normalized)
+
+
+    def check(self, requests=None):
+        '''
+            Validates list of ModifyRequest.Request (or CachedRequest) and
+            returns valid ones in original order.
+        '''
+        groups = {}
+        for index, msg in enumerate(requests):
+            info = checked_fields.get(msg.WhichOneof('data'))
+            if info is None:
+                continue
+            kind, table, operation = info
+            entry = getattr(msg, msg.WhichOneof('data'))
+            key = entry if operation == 'delete' else entry.entry_key
+            rows = groups.setdefault((kind, operation == 'delete'), ([], [], [], [], []))
+            rows[0].append(index)
+            rows[1].append(key)
+            rows[2].append(key.prefix if kind == 'route' else key.endpoint)
+            rows[3].append(table)
+            rows[4].append(key.preference)
+        invalid = {}
+        for (kind, delete), (indexes, keys, prefixes, tables, preferences) in groups.items():
+            result = validate_prefixes(prefixes=prefixes, tables=tables, preferences=preferences,
+                                       host=kind == 'tunnel', duplicates=not delete)
+            for row, reason in result.errors.items():
+                invalid[indexes[row]] = reason
+            if self.normalize:
+                for row, canonical in result.canonical.items():
+                    if kind == 'route':
+                        keys[row].prefix = canonical
+                    else:
+                        keys[row].endpoint = canonical
+                self.normalized += len(result.canonical)
+        self.checked += len(requests)
+        if not invalid:
+            return requests
+        for index in sorted(invalid):
+            reason = invalid[index]
+            self.counters[reason] = self.counters.get(reason, 0) + 1
+            self.invalid.append((reason, requests[index]))
+            logger.debug('Invalid request {0}: {1}'.format(requests[index].id, reason))
+        return [msg for index, msg in enumerate(requests) if index not in invalid]
+
+
+    def filter(self, iterable=None):
+        '''
+            Yields valid requests of iterable, which is validated in chunks
+            of chunk_size requests.
+        '''
+        iterator = iter(iterable)
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                return
+            for msg in self.check(chunk):
+                yield msg
@@ -0,0 +1,196 @@
+############################################################################
+#
+#   Filename:           stats.py
+#
+#   Author:             Martin Tibensky
+#   Created:            Mon Oct 19 10:12:41 CEST 2026
+#
+#   Description:        .
+#
+#
+############################################################################
+#
+#              Copyright (c) 2026 Nokia
+#
+############################################################################
+
+import time
+
+
+class Histogram(object):
+    '''
+        Log-linear histogram in style of HdrHistogram.
+
+        Non-negative integer values are recorded into buckets with
+        relative error bounded by 2**-precision, each power of two range
+        is split into 2**precision linear sub-buckets. Only non-empty
+        buckets are stored, so memory depends on spread of recorded
+        values, not on their count.
+
+        Args:
+            unit (str): unit of recorded values, used only for display.
+            precision (int): number of bits of sub-bucket resolution.
+    '''
+
+    def __init__(self, unit='', precision=5):
+        self.unit = unit
+        self.precision = precision
+        self.sub_buckets = 1 << precision
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __str__(self):
+        if not self.count:
+            return 'no samples'
+        return ('count: {count}, min: {min}, mean: {mean:.1f}, p50: {p50}, '
+                'p90: {p90}, p99: {p99}, p99.9: {p999}, max: {max} {unit}').format(
+                    count=self.count,
+                    min=self.min,
+                    mean=self.mean(),
+                    p50=self.percentile(50),
+                    p90=self.percentile(90),
+                    p99=self.percentile(99),
+                    p999=self.percentile(99.9),
+                    max=self.max,
+                    unit=self.unit)
+
+    def index(self, value=None):
+        if value < self.sub_buckets:
+            return value
+        shift = value.bit_length() - self.precision
+        return (shift << self.precision) + (value >> shift)
+
+    def bucket_bounds(self, index=None):
+        shift = index >> self.precision
+        if not shift:
+            return index, index
+        sub_bucket = index & (self.sub_buckets - 1)
+        return sub_bucket << shift, ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value=None, count=1):
+        value = int(value)
+        if value < 0:
+            value = 0
+        index = self.index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        return self.total / float(self.count) if self.count else 0.0
+
+    def percentile(self, percentile=None):
+        '''
+            Returns upper bound of bucket containing given percentile,
+            clamped to maximal recorded value.
+        '''
+        if not self.count:
+            return None
+        threshold = self.count * percentile / 100.0
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= threshold:
+                return min(self.bucket_bounds(index)[1], self.max)
+        return self.max
+
+    def merge(self, other=None):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def reset(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def to_dict(self):
+        return {'unit': self.unit,
+                'count': self.count,
+                'min': self.min,
+                'max': self.max,
+                'mean': self.mean(),
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'p99.9': self.percentile(99.9),
+                'buckets': [[self.bucket_bounds(index)[0], self.buckets[index]]
+                            for index in sorted(self.buckets)]}
+
+
+class RateGauge(object):
+    '''
+        Rolling rate of events per second over last window seconds,
+        events are aggregated in one second slots.
+    '''
+
+    def __init__(self, window=10):
+        self.window = window
+        self.slots = [0] * window
+        self.seconds = [None] * window
+        self.total = 0
+        self.started = None
+
+    def __str__(self):
+        return '{0:.1f}/s'.format(self.rate())
+
+    def add(self, count=1, now=None):
+        now = now or time.time()
+        if self.started is None:
+            self.started = now
+        second = int(now)
+        slot = second % self.window
+        if self.seconds[slot] != second:
+            self.seconds[slot] = second
+            self.slots[slot] = 0
+        self.slots[slot] += count
+        self.total += count
+
+    def rate(self, now=None):
+        now = now or time.time()
+        if self.started is None:
+            return 0.0
+        second = int(now)
+        count = sum([self.slots[slot] for slot in range(self.window)
+                     if self.seconds[slot] is not None and
+                        second - self.window < self.seconds[slot] <= second])
+        # dont underestimate rate during first window after start
+        elapsed = min(self.window, max(1.0, now - self.started))
+        return count / float(elapsed)
+
+    def merge(self, other=None):
+        '''
+            Adds events of other gauge with the same window.
+        '''
+        for slot in range(self.window):
+            second = other.seconds[slot]
+            if second is None:
+                continue
+            if self.seconds[slot] is None or self.seconds[slot] < second:
+                self.seconds[slot] = second
+                self.slots[slot] = other.slots[slot]
+            elif self.seconds[slot] == second:
+                self.slots[slot] += other.slots[slot]
+        self.total += other.total
+        if other.started is not None and (self.started is None or other.started < self.started):
+            self.started = other.started
+
+    def reset(self):
+        self.slots = [0] * self.window
+        self.seconds = [None] * self.window
+        self.total = 0
+        self.started = None
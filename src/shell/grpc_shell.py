@@ -4,6 +4,7 @@ import click
 import sys
 import os
 import time
+import json
 
 from configparser import ConfigParser
 import pickle
@@ -16,6 +17,12 @@ import click_completion
 # put all supported grpc services here
 import services.gnmi_service as gnmi
 import services.rib_api_service as rib_api
+import services.rib_shadow as rib_shadow
+import services.rib_journal as rib_journal
+import services.rib_cache as rib_cache
+import services.rib_validate as rib_validate
+import services.rib_generators as rib_generators
+import services.rib_dependencies as rib_dependencies
 import services.gnoi_cert as gnoi_certificates
 import services.grpc_lib as grpc_lib
 import services.cert_manager as cert_mgr
@@ -33,6 +40,9 @@ default_config_file = os.path.join(home,"grpc_shell.ini")
 history_file = os.path.join(home,".grpc_shell.history")
 default_delimiter = '/'
 default_prompt = '(grpc-shell) > '
+# window of Modify rpcs created by shell, library default is unlimited
+modify_batch_size = 1000
+modify_max_in_flight = 10000
 startup_config = None
 teardown_config = None
 certificate_directory = None
@@ -666,8 +676,9 @@ def execute(ctx, process, timeout):
 @click.option('--prefix', default=None, type=str)
 @click.option('--allow_aggregation', default=False, type=bool)
 @click.option('--use_aliases', default=False, type=bool)
+@click.option('--shared', is_flag=True, help='Share one stream with other compatible shared subscriptions')
 @click.pass_context
-def gnmi_subscribe(ctx, name, paging, mode, qos, prefix, allow_aggregation, use_aliases):
+def gnmi_subscribe(ctx, name, paging, mode, qos, prefix, allow_aggregation, use_aliases, shared):
     '''
         Entry point for subscribe rpc.
     '''
@@ -693,6 +704,8 @@ def gnmi_subscribe(ctx, name, paging, mode, qos, prefix, allow_aggregation, use_
                                                                          qos=qos,
                                                                          allow_aggregation=allow_aggregation,
                                                                          use_aliases=use_aliases)
+                if shared:
+                    ctx.obj['manager'].rpcs[rpc_type][name].multiplexer = ctx.obj['multiplexer']
             ctx.obj['RPC_NAME'] = name
             ctx.obj['RPC_TYPE'] = rpc_type
         except KeyError as e:
@@ -716,7 +729,7 @@ def prefix(ctx, prefix, delimiter):
 @click.option('--trigger', type=click.Choice(['SAMPLE', 'ON_CHANGE', 'TARGET_DEFINED']))
 @click.option('--interval', type=int, help='Sampling interval in seconds')
 @click.option('--suppress_redundant', default=False, type=bool)
-@click.option('--heartbeat_interval', default=None, type=int)
+@click.option('--heartbeat_interval', default=None, type=int, help='Heartbeat interval in seconds')
 @click.pass_context
 def subscribe(ctx, path, delimiter, trigger, interval, suppress_redundant, heartbeat_interval):
     '''
@@ -726,6 +739,8 @@ def subscribe(ctx, path, delimiter, trigger, interval, suppress_redundant, heart
     delimiter = str(delimiter) if delimiter else default_delimiter
     if interval:
         interval = interval*10**9
+    if heartbeat_interval:
+        heartbeat_interval = heartbeat_interval*10**9
     ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].subscription(path=path,
                                                                                    delimiter=delimiter,
                                                                                    trigger=trigger,
@@ -776,6 +791,75 @@ def forward_stream(ctx, ip, port, protocol, formatting):
                                                                                 ),
                                                                                 fg = 'green')
 
+@gnmi_subscribe.command(name='columnar')
+@click.option('--target_dir', default=None, type=str, help='Directory where blocks are written, defaults to <rpc name>_columnar')
+@click.option('--block_size', default=65536, type=int, help='Number of values buffered before block is flushed')
+@click.option('--flush_interval', default=60, type=int, help='Max number of seconds between flushes')
+@click.pass_context
+def columnar(ctx, target_dir, block_size, flush_interval):
+    '''
+        Stores numeric values from notifications as column blocks of .npy files
+    '''
+    if not target_dir:
+        target_dir = "{0}_columnar".format(ctx.obj['RPC_NAME'])
+
+    try:
+        rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+        rpc.columnar(target=target_dir,
+                     block_size=block_size,
+                     flush_interval=flush_interval)
+        rpc.response_processor = rpc.columnar_response_processor
+        click.secho('Numeric values will be stored in {0}'.format(target_dir), fg='green')
+    except Exception as e:
+        click.secho('\nError while chainging response_processor: {0}\n'.format(e), fg='red')
+
+@gnmi_subscribe.command(name='snapshot')
+@click.option('--file_path', default=None, type=str)
+@click.option('--full', is_flag=True, help='Write whole snapshot instead of delta against previous one')
+@click.pass_context
+def snapshot(ctx, file_path, full):
+    '''
+        Assembles each ONCE or POLL cycle into snapshot and logs only its changes
+    '''
+    if not file_path:
+        file_path = "{0}.log".format(ctx.obj['RPC_NAME'])
+
+    try:
+        rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+        rpc.snapshot(target=file_path, delta=not full)
+        rpc.response_processor = rpc.snapshot_response_processor
+    except Exception as e:
+        click.secho('\nError while chainging response_processor: {0}\n'.format(e), fg='red')
+
+@gnmi_subscribe.command(name='watchdog')
+@click.option('--multiplier', default=3, type=int, help='Path is stale after multiplier times its sample or heartbeat interval without data')
+@click.option('--resubscribe', is_flag=True, help='Resubscribe when any path becomes stale')
+@click.option('--tick', default=1, type=int, help='Granularity of checks in seconds')
+@click.pass_context
+def watchdog(ctx, multiplier, resubscribe, tick):
+    '''
+        Starts watchdog which reports subscription paths without data
+    '''
+    try:
+        ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].watch(multiplier=multiplier,
+                                                                                resubscribe=resubscribe,
+                                                                                tick=tick)
+        click.secho('Watchdog started for {0}'.format(ctx.obj['RPC_NAME']), fg='green')
+    except Exception as e:
+        click.secho('\nError while starting watchdog: {0}\n'.format(e), fg='red')
+
+@gnmi_subscribe.command(name='stale')
+@click.pass_context
+def stale(ctx):
+    '''
+        Displays state of paths tracked by watchdog
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    if not rpc.watchdog:
+        click.secho('Watchdog is not running for {0}'.format(ctx.obj['RPC_NAME']), fg='red')
+    else:
+        click.echo(rpc.watchdog)
+
 @gnmi_subscribe.command(name='execute')
 @click.option('--process', default='non-blocking', type=click.Choice(['blocking', 'non-blocking']),
               help=('Run RPC. blocking process waits for rpc to finish. non-blocking returns '
@@ -916,8 +1000,12 @@ def execute(ctx, process, timeout):
 @grpc_shell.group(invoke_without_command=True, name='rib_modify')
 @click.option('--name', default='default_modify', type=str, help='RPCs given name - used for managing RPCs in this client')
 @click.option('--paging', is_flag=True, help='Use pager inherited from shell in case there is long text to display.')
+@click.option('--shards', default=1, type=int,
+              help='Number of parallel Modify streams used by newly created RPC.')
+@click.option('--channels', is_flag=True,
+              help='Open separate channel for every shard of newly created RPC.')
 @click.pass_context
-def rib_modify(ctx,name, paging):
+def rib_modify(ctx,name, paging, shards, channels):
     '''
         RibApi.Modify
     '''
@@ -933,9 +1021,33 @@ def rib_modify(ctx,name, paging):
 
             else:
                 click.secho('Rpc with name \'{name}\' doesnt exists, adding one to rpc manager'.format(name=name), fg='yellow')
-                ctx.obj['manager'].rpcs[rpc_type][name] = rib_api.Modify(stub=ctx.obj['rib_fib_stub'],
-                                                                         metadata=ctx.obj['context'].metadata,
-                                                                         name=name)
+                if shards > 1:
+                    stubs = [ctx.obj['rib_fib_stub']]
+                    for _ in range(shards - 1):
+                        if channels:
+                            context = ctx.obj['context']
+                            channel = grpc_lib.Channel(ip=context.ip, port=context.port,
+                                                       username=context.username,
+                                                       password=context.password,
+                                                       auth_type=context.auth_type,
+                                                       root_cert=context.root_cert,
+                                                       cert=context.cert, key=context.key,
+                                                       transport=context.transport,
+                                                       compression=context.compression)
+                            stubs.append(rib_api.create_stub(service='RibApi', channel=channel.channel))
+                        else:
+                            stubs.append(ctx.obj['rib_fib_stub'])
+                    ctx.obj['manager'].rpcs[rpc_type][name] = rib_api.ShardedModify(stubs=stubs,
+                                                                                    metadata=ctx.obj['context'].metadata,
+                                                                                    name=name,
+                                                                                    batch_size=modify_batch_size,
+                                                                                    max_in_flight=modify_max_in_flight)
+                else:
+                    ctx.obj['manager'].rpcs[rpc_type][name] = rib_api.Modify(stub=ctx.obj['rib_fib_stub'],
+                                                                             metadata=ctx.obj['context'].metadata,
+                                                                             name=name,
+                                                                             batch_size=modify_batch_size,
+                                                                             max_in_flight=modify_max_in_flight)
             ctx.obj['RPC_NAME'] = name
             ctx.obj['RPC_TYPE'] = rpc_type
         except KeyError as e:
@@ -1032,6 +1144,38 @@ def next_hop_group(ctx, request_id, group_id, weight, primary_ip, primary_labels
                                                                     )
 
 
+@rib_modify.command(name='attach_group')
+@click.option('--request_ids', required=True, type=str,
+              help='Comma separated ids or ranges of queued requests, eg. 1,5-100')
+@click.option('--group_id', default = None, type=int)
+@click.option('--weight', default = None, type=int)
+@click.option('--primary_ip', default = None, type=str)
+@click.option('--primary_labels', default = None, type=str)
+@click.option('--backup_ip', default = None, type=str)
+@click.option('--backup_labels', default = None, type=str)
+@click.pass_context
+def attach_group(ctx, request_ids, group_id, weight, primary_ip, primary_labels, backup_ip, backup_labels):
+    '''
+        Appends the same next-hop-group to many tunnel or label requests.
+    '''
+    ids = []
+    try:
+        for part in request_ids.split(','):
+            start, _, end = part.partition('-')
+            ids.extend(range(int(start), int(end or start) + 1))
+        count = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].attach_group(
+                                                                        request_ids=ids,
+                                                                        group_id=group_id,
+                                                                        weight=weight,
+                                                                        primary_ip=primary_ip,
+                                                                        primary_labels=primary_labels,
+                                                                        backup_ip=backup_ip,
+                                                                        backup_labels=backup_labels)
+        click.secho('Group attached to {0} requests'.format(count), fg='green')
+    except (KeyError, ValueError) as e:
+        click.secho('\nFailed to attach group: {0}\n'.format(e), fg='red')
+
+
 @rib_modify.command(name='next_hop_switch')
 @click.option('--id', default=None, type=int, help='request id')
 @click.option('--endpoint', default=None, type=str, help='Ipv4 or Ipv6 address')
@@ -1066,6 +1210,493 @@ def end_of_rib(ctx, id, table_id):
                                                                                 )
 
 
+@rib_modify.command(name='load')
+@click.option('--file', 'file_path', required=True, type=click.Path(exists=True, dir_okay=False),
+              help='csv, jsonl or length delimited binary file with requests')
+@click.option('--format', default=None, type=click.Choice(['csv', 'jsonl', 'binary']),
+              help='Format of file, guessed from extension if not specified.')
+@click.option('--batch_size', default=None, type=int, help='Number of requests sent in one ModifyRequest')
+@click.pass_context
+def load(ctx, file_path, format, batch_size):
+    '''
+        Loads requests from file, requests are read lazily
+        in batches during execute.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    try:
+        if batch_size:
+            rpc.batch_size = batch_size
+        rpc.load(source=file_path, format=format)
+        click.secho('Added {0} as source of requests for {1}'.format(file_path, ctx.obj['RPC_NAME']),
+                    fg='green')
+    except Exception as e:
+        click.secho('\nFailed to load {0}: {1}\n'.format(file_path, e), fg='red')
+
+
+@rib_modify.command(name='window')
+@click.option('--batch_size', default=None, type=int, help='Max number of requests in one ModifyRequest')
+@click.option('--max_in_flight', default=None, type=int,
+              help='Max number of requests sent and not yet acknowledged by result')
+@click.pass_context
+def window(ctx, batch_size, max_in_flight):
+    '''
+        Sets or shows flow control limits of Modify stream.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    rpc.set_window(batch_size=batch_size, max_in_flight=max_in_flight)
+    click.echo('batch_size: {0}, max_in_flight: {1}, in_flight: {2}'.format(rpc.batch_size,
+                                                                           rpc.max_in_flight,
+                                                                           len(rpc.in_flight)))
+    if rpc.controller:
+        click.echo('adaptive: {0}'.format(rpc.controller))
+
+
+@rib_modify.command(name='shadow')
+@click.option('--enable', is_flag=True, help='Start tracking entries acknowledged by OK result.')
+@click.option('--disable', is_flag=True, help='Stop tracking and drop shadow RIB.')
+@click.option('--lookup', default=None, type=str, help='Longest prefix match of address or prefix.')
+@click.option('--prefix', default=None, type=str, help='Show all routes covered by prefix.')
+@click.pass_context
+def shadow(ctx, enable, disable, lookup, prefix):
+    '''
+        Local copy of programmed routes, tunnels and labels.
+        Shows number of entries per table if no option is specified.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    if enable and rpc.shadow is None:
+        rpc.shadow = rib_shadow.ShadowRib()
+    elif disable:
+        rpc.shadow = None
+        return
+    if rpc.shadow is None:
+        click.secho('Shadow RIB is not enabled, use \'rib_modify shadow --enable\'', fg='red')
+        return
+    try:
+        if lookup:
+            found = rpc.shadow.lookup(lookup)
+            if found is None:
+                click.secho('No route matches {0}'.format(lookup), fg='yellow')
+            else:
+                for preference, entry in sorted(found[1].items()):
+                    click.echo('{0} preference {1}:\n{2}'.format(found[0], preference, entry))
+        elif prefix:
+            for route, preferences in rpc.shadow.routes_in(prefix):
+                for preference, entry in sorted(preferences.items()):
+                    click.echo('{0} preference {1}: {2}'.format(route, preference, str(entry).replace('\n', ' ')))
+        else:
+            click.echo(rpc.shadow)
+    except ValueError as e:
+        click.secho('\n{0}\n'.format(e), fg='red')
+
+
+@rib_modify.command(name='reconcile')
+@click.option('--file', 'file_path', default=None, type=click.Path(exists=True, dir_okay=False),
+              help='csv, jsonl or length delimited binary file with desired entries')
+@click.option('--format', default=None, type=click.Choice(['csv', 'jsonl', 'binary']),
+              help='Format of file, guessed from extension if not specified.')
+@click.pass_context
+def reconcile(ctx, file_path, format):
+    '''
+        Queues minimal set of add, replace and delete requests which
+        change shadow RIB to entries in file, followed by END_OF_RIB
+        for each table. Without --file shows progress of last reconciliation.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    if not file_path:
+        click.echo(ctx.obj.get('reconciliation', 'No reconciliation was started'))
+        return
+    try:
+        ctx.obj['reconciliation'] = rpc.reconcile(source=file_path, format=format)
+        click.secho('Reconciliation with {0} queued, execute rpc to send changes'.format(file_path),
+                    fg='green')
+    except ValueError as e:
+        click.secho('\n{0}\n'.format(e), fg='red')
+
+
+@rib_modify.command(name='journal')
+@click.option('--file', 'file_path', default=None, type=click.Path(dir_okay=False),
+              help='Journal file, records are appended if file exists.')
+@click.option('--recover', is_flag=True,
+              help='Rebuild shadow RIB from journal and queue unacknowledged requests.')
+@click.option('--disable', is_flag=True, help='Sync and close journal.')
+@click.option('--sync_every', default=1000, type=int, help='Max number of records waiting for fsync.')
+@click.option('--sync_interval', default=1.0, type=float, help='Max number of seconds between fsyncs.')
+@click.pass_context
+def journal(ctx, file_path, recover, disable, sync_every, sync_interval):
+    '''
+        Write-ahead journal of sent requests and received results.
+        Shows journal state if no option is specified.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    if disable:
+        if rpc.journal:
+            rpc.journal.close()
+            rpc.journal = None
+        return
+    if not file_path:
+        click.echo(rpc.journal or 'Journal is not enabled')
+        return
+    try:
+        if rpc.journal:
+            rpc.journal.close()
+        if recover:
+            count = rpc.recover(path=file_path, sync_every=sync_every, sync_interval=sync_interval)
+            click.secho('Recovered shadow RIB from {0}, {1} unacknowledged requests queued'.format(
+                                                                                    file_path, count),
+                        fg='green')
+        else:
+            rpc.journal = rib_journal.Journal(path=file_path, sync_every=sync_every,
+                                              sync_interval=sync_interval)
+    except (IOError, OSError, ValueError) as e:
+        click.secho('\nFailed to open journal {0}: {1}\n'.format(file_path, e), fg='red')
+
+
+@rib_modify.command(name='resync')
+@click.option('--start', is_flag=True, help='Replay shadow RIB on current stream.')
+@click.option('--auto/--no-auto', default=None,
+              help='Replay shadow RIB automatically whenever stream is re-established.')
+@click.option('--table', multiple=True,
+              type=click.Choice(['IPv4RouteTable',
+                                 'IPv6RouteTable',
+                                 'IPv4TunnelTable',
+                                 'IPv6TunnelTable',
+                                 'MplsLabelTable']),
+              help='Table to replay with --start, can be repeated. Defaults to all tables.')
+@click.pass_context
+def resync(ctx, start, auto, table):
+    '''
+        Graceful restart resync, replays shadow RIB table by table
+        followed by END_OF_RIB. Shows progress of last resync.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    if auto is not None:
+        rpc.auto_resync = auto
+    try:
+        if start:
+            rpc.resync(tables=[rib_api.rib.TableId.Value(name) for name in table] or None)
+            rpc.execute()
+    except ValueError as e:
+        click.secho('\n{0}\n'.format(e), fg='red')
+        return
+    click.echo('auto resync: {0}'.format(rpc.auto_resync))
+    click.echo(rpc.last_resync or 'No resync was started')
+
+
+@rib_modify.command(name='cache')
+@click.option('--enable', is_flag=True, help='Build requests through cache of serialized bodies.')
+@click.option('--disable', is_flag=True, help='Drop cache, requests are built as messages again.')
+@click.option('--max_entries', default=100000, type=int, help='Max number of cached bodies.')
+@click.option('--clear', is_flag=True, help='Drop cached bodies and counters.')
+@click.pass_context
+def cache(ctx, enable, disable, max_entries, clear):
+    '''
+        Cache of serialized request bodies, repeated programming of the
+        same entries only rewrites request ids. Shows cache statistics.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    if disable:
+        rpc.cache = None
+        return
+    if enable:
+        if rpc.cache is None:
+            rpc.cache = rib_cache.RequestCache(max_entries=max_entries)
+        rpc.cache.max_entries = max_entries
+    if rpc.cache is None:
+        click.secho('Request cache is not enabled, use \'rib_modify cache --enable\'', fg='red')
+        return
+    if clear:
+        rpc.cache.clear()
+    click.echo(rpc.cache)
+
+
+@rib_modify.command(name='validate')
+@click.option('--loads', is_flag=True, help='Validate also sources added by load while they are read.')
+@click.option('--no_loads', is_flag=True, help='Stop validating loaded sources.')
+@click.option('--chunk_size', default=100000, type=int, help='Number of loaded requests validated together.')
+@click.option('--keep', is_flag=True, help='Keep invalid queued requests, only report them.')
+@click.option('--no_normalize', is_flag=True, help='Do not rewrite prefixes to canonical form.')
+@click.option('--show', default=10, type=int, help='Number of invalid requests shown.')
+@click.pass_context
+def validate(ctx, loads, no_loads, chunk_size, keep, no_normalize, show):
+    '''
+        Validates route prefixes and tunnel endpoints of queued requests,
+        invalid requests are dropped. Prefixes must be canonical CIDR
+        without host bits matching address family of table, keys must
+        be unique.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    if no_loads:
+        rpc.validation = None
+    elif loads:
+        rpc.validation = rib_validate.RequestValidation(normalize=not no_normalize,
+                                                        chunk_size=chunk_size)
+    validation = rpc.validate(normalize=not no_normalize, drop=not keep)
+    click.echo('Queued requests - {0}'.format(validation))
+    for reason, msg in validation.invalid[:show]:
+        click.secho('Request {0}: {1}'.format(msg.id, reason), fg='red')
+    if rpc.validation is not None:
+        click.echo('Loaded requests - {0}'.format(rpc.validation))
+        for reason, msg in rpc.validation.invalid[:show]:
+            click.secho('Request {0}: {1}'.format(msg.id, reason), fg='red')
+
+
+@rib_modify.command(name='failures')
+@click.option('--status', default='FAILED', type=click.Choice(['FAILED', 'UNSET', 'ANY']),
+              help='Status of last result of listed requests, ANY for all which did not end with OK.')
+@click.option('--reason', default=None, type=str, help='List only requests with this extended_status.')
+@click.option('--show', default=20, type=int, help='Number of failed requests shown with messages.')
+@click.pass_context
+def failures(ctx, status, reason, show):
+    '''
+        Shows requests which did not end with OK and failure counters
+        per table, operation and extended_status.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    code = None if status == 'ANY' else rib_api.rib.ModifyResponse.Result.Status.Value(status)
+    for (table, operation, extended_status), count in sorted(rpc.failure_summary().items()):
+        click.echo('{0} {1} <{2}>: {3}'.format(table, operation, extended_status, count))
+    ids = rpc.failed(status=code, reason=reason)
+    click.echo('Failed requests: {0}'.format(len(ids)))
+    trackers = [shard.processed_request for shard in getattr(rpc, 'shards', [rpc])]
+    for request_id in ids[:show]:
+        for tracker in trackers:
+            if request_id in tracker.failures:
+                click.secho('{0}: {1}'.format(request_id, tracker.failures[request_id]['response']),
+                            fg='red')
+    if rpc.retry_policy is not None:
+        click.echo('Retry policy - {0}'.format(rpc.retry_policy))
+
+
+@rib_modify.command(name='retry')
+@click.option('--id', 'ids', multiple=True, type=int, help='Id of failed request, can be repeated.')
+@click.option('--reason', default=None, type=str, help='Retry only requests with this extended_status.')
+@click.option('--delay', default=None, type=float, help='Seconds after which requests are sent.')
+@click.option('--auto', is_flag=True, help='Retry FAILED results automatically with exponential backoff.')
+@click.option('--disable', is_flag=True, help='Stop automatic retry.')
+@click.option('--max_attempts', default=3, type=int, help='Max number of automatic retries of request.')
+@click.option('--backoff', default=1.0, type=float, help='Seconds before first automatic retry.')
+@click.option('--multiplier', default=2.0, type=float, help='Growth of delay with every retry.')
+@click.option('--max_delay', default=60.0, type=float, help='Max seconds before automatic retry.')
+@click.pass_context
+def retry(ctx, ids, reason, delay, auto, disable, max_attempts, backoff, multiplier, max_delay):
+    '''
+        Sends FAILED requests again with their ids, only requests selected
+        by --id or --reason if given. With --auto also every following
+        FAILED result is retried after backoff.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    if disable:
+        rpc.retry_policy = None
+        click.secho('Automatic retry disabled', fg='green')
+        return
+    if auto:
+        rpc.retry_policy = rib_api.RetryPolicy(max_attempts=max_attempts,
+                                               delay=backoff,
+                                               multiplier=multiplier,
+                                               max_delay=max_delay,
+                                               reasons=[reason] if reason else None)
+    retried = rpc.retry(ids=list(ids) or None, reason=reason, delay=delay)
+    click.echo('Retried requests: {0}'.format(len(retried)))
+
+
+@rib_modify.command(name='stats')
+@click.option('--export', default=None, type=click.File('w'), help='Write statistics to file as json')
+@click.option('--reset', is_flag=True, help='Reset statistics after they are shown.')
+@click.pass_context
+def stats(ctx, export, reset):
+    '''
+        Shows ack latency per table and operation and programming rate.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    statistics = rpc.statistics()
+    click.echo(statistics)
+    if export:
+        json.dump(dict(statistics.to_dict(), name=rpc.name), export, indent=2)
+        click.secho('Statistics exported to {0}'.format(export.name), fg='green')
+    if reset:
+        for item in getattr(rpc, 'shards', []) + [rpc]:
+            with item.lock:
+                item.stats.reset()
+
+
+@rib_modify.command(name='pace')
+@click.option('--rate', default=None, type=float, help='Max requests per second.')
+@click.option('--byte_rate', default=None, type=float, help='Max bytes of requests per second.')
+@click.option('--burst', default=None, type=int, help='Max requests sent at once after idle time, rate by default.')
+@click.option('--byte_burst', default=None, type=int, help='Max bytes sent at once after idle time, byte_rate by default.')
+@click.option('--window', multiple=True, type=str,
+              help='Programming window HH:MM-HH:MM in local time, can be repeated.')
+@click.option('--disable', is_flag=True, help='Remove all limits.')
+@click.pass_context
+def pace(ctx, rate, byte_rate, burst, byte_burst, window, disable):
+    '''
+        Limits rate of sent requests by token bucket and restricts
+        sending to programming windows. Shows current pacer without options.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    if disable:
+        rpc.set_pacer(None)
+        click.secho('Pacing disabled', fg='green')
+        return
+    if rate or byte_rate or window:
+        try:
+            rpc.set_pacer(rib_api.Pacer(rate=rate,
+                                        byte_rate=byte_rate,
+                                        burst=burst,
+                                        byte_burst=byte_burst,
+                                        windows=list(window)))
+        except ValueError as e:
+            click.secho(str(e), fg='red')
+            return
+    if rpc.pacer is None:
+        click.secho('Pacing is not enabled, use \'rib_modify pace --rate\'', fg='red')
+        return
+    click.echo(rpc.pacer)
+
+
+@rib_modify.command(name='generate')
+@click.argument('entry', type=click.Choice(rib_generators.entries))
+@click.argument('operation')
+@click.option('--count', required=True, type=int, help='Number of generated requests.')
+@click.option('--first', default=None, type=str,
+              help='First prefix in CIDR, tunnel endpoint or label of range.')
+@click.option('--step', default=1, type=int, help='Distance of consecutive prefixes or labels.')
+@click.option('--random', 'within', default=None, type=str,
+              help='Random route prefixes within given prefix instead of range.')
+@click.option('--lengths', default=None, type=str,
+              help='Weights of random prefix lengths, eg. 24:70,32:30.')
+@click.option('--seed', default=None, type=int, help='Seed of random prefixes.')
+@click.option('--unique', is_flag=True, help='Do not repeat random prefixes.')
+@click.option('--key_preference', default=None, type=int)
+@click.option('--rtm_preference', default=None, type=int)
+@click.option('--ttm_preference', default=None, type=int)
+@click.option('--metric', default=None, type=int)
+@click.option('--ing_stats_enable', default=None, type=int)
+@click.option('--type', default=None, type=str)
+@click.option('--next_hops', default=None, type=str,
+              help=('Comma separated next hops, routes cycle over them as tunnel_next_hop, '
+                    'tunnels and labels get NextHopGroups with them.'))
+@click.option('--labels', default=None, type=str,
+              help='Label stacks of next hops separated by semicolon, eg. 100,200;101;102')
+@click.option('--width', default=1, type=int, help='Number of NextHopGroups of tunnel or label.')
+@click.option('--backup', is_flag=True, help='Use following next hop as backup of every group.')
+@click.pass_context
+def generate(ctx, entry, operation, count, first, step, within, lengths, seed, unique,
+             key_preference, rtm_preference, ttm_preference, metric, ing_stats_enable, type,
+             next_hops, labels, width, backup):
+    '''
+        Adds lazily generated route, tunnel or label requests as source
+        of requests, they are built in batches during execute.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    next_hops = next_hops.split(',') if next_hops else None
+    # cached requests are sent without parsing, which needs cache of rpc
+    raw = rpc.cache is not None
+    try:
+        if entry == 'route':
+            if within:
+                keys = rib_generators.random_prefixes(within=within, count=count, lengths=lengths,
+                                                      seed=seed, unique=unique)
+            else:
+                keys = rib_generators.prefix_range(first=first or '10.0.0.0/24', count=count,
+                                                   step=step)
+            requests = rib_generators.route_requests(prefixes=keys,
+                                                     operation=operation,
+                                                     key_preference=key_preference,
+                                                     rtm_preference=rtm_preference,
+                                                     metric=metric,
+                                                     next_hops=next_hops,
+                                                     raw=raw)
+        else:
+            groups = None
+            if next_hops:
+                groups = rib_generators.fan_out(next_hops=next_hops,
+                                                width=width,
+                                                labels=labels.split(';') if labels else None,
+                                                backup=backup)
+            if entry == 'tunnel':
+                requests = rib_generators.tunnel_requests(
+                                endpoints=rib_generators.prefix_range(first=first or '192.0.2.1',
+                                                                      count=count, step=step),
+                                operation=operation,
+                                key_preference=key_preference,
+                                ttm_preference=ttm_preference,
+                                metric=metric,
+                                groups=groups,
+                                raw=raw)
+            else:
+                requests = rib_generators.label_requests(
+                                labels=rib_generators.label_block(first=int(first or 1000),
+                                                                  count=count, step=step),
+                                operation=operation,
+                                key_preference=key_preference,
+                                ing_stats_enable=ing_stats_enable,
+                                type=type,
+                                groups=groups,
+                                raw=raw)
+        rpc.load(source=requests)
+        click.secho('Added {0} generated {1} requests as source of requests for {2}'.format(
+                                                        count, entry, ctx.obj['RPC_NAME']),
+                    fg='green')
+    except Exception as e:
+        click.secho('\nFailed to generate requests: {0}\n'.format(e), fg='red')
+
+
+@rib_modify.command(name='order')
+@click.option('--loads', is_flag=True, help='Order also sources added by load while they are read.')
+@click.option('--no_loads', is_flag=True, help='Stop ordering loaded sources.')
+@click.option('--chunk_size', default=100000, type=int, help='Number of loaded requests ordered together.')
+@click.option('--check', is_flag=True, help='Check references of queued requests after ordering.')
+@click.option('--show', default=10, type=int, help='Number of problems shown.')
+@click.pass_context
+def order(ctx, loads, no_loads, chunk_size, check, show):
+    '''
+        Orders queued requests so that tunnels and labels are programmed
+        before routes, tunnels and labels referencing them and deleted
+        after them.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    if no_loads:
+        rpc.ordering = None
+    elif loads:
+        rpc.ordering = rib_dependencies.DependencyOrder(shadow=rpc.shadow, chunk_size=chunk_size)
+    click.echo('Queued requests - {0}'.format(rpc.order()))
+    if rpc.ordering is not None:
+        click.echo('Loaded requests - {0}'.format(rpc.ordering))
+    if check:
+        consistency = rpc.check_consistency()
+        click.echo('References - {0}'.format(consistency))
+        for reason, reference, msg in consistency.problems[:show]:
+            click.secho('Request {0}: {1} {2}'.format(msg.id, reason, reference[-1]), fg='red')
+
+
+@rib_modify.command(name='adaptive')
+@click.option('--disable', is_flag=True, help='Stop tuning, current limits are kept.')
+@click.option('--latency_target', default=None, type=float,
+              help='Ack latency in ms considered as overload, latency spikes are used if not set.')
+@click.option('--min_batch', default=10, type=int)
+@click.option('--max_batch', default=5000, type=int)
+@click.option('--min_in_flight', default=100, type=int)
+@click.option('--max_in_flight', default=100000, type=int)
+@click.pass_context
+def adaptive(ctx, disable, latency_target, min_batch, max_batch, min_in_flight, max_in_flight):
+    '''
+        Tunes batch_size and max_in_flight according to ack latency
+        and FAILED results.
+    '''
+    rpc = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']]
+    if disable:
+        rpc.controller = None
+        click.secho('Adaptive window disabled', fg='green')
+        return
+    rpc.controller = rib_api.AdaptiveWindow(min_batch=min_batch,
+                                            max_batch=max_batch,
+                                            min_in_flight=min_in_flight,
+                                            max_in_flight=max_in_flight,
+                                            latency_target=latency_target / 1000.0 if latency_target else None)
+    click.secho('Adaptive window enabled', fg='green')
+
+
 @rib_modify.command(name='execute')
 @click.option('--process', default='non-blocking', type=click.Choice(['blocking', 'non-blocking']),
               help=('Run RPC. blocking process waits for rpc to finish. non-blocking returns '
@@ -1149,77 +1780,84 @@ def destroy(ctx):
 @click.pass_context
 def to_json(ctx):
     '''
-        Prints currently loaded request messages.
+        Prints requests which were not sent yet as json lines.
     '''
-    click.secho(ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].get_requests())
+    click.secho(ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].to_json())
 
 @rib_modify.command(name='save_json_file')
-@click.option('--json_file', type=click.File('wb'))
+@click.option('--json_file', required=True, type=click.Path(dir_okay=False))
+@click.option('--sources', is_flag=True,
+              help='Save also loaded sources, they are consumed and not sent by execute.')
 @click.pass_context
-def save_json_file(ctx, json_file):
+def save_json_file(ctx, json_file, sources):
     '''
-        Saves file with JSON object,
-        consisting of all request messages
-        currently loaded in this RPC. 
+        Saves requests which were not sent yet to file as json lines,
+        one request per line. Requests are written in chunks,
+        so also large loaded sources can be saved.
     '''
     try:
-        ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].to_json(file_path=json_file.name)
-        click.secho('Saved message to json file {0}'.format(json_file.name), fg='green')
-    except:
-        click.secho('Exception occured, failed to save json file {0}'.format(json_file.name), fg='red')
-        raise
+        count = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].to_json(
+                                                                            file_path=json_file,
+                                                                            sources=sources)
+        click.secho('Saved {0} requests to json file {1}'.format(count, json_file), fg='green')
+    except Exception as e:
+        click.secho('Exception occured, failed to save json file {0}: {1}'.format(json_file, e),
+                    fg='red')
 
-@rib_modify.command(name='save_binary_file')
-@click.option('--json_file', type=click.File('r'))
+@rib_modify.command(name='load_json_file')
+@click.option('--json_file', required=True, type=click.Path(exists=True, dir_okay=False))
 @click.pass_context
 def load_json_file(ctx, json_file):
     '''
-        Loads file with JSON object, consisting of request messages.
-        
+        Loads file with json lines, one request per line. Requests
+        are read lazily in batches during execute.
     '''
     try:
-        count = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].from_json(file_path=json_file.name)
-        click.secho('Loaded json file {0} with {1} requests into {2}'.format(
-                                                                        json_file.name,
-                                                                        count,
+        ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].from_json(file_path=json_file)
+        click.secho('Added json file {0} as source of requests for {1}'.format(
+                                                                        json_file,
                                                                         ctx.obj['RPC_NAME']), fg='green')
-    except:
-        click.secho('Exception occured, failed to load json file {0}'.format(json_file.name), fg='red')
-        raise
+    except Exception as e:
+        click.secho('Exception occured, failed to load json file {0}: {1}'.format(json_file, e),
+                    fg='red')
 
 @rib_modify.command(name='save_binary_file')
-@click.option('--binary_file', type=click.File('wb'))
+@click.option('--binary_file', required=True, type=click.Path(dir_okay=False))
+@click.option('--sources', is_flag=True,
+              help='Save also loaded sources, they are consumed and not sent by execute.')
 @click.pass_context
-def save_binary_file(ctx, binary_file):
+def save_binary_file(ctx, binary_file, sources):
     '''
-        Saves file with protobuf binary object,
-        consisting of all request messages
-        currently loaded in this RPC. 
+        Saves requests which were not sent yet to file as length
+        delimited protobuf messages. Requests are written in chunks,
+        so also large loaded sources can be saved.
     '''
     try:
-        ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].to_binary(file_path=binary_file.name)
-        click.secho('Saved message to binary file {0}'.format(binary_file.name), fg='green')
-    except:
-        click.secho('Exception occured, failed to save binary file {0}'.format(binary_file.name), fg='red')
-        raise
+        count = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].to_binary(
+                                                                            file_path=binary_file,
+                                                                            sources=sources)
+        click.secho('Saved {0} requests to binary file {1}'.format(count, binary_file), fg='green')
+    except Exception as e:
+        click.secho('Exception occured, failed to save binary file {0}: {1}'.format(binary_file, e),
+                    fg='red')
 
 @rib_modify.command(name='load_binary_file')
-@click.option('--binary_file', type=click.File('r'))
+@click.option('--binary_file', required=True, type=click.Path(exists=True, dir_okay=False))
 @click.pass_context
 def load_binary_file(ctx, binary_file):
     '''
-        Loads file with protobuf binary object, consisting of request messages.
-        
+        Loads file with length delimited protobuf messages. File is
+        memory mapped and requests are read lazily in batches during
+        execute, with cache enabled they are sent without parsing.
     '''
     try:
-        count = ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].from_json(file_path=binary_file.name)
-        click.secho('Loaded binary file {0} with {1} requests into {2}'.format(
-                                                                        binary_file.name,
-                                                                        count,
+        ctx.obj['manager'].rpcs[ctx.obj['RPC_TYPE']][ctx.obj['RPC_NAME']].from_binary(file_path=binary_file)
+        click.secho('Added binary file {0} as source of requests for {1}'.format(
+                                                                        binary_file,
                                                                         ctx.obj['RPC_NAME']), fg='green')
-    except:
-        click.secho('Exception occured, failed to load binary file {0}'.format(binary_file.name), fg='red')
-        raise
+    except Exception as e:
+        click.secho('Exception occured, failed to load binary file {0}: {1}'.format(binary_file, e),
+                    fg='red')
 
 @grpc_shell.group(invoke_without_command=True, name='gnoi_cert_can_generate_csr')
 @click.option('--name', default='default_can_generate_csr', type=str, help='RPCs given name - used for managing RPCs in this client')
@@ -1668,6 +2306,10 @@ def connect(ctx, ip, port, username, password, auth_type, root_cert, cert, key,
                  'CertificateManagement.GetCertificates',
                  'CertificateManagement.Cert']
     ctx.obj['manager'] = grpc_lib.RpcManager(rpc_types=rpc_types)
+    ctx.obj['multiplexer'] = gnmi.SubscriptionMultiplexer(stub=ctx.obj['gnmi_stub'],
+                                                          metadata=ctx.obj['context'].metadata,
+                                                          server_addr=ctx.obj['context'].ip,
+                                                          server_port=ctx.obj['context'].port)
 
     ctx.obj['cert_manager'] = cert_mgr.CertificateManager()
 
@@ -1689,6 +2331,32 @@ def manager(ctx):
     except KeyError:
         click.secho("No manager found, use 'connect' command to create one", fg='red')
 
+@show.command()
+@click.pass_context
+def multiplexer(ctx):
+    try:
+        click.echo(ctx.obj['multiplexer'])
+    except KeyError:
+        click.secho("No multiplexer found, use 'connect' command to create one", fg='red')
+
+@show.command(name='telemetry-stats')
+@click.option('--export', default=None, type=click.File('w'), help='Write statistics to file as json')
+@click.pass_context
+def telemetry_stats(ctx, export):
+    try:
+        rpcs = list(ctx.obj['manager'].rpcs['gNMI.Subscribe'].values())
+        rpcs += list(ctx.obj['multiplexer'].streams.values())
+    except KeyError:
+        click.secho("No manager found, use 'connect' command to create one", fg='red')
+        return
+    if not rpcs:
+        click.secho('No subscriptions found', fg='yellow')
+    for rpc in rpcs:
+        click.echo('\n{0} ({1}):\n{2}'.format(rpc.name, rpc.status, rpc.stats))
+    if export:
+        json.dump(dict([(rpc.name, rpc.stats.to_dict()) for rpc in rpcs]), export, indent=2)
+        click.secho('Statistics exported to {0}'.format(export.name), fg='green')
+
 @show.command()
 @click.pass_context
 def certificates(ctx):